@@ -0,0 +1,435 @@
+import os
+import sys
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from excel_config import SHEET_FORMAT_CONFIGS_BATCH_SUMMARY
+from incremental import default_state_file
+from instrumentation import stats
+from lazy_imports import lazy_import
+from mnb_exchange_service import MNBExchangeService, RateUnavailableError, open_exchange_service
+from tax_wizard import (
+    LOT_METHODS,
+    LightyearProcessor,
+    RevolutExchangeProcessor,
+    RevolutProcessor,
+    RevolutSavingsProcessor,
+    REPORT_GENERATORS,
+    build_report,
+    report_generator,
+    unavailable_format
+)
+
+pd = lazy_import("pandas")
+
+PROCESSORS = {
+    "lightyear": LightyearProcessor,
+    "revolut": RevolutProcessor,
+    "revolut_saving": RevolutSavingsProcessor,
+    "revolut_exchange": RevolutExchangeProcessor,
+}
+
+# Munkalapnév előtag módonként (az Excel munkalapnév legfeljebb 31 karakter)
+SHEET_PREFIXES = {
+    "lightyear": "Lightyear",
+    "revolut": "Revolut",
+    "revolut_saving": "Rev. megtakarítás",
+    "revolut_exchange": "Rev. váltás",
+}
+
+# A gyorsítótár előmelegítésekor a kimutatásokból csak a dátum és deviza oszlopot olvassuk, ekkora darabokban
+SPAN_CHUNKSIZE = 100000
+
+# A bevallandó összegek; az átváltási különbözet nem jövedelem, csak tájékoztató oszlop (lásd
+# tax_wizard.RevolutExchangeProcessor)
+DECLARED_COLUMNS = [
+    "Realizált PnL (HUF)",
+    "Kamat (HUF)",
+    "Osztalék (HUF)",
+    "Megtakarítás kamat bruttó (HUF)"
+]
+SUMMARY_COLUMNS = [
+    "Account",
+    *DECLARED_COLUMNS,
+    "Összes bevallandó összeg (HUF)",
+    "Átváltási különbözet (HUF)"
+]
+
+
+def detect_mode(csv_file: str):
+    """A kimutatás típusa a CSV fejléce alapján; None, ha nem ismerhető fel."""
+    columns = set(pd.read_csv(csv_file, nrows=0).columns.str.strip())
+    if {"Net Amt.", "CCY"} <= columns:
+        return "lightyear"
+    if {"Total Amount", "Ticker"} <= columns:
+        return "revolut"
+    if {"Description", "Value"} <= columns:
+        return "revolut_saving"
+    if {"Started Date", "Completed Date", "Description", "Amount"} <= columns:
+        return "revolut_exchange"
+    return None
+
+
+def read_manifest(path: str) -> list:
+    """Beolvassa a feldolgozandó kimutatások listáját.
+    path lehet egy CSV manifest (account, mode, file oszlopokkal; a mode üresen hagyható, a file a
+    manifesthez relatív), vagy egy könyvtár, amelyben számlánként egy alkönyvtár van a kimutatásokkal
+    (a közvetlenül a könyvtárban lévő CSV-k a könyvtár nevével azonos számlához tartoznak).
+    Visszatérés: (számla, mód, fájl) hármasok listája.
+    """
+    entries = []
+    if os.path.isdir(path):
+        root = os.path.abspath(path)
+        for dirpath, _, filenames in sorted(os.walk(root)):
+            account = os.path.basename(dirpath if dirpath != root else root)
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".csv"):
+                    entries.append((account, None, os.path.join(dirpath, filename)))
+    else:
+        base = os.path.dirname(os.path.abspath(path))
+        manifest = pd.read_csv(path, dtype=str).fillna("")
+        for row in manifest.itertuples(index=False):
+            mode = row.mode.strip().lower() if hasattr(row, "mode") else ""
+            entries.append((row.account.strip(), mode or None, os.path.join(base, row.file.strip())))
+
+    jobs = []
+    for account, mode, csv_file in entries:
+        if not os.path.exists(csv_file):
+            print(f"Figyelem: a kimutatás nem található, kihagyva: {csv_file}")
+            continue
+        mode = mode or detect_mode(csv_file)
+        if mode not in PROCESSORS:
+            print(f"Figyelem: ismeretlen kimutatás típus, kihagyva: {csv_file}")
+            continue
+        jobs.append((account, mode, csv_file))
+    return jobs
+
+
+def warm_cache(jobs: list, exchange_service: MNBExchangeService) -> None:
+    """A párhuzamos feldolgozás előtt egyszer betölti az összes kimutatás árfolyamait a közös
+    (SQLite) cache-be, így a munkafolyamatok már meleg cache-ből dolgoznak és nem kérdezik le
+    ugyanazokat a tartományokat egymással párhuzamosan.
+    """
+    for _, mode, csv_file in jobs:
+        # A devizaváltás feldolgozó darabonként, a feldolgozás közben tölti be az árfolyamokat
+        if mode == "revolut_exchange":
+            continue
+        # Streaming módban a processzor konstruktora csak a dátum- és devizatartományt olvassa be
+        PROCESSORS[mode](csv_file, exchange_service, SPAN_CHUNKSIZE)
+    exchange_service.flush()
+
+
+def job_state_file(job: tuple, incremental: bool):
+    """Inkrementális módban a kimutatás melletti állapotfájl (lásd incremental), egyébként None."""
+    return default_state_file(job[2]) if incremental else None
+
+
+def run_job(job: tuple, offline: bool = False, chunksize: int = None, lot_method: str = "fifo",
+            rates_file: str = None, incremental: bool = False, allow_missing: bool = False):
+    """Egy kimutatás feldolgozása (külön folyamatban fut, saját MNBExchangeService példánnyal).
+    Visszatérés: (számla, mód, report_data, sheet_format_configs, a futás statisztikája).
+    """
+    account, mode, csv_file = job
+    # A munkafolyamat több feladatot is kaphat: a statisztika feladatonként indul
+    stats.reset()
+    exchange_service = open_exchange_service(rates_file, offline, allow_missing)
+    try:
+        report_data, sheet_format = build_report(mode, csv_file, exchange_service, chunksize, lot_method,
+                                                 job_state_file(job, incremental))
+        exchange_service.flush()
+    finally:
+        # A figyelmeztetések a munkafolyamatban, kimutatásonként jelennek meg
+        stats.flush_warnings()
+    return account, mode, report_data, sheet_format, stats.as_dict(exchange_service)
+
+
+def merge_reports(reports: list) -> dict:
+    """Azonos számlához és módhoz tartozó több kimutatás munkalapjainak összefűzése;
+    az Összesítő lapokat az első oszlop (kategória / deviza) szerint újraösszegzi.
+    """
+    merged = {}
+    for report_data in reports:
+        for sheet_name, df in report_data.items():
+            merged.setdefault(sheet_name, []).append(df)
+    result = {}
+    for sheet_name, frames in merged.items():
+        frames = [df for df in frames if not df.empty] or frames[:1]
+        df = pd.concat(frames, ignore_index=True)
+        if sheet_name == "Összesítő" and len(frames) > 1:
+            df = df.groupby(df.columns[0], as_index=False, sort=False).sum()
+        result[sheet_name] = df
+    return result
+
+
+def account_totals(account: str, reports: dict) -> dict:
+    """Egy számla bevallandó összegei módonként összesítve, és a devizaváltások átváltási különbözete
+    (a számlák közötti Összesítő egy sora).
+    """
+    totals = dict.fromkeys(DECLARED_COLUMNS, 0.0)
+    conversion_difference = 0.0
+    for mode, report_data in reports.items():
+        summary = report_data.get("Összesítő")
+        if summary is None or summary.empty:
+            continue
+        if mode == "revolut_saving":
+            totals["Megtakarítás kamat bruttó (HUF)"] += summary["Összeg bruttó (HUF)"].sum()
+        elif mode == "revolut_exchange":
+            # Az Összesen sor (több kimutatás összevonása után is egyetlen sor, lásd merge_reports)
+            total_row = summary[summary["Pair"] == "Összesen"]
+            conversion_difference += total_row["Conversion Difference (HUF)"].sum()
+        else:
+            by_category = dict(zip(summary["Category"], summary["Total"]))
+            for column in ("Realizált PnL (HUF)", "Kamat (HUF)", "Osztalék (HUF)"):
+                totals[column] += by_category.get(column, 0)
+    return {"Account": account, **totals, "Összes bevallandó összeg (HUF)": sum(totals.values()),
+            "Átváltási különbözet (HUF)": conversion_difference}
+
+
+def shift_formats(sheet_format: dict, prefix: str, offset: int) -> dict:
+    """A módonkénti formátum konfiguráció átnevezése az előtagos munkalapokra, offset oszloppal eltolva."""
+    return {
+        f"{prefix} {sheet_name}": {
+            format_type: [tuple(col + offset for col in cols) for cols in columns]
+            for format_type, columns in formats.items()
+        }
+        for sheet_name, formats in sheet_format.items()
+    }
+
+
+def build_workbook(accounts: dict, sheet_formats: dict, consolidated: bool):
+    """Munkafüzet tartalma egy vagy több számlából.
+    accounts: {számla: {mód: report_data}}. Összevont munkafüzetben a módonkénti lapok elejére
+    egy Account oszlop kerül, és minden számla egy-egy sor a számlák közötti Összesítőben.
+    Visszatérés: (report_data, sheet_format_configs).
+    """
+    offset = 1 if consolidated else 0
+    report_data = {"Összesítő": pd.DataFrame(
+        [account_totals(account, reports) for account, reports in accounts.items()], columns=SUMMARY_COLUMNS
+    )}
+    if len(accounts) > 1:
+        total = report_data["Összesítő"].drop(columns="Account").sum()
+        report_data["Összesítő"].loc[len(report_data["Összesítő"])] = {"Account": "Összesen", **total}
+    formats = dict(SHEET_FORMAT_CONFIGS_BATCH_SUMMARY)
+
+    for mode in PROCESSORS:
+        sheets = {}
+        for account, reports in accounts.items():
+            if mode not in reports:
+                continue
+            for sheet_name, df in reports[mode].items():
+                if consolidated:
+                    df = df.copy()
+                    df.insert(0, "Account", account)
+                sheets.setdefault(sheet_name, []).append(df)
+        if not sheets:
+            continue
+        prefix = SHEET_PREFIXES[mode]
+        for sheet_name, frames in sheets.items():
+            report_data[f"{prefix} {sheet_name}"] = pd.concat(frames, ignore_index=True)
+        formats.update(shift_formats(sheet_formats[mode], prefix, offset))
+    return report_data, formats
+
+
+def run_batch(jobs: list, max_workers: int = None, offline: bool = False, chunksize: int = None,
+              lot_method: str = "fifo", consolidated: bool = False, output_dir: str = ".",
+              output_format: str = "xlsx", stats_format: str = None, rates_file: str = None,
+              incremental: bool = False, allow_missing: bool = False) -> bool:
+    """Feldolgozza a kimutatásokat (max_workers > 1 esetén folyamatkészleten párhuzamosan),
+    és számlánként, vagy egyetlen összevont munkafüzetbe írja a riportokat (output_format formátumban).
+    stats_format ("text" / "json") megadása esetén a végén kiírja a futási statisztikát.
+    rates_file: előre letöltött árfolyam fájl az MNB szolgáltatás helyett (lásd rate_provider.FileRateProvider).
+    incremental: kimutatásonként csak a legutóbbi futás óta hozzáfűzött sorok feldolgozása (az állapot a
+    kimutatás melletti <fájl>.state fájlban).
+    allow_missing: hiányzó árfolyam esetén a kimutatás kihagyása helyett a korábbi működés (lásd
+    tax_wizard.attach_exchange_rates).
+    Visszatérés: igaz, ha minden kimutatás feldolgozása sikerült.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    results = {}
+    failed = []
+
+    exchange_service = open_exchange_service(rates_file, offline, allow_missing)
+    if max_workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            try:
+                results[job] = build_report(job[1], job[2], exchange_service, chunksize, lot_method,
+                                            job_state_file(job, incremental))
+            except RateUnavailableError as e:
+                print(f"Hiba: {job[2]}: {e}")
+                failed.append(job)
+    else:
+        try:
+            # Árfolyam fájl esetén nincs közös cache, amit elő lehetne melegíteni; inkrementális módban
+            # a teljes kimutatások beolvasása épp az, amit el akarunk kerülni
+            if not rates_file and not incremental:
+                warm_cache(jobs, exchange_service)
+        except RateUnavailableError as e:
+            # Offline módban a hiányzó árfolyamokat a munkafolyamatok kimutatásonként jelzik
+            print(f"Figyelem: {e}")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+            futures = {
+                executor.submit(run_job, job, offline, chunksize, lot_method, rates_file, incremental,
+                                allow_missing): job
+                for job in jobs
+            }
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    _, _, report_data, sheet_format, job_stats = future.result()
+                    results[job] = (report_data, sheet_format)
+                    stats.merge(job_stats)
+                except RateUnavailableError as e:
+                    print(f"Hiba: {job[2]}: {e}")
+                    failed.append(job)
+
+    # A riportok a manifest sorrendjében, számlánként és módonként összefűzve
+    accounts = {}
+    sheet_formats = {}
+    for job in jobs:
+        if job not in results:
+            continue
+        account, mode, _ = job
+        report_data, sheet_format = results[job]
+        accounts.setdefault(account, {}).setdefault(mode, []).append(report_data)
+        sheet_formats[mode] = sheet_format
+    accounts = {
+        account: {mode: merge_reports(reports) for mode, reports in modes.items()}
+        for account, modes in accounts.items()
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    with stats.stage("write"):
+        if consolidated:
+            if accounts:
+                report_data, formats = build_workbook(accounts, sheet_formats, consolidated=True)
+                report_generator(output_format, os.path.join(output_dir, "consolidated_report")).generate(
+                    report_data, sheet_format_configs=formats
+                )
+        else:
+            for account, reports in accounts.items():
+                report_data, formats = build_workbook({account: reports}, sheet_formats, consolidated=False)
+                report_generator(output_format, os.path.join(output_dir, f"{account}_report")).generate(
+                    report_data, sheet_format_configs=formats
+                )
+    stats.flush_warnings()
+    if stats_format:
+        # A szülőfolyamat (soros feldolgozás, cache előmelegítés) MNB számlálói a munkafolyamatokéhoz adódnak
+        stats.report(stats_format, exchange_service)
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Több számla több kimutatásának párhuzamos feldolgozása egy manifest vagy könyvtár alapján."
+    )
+    required = parser.add_argument_group("required arguments")
+    source = required.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--manifest",
+        dest="manifest",
+        type=str,
+        help="CSV manifest account, mode, file oszlopokkal (a mode üresen hagyható, ekkor a fejlécből ismeri fel).",
+    )
+    source.add_argument(
+        "--dir",
+        dest="directory",
+        type=str,
+        help="Könyvtár, amelyben számlánként egy alkönyvtár tartalmazza a kimutatásokat.",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="Párhuzamos folyamatok száma (alapértelmezés: a processzormagok száma).",
+    )
+    parser.add_argument(
+        "--consolidate",
+        action="store_true",
+        help="Egyetlen összevont munkafüzet a számlák közötti Összesítővel (alapértelmezés: számlánként egy munkafüzet).",
+    )
+    parser.add_argument(
+        "-o", "--output-dir",
+        dest="output_dir",
+        type=str,
+        default=".",
+        help="A generált Excel fájlok könyvtára.",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=list(REPORT_GENERATORS),
+        default="xlsx",
+        help="Kimeneti formátum: Excel munkafüzet, munkalaponként CSV / Parquet fájl, vagy egyetlen JSON dokumentum.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Csak a helyi árfolyam cache-t használja; hiányzó árfolyam esetén az érintett kimutatás kimarad.",
+    )
+    parser.add_argument(
+        "--allow-missing-rates",
+        dest="allow_missing_rates",
+        action="store_true",
+        help="Hiányzó MNB árfolyam esetén a kimutatás kihagyása helyett figyelmeztetés, a kötések 0, a jövedelmek 1 "
+             "értékkel számolva (a korábbi működés).",
+    )
+    parser.add_argument(
+        "--rates-file",
+        dest="rates_file",
+        type=str,
+        default=None,
+        help="Előre letöltött árfolyamok (csv: date,currency,rate; json; vagy az MNB XML válasza) az MNB szolgáltatás helyett.",
+    )
+    parser.add_argument(
+        "--lot-method",
+        dest="lot_method",
+        choices=LOT_METHODS,
+        default="fifo",
+        help="Realizált PnL számítása: tételes FIFO/LIFO párosítás, vagy a korábbi tickerenkénti összesítés (aggregate).",
+    )
+    parser.add_argument(
+        "--chunksize",
+        dest="chunksize",
+        type=int,
+        default=None,
+        help="Streaming mód: a CSV-ket ennyi soros darabokban dolgozza fel (nagy kimutatásokhoz).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Inkrementális mód: kimutatásonként csak a legutóbbi futás óta hozzáfűzött sorokat dolgozza fel "
+             "(az állapot a kimutatás melletti <fájl>.state fájlban).",
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        default=None,
+        help="Futási statisztika a végén, az összes kimutatásra összesítve (text vagy json).",
+    )
+
+    args = parser.parse_args()
+    source = args.manifest or args.directory
+    if not os.path.exists(source):
+        sys.exit(f"{source} file not found.")
+
+    if args.rates_file and not os.path.exists(args.rates_file):
+        sys.exit(f"{args.rates_file} file not found.")
+
+    if unavailable_format(args.output_format):
+        sys.exit(unavailable_format(args.output_format))
+
+    jobs = read_manifest(source)
+    if not jobs:
+        sys.exit("Nincs feldolgozható kimutatás.")
+
+    ok = run_batch(jobs, args.jobs, args.offline, args.chunksize, args.lot_method, args.consolidate, args.output_dir,
+                   args.output_format, args.stats, args.rates_file, args.incremental, args.allow_missing_rates)
+    if not ok:
+        sys.exit("Egyes kimutatások feldolgozása sikertelen volt.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Helyi MNB GetExchangeRates SOAP szolgáltatás a benchmarkokhoz (hálózat nélküli futtatáshoz).
+
+A WSDL a /arfolyamok.asmx?wsdl címen érhető el, a SOAP kérések a /arfolyamok.asmx címre mennek.
+Minden SOAP válasz előtt `latency` másodpercet vár. Az árfolyamok determinisztikusak, a hétvégéken
+és a magyar munkaszüneti napokon nincs publikáció. Megbízhatatlan hálózat szimulálásához a SOAP
+kérések `error_rate` hányadára (rögzített véletlen sorozat szerint) HTTP 503 a válasz. A /stats
+címen JSON-ban adja vissza a kérések számát, a hibás válaszokat és a küldött bájtokat.
+
+Önálló futtatás: python benchmarks/fake_mnb.py --port 8765 --latency 0.05 --error-rate 0.2
+"""
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+NAMESPACE = "http://www.mnb.hu/webservices/"
+
+# A hónap-nap alakú magyar munkaszüneti napok (a mozgó ünnepek nélkül)
+HOLIDAYS = {(1, 1), (3, 15), (5, 1), (8, 20), (10, 23), (11, 1), (12, 25), (12, 26)}
+
+BASE_RATES = {"EUR": 390.0, "USD": 355.0, "GBP": 450.0, "CHF": 400.0, "JPY": 2.4, "PLN": 90.0}
+
+WSDL_TEMPLATE = """<?xml version="1.0" encoding="utf-8"?>
+<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/"
+    xmlns:s="http://www.w3.org/2001/XMLSchema" xmlns:tns="{ns}" targetNamespace="{ns}">
+  <wsdl:types>
+    <s:schema elementFormDefault="qualified" targetNamespace="{ns}">
+      <s:element name="GetExchangeRates">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="0" name="startDate" type="s:string"/>
+          <s:element minOccurs="0" name="endDate" type="s:string"/>
+          <s:element minOccurs="0" name="currencyNames" type="s:string"/>
+        </s:sequence></s:complexType>
+      </s:element>
+      <s:element name="GetExchangeRatesResponse">
+        <s:complexType><s:sequence>
+          <s:element minOccurs="0" name="GetExchangeRatesResult" type="s:string"/>
+        </s:sequence></s:complexType>
+      </s:element>
+    </s:schema>
+  </wsdl:types>
+  <wsdl:message name="GetExchangeRatesSoapIn"><wsdl:part name="parameters" element="tns:GetExchangeRates"/></wsdl:message>
+  <wsdl:message name="GetExchangeRatesSoapOut"><wsdl:part name="parameters" element="tns:GetExchangeRatesResponse"/></wsdl:message>
+  <wsdl:portType name="MNBArfolyamServiceSoap">
+    <wsdl:operation name="GetExchangeRates">
+      <wsdl:input message="tns:GetExchangeRatesSoapIn"/>
+      <wsdl:output message="tns:GetExchangeRatesSoapOut"/>
+    </wsdl:operation>
+  </wsdl:portType>
+  <wsdl:binding name="MNBArfolyamServiceSoap" type="tns:MNBArfolyamServiceSoap">
+    <soap:binding transport="http://schemas.xmlsoap.org/soap/http"/>
+    <wsdl:operation name="GetExchangeRates">
+      <soap:operation soapAction="{ns}GetExchangeRates" style="document"/>
+      <wsdl:input><soap:body use="literal"/></wsdl:input>
+      <wsdl:output><soap:body use="literal"/></wsdl:output>
+    </wsdl:operation>
+  </wsdl:binding>
+  <wsdl:service name="MNBArfolyamService">
+    <wsdl:port name="MNBArfolyamServiceSoap" binding="tns:MNBArfolyamServiceSoap">
+      <soap:address location="{address}"/>
+    </wsdl:port>
+  </wsdl:service>
+</wsdl:definitions>
+"""
+
+RESPONSE_TEMPLATE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Body>'
+    '<GetExchangeRatesResponse xmlns="{ns}"><GetExchangeRatesResult>{result}</GetExchangeRatesResult>'
+    '</GetExchangeRatesResponse></s:Body></s:Envelope>'
+)
+
+
+def is_publication_day(day: date) -> bool:
+    return day.weekday() < 5 and (day.month, day.day) not in HOLIDAYS
+
+
+def rate_for(currency: str, day: date) -> float:
+    """Determinisztikus, lassan változó árfolyam (a valódihoz hasonló nagyságrendben)."""
+    base = BASE_RATES.get(currency, 100.0)
+    return round(base * (1 + 0.05 * math.sin(day.toordinal() / 90.0)), 2)
+
+
+def exchange_rates_xml(start: str, end: str, currencies) -> str:
+    """A GetExchangeRatesResult tartalma az MNB formátumában (tizedesvesszővel)."""
+    day = datetime.strptime(start, "%Y-%m-%d").date()
+    last = datetime.strptime(end, "%Y-%m-%d").date()
+    parts = ["<MNBExchangeRates>"]
+    while day <= last:
+        if is_publication_day(day):
+            parts.append(f'<Day date="{day.isoformat()}">')
+            for currency in currencies:
+                value = f"{rate_for(currency, day):.2f}".replace(".", ",")
+                parts.append(f'<Rate unit="1" curr="{currency}">{value}</Rate>')
+            parts.append("</Day>")
+        day += timedelta(days=1)
+    parts.append("</MNBExchangeRates>")
+    return "".join(parts)
+
+
+class FakeMNBServer:
+    """A szolgáltatás egy háttérszálon futó HTTP szerveren; a port 0 esetén szabadon választott."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(0)
+        self.soap_calls = 0
+        self.soap_errors = 0
+        self.wsdl_calls = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/arfolyamok.asmx"
+
+    @property
+    def wsdl_url(self) -> str:
+        return self.address + "?wsdl"
+
+    @property
+    def stats_url(self) -> str:
+        return self.address.rsplit("/", 1)[0] + "/stats"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"soap_calls": self.soap_calls, "soap_errors": self.soap_errors, "wsdl_calls": self.wsdl_calls,
+                    "bytes_sent": self.bytes_sent}
+
+    def _fail(self) -> bool:
+        """Igaz, ha a kérésre hibával kell válaszolni (error_rate szerint)."""
+        with self._lock:
+            if not self.error_rate or self._random.random() >= self.error_rate:
+                return False
+            self.soap_errors += 1
+            return True
+
+    def _count(self, kind: str, size: int) -> None:
+        # A /stats lekérdezések nem számítanak bele a mért forgalomba
+        if kind == "stats":
+            return
+        with self._lock:
+            if kind == "soap":
+                self.soap_calls += 1
+            elif kind == "wsdl":
+                self.wsdl_calls += 1
+            self.bytes_sent += size
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive kapcsolatok, mint a valódi szolgáltatásnál
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str, kind: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server._count(kind, len(body))
+
+            def do_GET(self):
+                if self.path.endswith("/stats"):
+                    self._send(json.dumps(server.stats()).encode(), "application/json", "stats")
+                elif self.path.lower().endswith("?wsdl"):
+                    body = WSDL_TEMPLATE.format(ns=NAMESPACE, address=server.address).encode("utf-8")
+                    self._send(body, "text/xml; charset=utf-8", "wsdl")
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                request = ET.fromstring(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                params = {el.tag.rsplit("}", 1)[-1]: (el.text or "") for el in request.iter()}
+                currencies = [c.strip().upper() for c in params.get("currencyNames", "").split(",") if c.strip()]
+                result = exchange_rates_xml(params["startDate"], params["endDate"], currencies)
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._fail():
+                    return self.send_error(503)
+                body = RESPONSE_TEMPLATE.format(ns=NAMESPACE, result=escape(result)).encode("utf-8")
+                self._send(body, "text/xml; charset=utf-8", "soap")
+
+        return Handler
+
+    def start(self) -> "FakeMNBServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Helyi MNB GetExchangeRates szolgáltatás benchmarkokhoz.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="Várakozás SOAP válaszonként (másodperc).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="A HTTP 503-mal megválaszolt SOAP kérések aránya.")
+    args = parser.parse_args()
+    server = FakeMNBServer(port=args.port, latency=args.latency, error_rate=args.error_rate)
+    print(f"WSDL: {server.wsdl_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Szintetikus kimutatások generálása a brókerek CSV formátumában (1 ezer - 1 millió sor).
+
+    python benchmarks/generate_statements.py --kind all --rows 100000 --out /tmp/statements
+
+A sorok véletlenszerűek, de egy adott seed mellett determinisztikusak. Az eladások mennyisége
+sosem haladja meg a (ticker, deviza) szerint addig vett mennyiséget, így a lot párosítás minden
+eladáshoz talál vételt (nincs "vásárlás nélküli eladás" figyelmeztetés). A devizaváltások
+mindkét lába szerepel a számlakivonatban, így minden láb párosul.
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "VWCE", "IWDA", "EUNL",
+           "SXR8", "VUSA", "CSPX", "EQQQ", "IS3N", "ASML", "SAP", "NOVO", "KO", "PEP"]
+CURRENCIES = ["USD", "EUR"]
+SAVINGS_CURRENCIES = [("GBP", "£"), ("EUR", "€"), ("USD", "$")]
+# Devizaváltásokhoz: deviza -> hozzávetőleges HUF érték (a vett összeg ebből, ~1% eltéréssel)
+EXCHANGE_CURRENCIES = {"HUF": 1.0, "EUR": 390.0, "USD": 355.0, "GBP": 450.0}
+START = pd.Timestamp("2021-01-04 09:00:00")
+
+KINDS = ("lightyear", "revolut", "revolut_saving", "revolut_exchange")
+FILE_NAMES = {
+    "lightyear": "lightyear.csv",
+    "revolut": "revolut.csv",
+    "revolut_saving": "revolut_saving.csv",
+    "revolut_exchange": "revolut_account.csv",
+}
+
+
+def _timestamps(rng, rows: int, days: int) -> pd.Series:
+    """Időrendbe rendezett kötési időpontok munkaidőben, `days` napos időszakban."""
+    offsets = np.sort(rng.integers(0, days * 86400 // 3, rows))
+    day, seconds = np.divmod(offsets, 86400 // 3)
+    return pd.Series(START + pd.to_timedelta(day, unit="D") + pd.to_timedelta(seconds, unit="s"))
+
+
+def _cover_sells(types: np.ndarray, tickers: np.ndarray, currencies: np.ndarray, quantity: np.ndarray,
+                 sell_type: str, buy_types: tuple, decimals: int) -> None:
+    """Az eladások mennyiségét (időrendben, helyben) a (ticker, deviza) szerint addig vett mennyiségre
+    korlátozza; ha nincs mit eladni, az eladásból vétel (buy_types[0]) lesz.
+    """
+    held = {}
+    step = 10.0 ** -decimals
+    for i, kind in enumerate(types):
+        key = (tickers[i], currencies[i])
+        if kind in buy_types:
+            held[key] = held.get(key, 0.0) + quantity[i]
+        elif kind == sell_type:
+            available = np.floor(held.get(key, 0.0) / step) * step
+            if available < step:
+                types[i] = buy_types[0]
+                held[key] = held.get(key, 0.0) + quantity[i]
+            else:
+                quantity[i] = round(min(quantity[i], available), decimals)
+                held[key] = held[key] - quantity[i]
+
+
+def lightyear(rows: int, seed: int = 1, days: int = 1100) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    types = rng.choice(
+        ["Buy", "Sell", "Dividend", "Interest", "Deposit", "Distribution", "Withdrawal"],
+        size=rows, p=[0.45, 0.2, 0.12, 0.08, 0.08, 0.05, 0.02]
+    ).astype(object)
+    has_ticker = ~np.isin(types, ["Interest", "Deposit", "Withdrawal"])
+    tickers = np.where(has_ticker, rng.choice(TICKERS, size=rows), "")
+    currency = rng.choice(CURRENCIES, size=rows)
+    quantity = np.round(rng.uniform(0.1, 20, rows), 6)
+    _cover_sells(types, tickers, currency, quantity, "Sell", ("Buy", "Distribution"), 6)
+    price = np.round(rng.uniform(20, 600, rows), 2)
+    gross = np.round(quantity * price, 2)
+    income = np.round(rng.uniform(0.05, 25, rows), 2)
+    trade = np.isin(types, ["Buy", "Sell", "Distribution"])
+    fee = np.where(trade, 0.35, 0.0)
+    net = np.where(trade, np.where(types == "Sell", gross - fee, gross + fee), income)
+    return pd.DataFrame({
+        "Date": _timestamps(rng, rows, days).dt.strftime("%d/%m/%Y %H:%M:%S"),
+        "Reference": [f"LY-{i:09d}" for i in range(rows)],
+        "Ticker": tickers,
+        "ISIN": "",
+        "Type": types,
+        "Quantity": np.where(trade, quantity, np.nan),
+        "CCY": currency,
+        "Price/share": np.where(trade, price, np.nan),
+        "Gross Amount": np.where(trade, gross, income),
+        "FX Rate": "",
+        "Fee": fee,
+        "Net Amt.": np.round(net, 2),
+        "Tax Amt.": np.where(types == "Dividend", np.round(income * 0.15, 2), np.nan),
+    })
+
+
+def revolut(rows: int, seed: int = 1, days: int = 1100) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    types = rng.choice(
+        ["BUY - MARKET", "SELL - MARKET", "DIVIDEND", "CASH TOP-UP", "CUSTODY FEE"],
+        size=rows, p=[0.5, 0.2, 0.15, 0.1, 0.05]
+    ).astype(object)
+    currency = rng.choice(CURRENCIES, size=rows)
+    tickers = np.where(np.isin(types, ["CASH TOP-UP", "CUSTODY FEE"]), "", rng.choice(TICKERS, size=rows))
+    # Legfeljebb 8 értékes jegy, hogy a CSV-be írás (lásd write_statement) ne kerekítse
+    quantity = np.round(rng.uniform(0.01, 15, rows), 6)
+    _cover_sells(types, tickers, currency, quantity, "SELL - MARKET", ("BUY - MARKET",), 6)
+    trade = np.isin(types, ["BUY - MARKET", "SELL - MARKET"])
+    price = np.round(rng.uniform(20, 600, rows), 2)
+    amount = np.where(trade, quantity * price, rng.uniform(0.5, 500, rows))
+    amount = np.where(types == "CUSTODY FEE", -rng.uniform(0.1, 2, rows), amount)
+    prefix = pd.Series(currency) + " "
+    return pd.DataFrame({
+        "Date": _timestamps(rng, rows, days).dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "Ticker": tickers,
+        "Type": types,
+        "Quantity": np.where(trade, quantity, np.nan),
+        "Price per share": np.where(trade, prefix + pd.Series(price).map("{:,.2f}".format), ""),
+        "Total Amount": prefix + pd.Series(amount).map("{:,.2f}".format),
+        "Currency": currency,
+        "FX Rate": np.round(rng.uniform(1.05, 1.12, rows), 4),
+    })
+
+
+def revolut_saving(rows: int, seed: int = 1, days: int = 1100) -> pd.DataFrame:
+    """Kamatjóváírás és szolgáltatási díj devizánként, a legutóbbi nappal kezdve (mint az exportban);
+    nagy sorszámnál naponta több jóváírással, hogy az időszak legfeljebb `days` nap legyen.
+    """
+    rng = np.random.default_rng(seed)
+    per_day = 2 * len(SAVINGS_CURRENCIES)
+    blocks = -(-rows // per_day)
+    day_index = np.arange(blocks) * min(blocks, days) // blocks
+    end = pd.Timestamp("2024-12-31 02:21:51")
+    dates = np.repeat((end - pd.to_timedelta(day_index, unit="D")).strftime("%b %d, %Y, %-I:%M:%S %p"), per_day)
+    descriptions, values = [], []
+    for code, symbol in SAVINGS_CURRENCIES:
+        descriptions += [f"Service Fee Charged {code} Class IE0002RUHW32", f"Interest PAID {code} Class R IE0002RUHW32"]
+        values += [("-" + symbol, 0.02, 0.04), (symbol, 0.1, 0.9)]
+    desc = np.tile(descriptions, blocks)
+    amounts = np.concatenate([rng.uniform(low, high, (blocks, 1)) for _, low, high in values], axis=1).ravel()
+    prefixes = np.tile([prefix for prefix, _, _ in values], blocks)
+    df = pd.DataFrame({
+        "Date": dates,
+        "Description": desc,
+        "Value": pd.Series(prefixes) + pd.Series(amounts).map("{:.4f}".format),
+        "Price per share": "",
+        "Quantity of shares": "",
+    })
+    return df.head(rows)
+
+
+def revolut_exchange(rows: int, seed: int = 1, days: int = 1100) -> pd.DataFrame:
+    """Revolut számlakivonat: soronként két láb, devizaváltásnál az eladott (negatív) és a vett
+    (pozitív) deviza EXCHANGE sora azonos Started Date értékkel, egyébként feltöltés és kártyás fizetés.
+    """
+    rng = np.random.default_rng(seed)
+    events = -(-rows // 2)
+    exchange = rng.random(events) < 0.7
+    # Két különböző deviza: a vett deviza indexe az eladotthoz képest 1..n-1 lépéssel eltolva
+    sold_index = rng.integers(0, len(EXCHANGE_CURRENCIES), events)
+    bought_index = (sold_index + rng.integers(1, len(EXCHANGE_CURRENCIES), events)) % len(EXCHANGE_CURRENCIES)
+    codes, values = np.array(list(EXCHANGE_CURRENCIES)), np.array(list(EXCHANGE_CURRENCIES.values()))
+    sold_ccy, bought_ccy = codes[sold_index], codes[bought_index]
+    sold = np.round(rng.uniform(10, 2000, events), 2)
+    bought = np.round(sold * values[sold_index] / values[bought_index] * rng.uniform(0.98, 1.0, events), 2)
+    fee = np.where(rng.random(events) < 0.2, np.round(sold * 0.005, 2), 0.0)
+    started = _timestamps(rng, events, days)
+    completed = started + pd.to_timedelta(rng.integers(1, 120, events), unit="s")
+    legs = pd.DataFrame({
+        "Type": np.where(exchange, "EXCHANGE", "TOPUP"),
+        "Product": "Current",
+        "Started Date": started.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "Completed Date": completed.dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "Description": np.where(exchange, "Exchanged to " + bought_ccy, "Top-up by *1234"),
+        "Amount": np.where(exchange, -sold, sold),
+        "Fee": np.where(exchange, fee, 0.0),
+        "Currency": sold_ccy,
+        "State": "COMPLETED",
+    })
+    other = legs.assign(
+        Type=np.where(exchange, "EXCHANGE", "CARD_PAYMENT"),
+        Description=np.where(exchange, "Exchanged to " + bought_ccy, "Webshop"),
+        Amount=np.where(exchange, bought, -np.round(sold * 0.3, 2)),
+        Fee=0.0,
+        Currency=np.where(exchange, bought_ccy, sold_ccy),
+    )
+    df = pd.concat([legs, other]).sort_index(kind="stable").reset_index(drop=True)
+    df["Balance"] = ""
+    return df.head(rows)
+
+
+GENERATORS = {
+    "lightyear": lightyear,
+    "revolut": revolut,
+    "revolut_saving": revolut_saving,
+    "revolut_exchange": revolut_exchange,
+}
+
+
+def write_statement(kind: str, rows: int, path: str, seed: int = 1) -> str:
+    GENERATORS[kind](rows, seed).to_csv(path, index=False, float_format="%.8g")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Szintetikus Lightyear / Revolut / Revolut megtakarítás / devizaváltás kimutatások."
+    )
+    parser.add_argument("--kind", choices=KINDS + ("all",), default="all")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=".", help="Kimeneti könyvtár.")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for kind in (KINDS if args.kind == "all" else (args.kind,)):
+        path = write_statement(kind, args.rows, os.path.join(args.out, FILE_NAMES[kind]), args.seed)
+        print(f"{kind}: {args.rows} sor -> {path}")
+
+if __name__ == "__main__":
+    main()
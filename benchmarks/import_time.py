@@ -0,0 +1,125 @@
+"""Indulási idő ellenőrzés: a parancssori belépési pontok nem tölthetik be a nehéz könyvtárakat.
+
+    python benchmarks/import_time.py --repeat 5 --top 10
+
+Minden esetet (a modulok importja, --help, hibás argumentum, hiányzó kimutatás) külön Python
+folyamatban futtat, és ellenőrzi, hogy a pandas, numpy, openpyxl és zeep ténylegesen nem töltődött
+be (a lazy_imports által regisztrált, még végre nem hajtott modul nem számít betöltöttnek), illetve
+hogy az indulás legfeljebb STARTUP_BUDGET_S másodperccel lassabb az üres értelmezőnél.
+Regresszió esetén nem nulla kóddal lép ki. Hálózatot nem használ.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Ezeket a könyvtárakat csak az őket használó kódutak tölthetik be
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "zeep")
+
+# Az üres értelmezőhöz képest megengedett többlet indulási idő (másodperc); a nehéz könyvtárak
+# betöltése önmagában ennek többszöröse
+STARTUP_BUDGET_S = 0.25
+
+# (név, parancssori argumentumok; None: csak a modulok importja)
+CASES = [
+    ("import", None),
+    ("--help", ["tax_wizard.py", "--help"]),
+    ("hibás argumentum", ["tax_wizard.py", "-m", "ismeretlen"]),
+    ("hiányzó kimutatás", ["tax_wizard.py", "-m", "lightyear", "-f", "nincs_ilyen_kimutatas.csv"]),
+    ("server --help", ["server.py", "--help"]),
+    ("batch --help", ["batch.py", "--help"]),
+    ("batch hiányzó fájl", ["batch.py", "--manifest", "nincs_ilyen_manifest.csv"]),
+]
+
+# A gyermek folyamat: lefuttatja az esetet, majd kiírja a ténylegesen betöltött nehéz könyvtárakat.
+# Egy késleltetve regisztrált csomag almoduljai (pl. pandas.core) csak a végrehajtása után jelennek meg.
+CHILD_CODE = """
+import sys, json, runpy
+argv, heavy = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+try:
+    if argv is None:
+        import tax_wizard, server, batch
+    else:
+        sys.argv = argv
+        runpy.run_path(argv[0], run_name="__main__")
+except SystemExit:
+    pass
+loaded = [name for name in heavy if any(module.startswith(name + ".") for module in sys.modules)]
+sys.stdout = sys.__stdout__
+print("\\n" + json.dumps(loaded))
+"""
+
+
+def _run(args: list, env: dict) -> tuple:
+    """Egy Python folyamat futtatása a projekt könyvtárában; visszatérés: (falióra-idő, kimenet)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, result
+
+
+def measure(argv, repeat: int, env: dict) -> dict:
+    """Az eset legjobb ideje repeat futásból és a betöltött nehéz könyvtárak."""
+    best, loaded = None, None
+    for _ in range(repeat):
+        elapsed, result = _run(["-c", CHILD_CODE, json.dumps(argv), json.dumps(HEAVY_MODULES)], env)
+        if result.returncode != 0:
+            raise RuntimeError(f"A mérés sikertelen ({argv}): {result.stderr.strip()}")
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+        best = elapsed if best is None else min(best, elapsed)
+    return {"time_s": best, "loaded": loaded}
+
+
+def print_top_imports(count: int, env: dict) -> None:
+    """A legdrágább (kumulatív) importok a -X importtime kimenete alapján."""
+    _, result = _run(["-X", "importtime", "-c", "import tax_wizard"], env)
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    print("\nA legdrágább importok (import tax_wizard, kumulatív):")
+    for cumulative, name in sorted(rows, reverse=True)[:count]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A parancssori belépési pontok indulási idejének ellenőrzése.")
+    parser.add_argument("--repeat", type=int, default=5, help="Esetenként ennyi futás legjobb idejét vesszük.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S,
+                        help=f"Megengedett többlet az üres értelmezőhöz képest (másodperc, alapértelmezés: {STARTUP_BUDGET_S}).")
+    parser.add_argument("--top", type=int, default=0, help="A legdrágább importok kiírása (-X importtime).")
+    args = parser.parse_args()
+
+    # Saját, üres HOME: a cache könyvtár létrehozása ne a felhasználóét érintse
+    env = dict(os.environ, HOME=tempfile.mkdtemp(prefix="tax_wizard_import_"), PYTHONPATH=ROOT_DIR)
+    baseline = min(_run(["-c", "pass"], env)[0] for _ in range(args.repeat))
+    print(f"{'eset':<20} {'idő (s)':>8} {'többlet (s)':>12}  betöltött nehéz könyvtárak")
+    print(f"{'üres értelmező':<20} {baseline:>8.3f} {'':>12}")
+
+    failures = []
+    for name, argv in CASES:
+        result = measure(argv, args.repeat, env)
+        overhead = result["time_s"] - baseline
+        print(f"{name:<20} {result['time_s']:>8.3f} {overhead:>12.3f}  {', '.join(result['loaded']) or '-'}")
+        if result["loaded"]:
+            failures.append(f"{name}: betöltött nehéz könyvtárak: {', '.join(result['loaded'])}")
+        if overhead > args.budget:
+            failures.append(f"{name}: {overhead:.3f} s többlet (keret: {args.budget:.3f} s)")
+
+    if args.top:
+        print_top_imports(args.top, env)
+    if failures:
+        print("\nIndulási regresszió:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nRendben.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Benchmark: a processzorok és az Excel generálás költsége szakaszonként, hideg és meleg cache mellett.
+
+    python benchmarks/run_benchmarks.py --rows 1000,10000,100000 --latency 0.05
+
+Minden (kimutatás típus, sorszám) párra szintetikus kimutatást generál (generate_statements.py), és
+egy helyi MNB szolgáltatás (fake_mnb.py) ellen két külön folyamatban futtatja a feldolgozást: először
+üres (hideg), majd az első futás által feltöltött (meleg) árfolyam cache-sel. Szakaszonként méri a
+falióra-időt, a folyamat addigi csúcs memóriahasználatát (peak RSS) és a SOAP hívások számát.
+Hálózatot nem használ.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import resource
+import subprocess
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_mnb import FakeMNBServer
+from generate_statements import KINDS, FILE_NAMES, write_statement
+
+# Helyi szerverhez nem használunk proxyt
+os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+# A gyermek folyamat eredménye a kimenet ezzel kezdődő sorában (a többi kiírás ettől elválik)
+RESULT_MARKER = "@@tax_wizard_benchmark@@ "
+
+
+def _peak_rss_mb() -> float:
+    # Linuxon KiB, macOS-en bájt
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _server_stats(stats_url: str) -> dict:
+    with urllib.request.urlopen(stats_url) as response:
+        return json.loads(response.read())
+
+
+def run_child(kind: str, csv_file: str, cache_dir: str, wsdl_url: str, stats_url: str) -> list:
+    """Egy feldolgozás mérése a jelenlegi folyamatban. Szakaszok:
+    load (CSV beolvasás és árfolyam prefetch), process (to_report), write (Excel generálás).
+    """
+    from rate_cache import SQLiteRateStore
+    from mnb_exchange_service import MNBExchangeService
+    import tax_wizard
+    from tax_wizard import REPORT_FILES, report_generator, sheet_format_for
+
+    store = SQLiteRateStore(os.path.join(cache_dir, "rates.sqlite3"), legacy_json=None)
+    service = MNBExchangeService(wsdl_url=wsdl_url, store=store,
+                                 wsdl_cache_file=os.path.join(cache_dir, "mnb_arfolyamok.wsdl"))
+    results = []
+    processors = {
+        "lightyear": tax_wizard.LightyearProcessor,
+        "revolut": tax_wizard.RevolutProcessor,
+        "revolut_saving": tax_wizard.RevolutSavingsProcessor,
+        # A devizaváltás feldolgozó a konstruktorban nem olvas: a beolvasás és az árfolyamok a process szakaszban
+        "revolut_exchange": tax_wizard.RevolutExchangeProcessor,
+    }
+
+    def measure(stage, func):
+        before = _server_stats(stats_url)
+        start = time.perf_counter()
+        value = func()
+        wall = time.perf_counter() - start
+        after = _server_stats(stats_url)
+        results.append({
+            "stage": stage,
+            "wall_s": round(wall, 4),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "soap_calls": after["soap_calls"] - before["soap_calls"],
+            "wsdl_calls": after["wsdl_calls"] - before["wsdl_calls"],
+            "bytes": after["bytes_sent"] - before["bytes_sent"],
+        })
+        return value
+
+    processor = measure("load", lambda: processors[kind](csv_file, service))
+    report_data = measure("process", processor.to_report)
+    sheet_format = sheet_format_for(kind)
+    output_base = os.path.join(cache_dir, REPORT_FILES[kind])
+    measure("write", lambda: report_generator("xlsx", output_base).generate(report_data, sheet_format))
+    service.flush()
+    return results
+
+
+def run_case(kind: str, rows: int, work_dir: str, server: FakeMNBServer) -> list:
+    """Egy (típus, sorszám) eset hideg és meleg cache-sel, külön folyamatokban."""
+    csv_file = write_statement(kind, rows, os.path.join(work_dir, f"{rows}_{FILE_NAMES[kind]}"))
+    cache_dir = tempfile.mkdtemp(prefix=f"cache_{kind}_{rows}_", dir=work_dir)
+    rows_out = []
+    for cache in ("cold", "warm"):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", kind, csv_file, cache_dir,
+             server.wsdl_url, server.stats_url],
+            check=True, capture_output=True, text=True
+        ).stdout
+        payload = [line for line in output.splitlines() if line.startswith(RESULT_MARKER)]
+        if not payload:
+            raise RuntimeError(f"A mérés nem adott eredményt ({kind}, {rows} sor, {cache}): {output.strip()}")
+        stages = json.loads(payload[-1][len(RESULT_MARKER):])
+        for stage in stages:
+            rows_out.append({"kind": kind, "rows": rows, "cache": cache, **stage})
+    return rows_out
+
+
+def print_table(results: list) -> None:
+    header = f"{'kind':<15}{'rows':>9} {'cache':<6}{'stage':<9}{'wall_s':>9}{'peak_rss_mb':>13}{'soap':>6}{'bytes':>11}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['kind']:<15}{r['rows']:>9} {r['cache']:<6}{r['stage']:<9}{r['wall_s']:>9.3f}"
+              f"{r['peak_rss_mb']:>13.1f}{r['soap_calls']:>6}{r['bytes']:>11}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        kind, csv_file, cache_dir, wsdl_url, stats_url = sys.argv[2:7]
+        # A feldolgozás saját kiírásai ne keveredjenek a mérési eredménnyel
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                results = run_child(kind, csv_file, cache_dir, wsdl_url, stats_url)
+            finally:
+                sys.stdout = stdout
+        print(RESULT_MARKER + json.dumps(results), flush=True)
+        return
+
+    parser = argparse.ArgumentParser(description="Processzor és Excel benchmark helyi MNB szolgáltatással.")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="Vesszővel elválasztott kimutatás típusok.")
+    parser.add_argument("--rows", default="1000,10000,100000", help="Vesszővel elválasztott sorszámok.")
+    parser.add_argument("--latency", type=float, default=0.05, help="A helyi SOAP szolgáltatás késleltetése (másodperc).")
+    parser.add_argument("--json", dest="json_file", default=None, help="Az eredmények mentése JSON fájlba.")
+    parser.add_argument("--work-dir", default=None, help="A generált kimutatások és cache-ek könyvtára.")
+    args = parser.parse_args()
+
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    sizes = [int(n) for n in args.rows.split(",") if n.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="tax_wizard_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    with FakeMNBServer(latency=args.latency) as server:
+        for kind in kinds:
+            for rows in sizes:
+                results.extend(run_case(kind, rows, work_dir, server))
+
+    print_table(results)
+    if args.json_file:
+        with open(args.json_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,20 @@ SHEET_FORMAT_CONFIGS = {
     }
 }
 
+# Tételes (FIFO/LIFO) párosítás esetén a Realizált PnL lotonkénti, a Nyitott Pozíciók mennyiséggel bővül
+SHEET_FORMAT_CONFIGS_LOTS = {
+    **SHEET_FORMAT_CONFIGS,
+    "Realizált PnL": {
+        # Quantity, Buy/Sell Sum (FC), Realized PnL (FC), Buy/Sell Rate
+        "number_format": [(3,), (6,), (7,), (8,), (9,), (10,)],
+        "huf_format": [(11,), (12,), (13,)]
+    },
+    "Nyitott Pozíciók": {
+        "number_format": [(3,), (4,)],
+        "huf_format": [(5,)]
+    }
+}
+
 SHEET_FORMAT_CONFIGS_REVOLUT_SAVINGS = {
     "Megtakarítás": {
         # Tegyük fel, hogy a részletes riportban a 4. és 5. oszlopok tartalmazzák az eredeti és HUF értékeket
@@ -37,4 +51,24 @@ SHEET_FORMAT_CONFIGS_REVOLUT_SAVINGS = {
         "number_format": [(2, 3, 4, 8, )],
         "huf_format": [(5, 6, 7, 9, )]
     }
-}
\ No newline at end of file
+}
+
+SHEET_FORMAT_CONFIGS_REVOLUT_EXCHANGE = {
+    "Devizaváltás": {
+        # YearMonth, Pair, Exchanges, majd az eladott / vett összeg devizában és HUF-ban, és az átváltási különbözet
+        "number_format": [(4, 5)],
+        "huf_format": [(6, 7, 8)]
+    },
+    "Összesítő": {
+        # Pair, Exchanges, majd ugyanezek az oszlopok devizapáronként összesítve
+        "number_format": [(3, 4)],
+        "huf_format": [(5, 6, 7)]
+    }
+}
+
+# Kötegelt feldolgozás: a számlák közötti Összesítő (Account, majd a HUF összegek)
+SHEET_FORMAT_CONFIGS_BATCH_SUMMARY = {
+    "Összesítő": {
+        "huf_format": [(2, 3, 4, 5, 6, 7)]
+    }
+}
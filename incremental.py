@@ -0,0 +1,151 @@
+import os
+import pickle
+import hashlib
+import tempfile
+
+# Az állapotfájl formátumának verziója; eltérés esetén a kimutatást teljesen újrafeldolgozzuk
+# (2: az összesítő módszer gyűjtői DataFrame-ben, lásd lot_matching.fold_positions;
+#  3: a megtakarítási riport havi gyűjtői egész hónap kulccsal, lásd tax_wizard.month_keys)
+STATE_VERSION = 3
+
+# Az alapértelmezett állapotfájl a kimutatás mellett: <kimutatás>.state
+STATE_SUFFIX = ".state"
+
+# A kimutatás ujjlenyomatának számításakor ekkora blokkokban olvasunk
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def default_state_file(csv_file: str) -> str:
+    return csv_file + STATE_SUFFIX
+
+
+def load_state(path: str):
+    """A mentett állapot beolvasása; hiányzó vagy hibás fájl esetén None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+    except Exception as e:
+        print(f"Hiba az inkrementális állapot betöltésekor ({path}), teljes újrafeldolgozás:", e)
+        return None
+    if not isinstance(saved, dict) or saved.get("version") != STATE_VERSION:
+        print(f"Az inkrementális állapot ({path}) más verziójú, teljes újrafeldolgozás.")
+        return None
+    return saved
+
+
+def save_state(path: str, saved: dict) -> None:
+    """Az állapot kiírása (atomikus cserével)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tax_wizard_state.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class IncrementalRun:
+    """Egy hozzáfűzéssel bővülő (append-only) kimutatás inkrementális feldolgozása.
+    Az állapotfájl a legutóbb feldolgozott kimutatás ujjlenyomatát (a feldolgozott bájtok száma és
+    SHA-256 összege) és a processzor állapotát (lásd a processzorok new_state metódusát: tickerenkénti
+    gyűjtők, átváltott kötések, havi gyűjtők) tartalmazza. Ha a kimutatás eleje bájtra azonos a
+    legutóbb feldolgozottal, csak az utána következő (új) sorokat kell beolvasni és átváltani:
+    ezeket a fejléccel együtt egy ideiglenes fájlba (delta_file) írja, a processzor ezt dolgozza
+    fel a mentett állapotból (state) indulva. Eltérő mód, lot_method vagy megváltozott kimutatás
+    esetén a teljes kimutatást dolgozza fel üres állapotból (ekkor a delta_file maga a kimutatás).
+    Az ujjlenyomat ellenőrzése csak bájtok olvasása; a CSV értelmezése és az átváltás az új sorokra
+    korlátozódik.
+    Az állapotfájl pickle formátumú: csak a program által írt, helyi fájlt szabad megadni.
+    """
+
+    def __init__(self, csv_file: str, state_file: str = None, mode: str = None, lot_method: str = None):
+        self.csv_file = csv_file
+        self.state_file = state_file or default_state_file(csv_file)
+        self.key = {"mode": mode, "lot_method": lot_method}
+        self.state = None
+        self.offset = 0
+        self.size = 0
+        self.digest = None
+        self.delta_file = None
+
+    def __enter__(self):
+        saved = load_state(self.state_file)
+        if saved is not None and saved.get("key") != self.key:
+            print(f"Az inkrementális állapot ({self.state_file}) más beállításokkal (mód, lot-method) készült, "
+                  "teljes újrafeldolgozás.")
+            saved = None
+
+        # A fájl méretét egyszer rögzítjük: a futás közben hozzáfűzött sorok a következő futásra maradnak
+        self.size = os.path.getsize(self.csv_file)
+        hasher = hashlib.sha256()
+        with open(self.csv_file, "rb") as f:
+            if saved is not None and saved["size"] <= self.size:
+                self._hash(f, hasher, saved["size"])
+                if hasher.hexdigest() == saved["digest"]:
+                    self.state = saved["state"]
+                    self.offset = saved["size"]
+            if self.state is None:
+                if saved is not None:
+                    print(f"A kimutatás ({self.csv_file}) nem csak új sorokkal bővült, teljes újrafeldolgozás.")
+                # Teljes feldolgozás: a kimutatást közvetlenül olvassuk, csak az ujjlenyomatát számoljuk
+                hasher = hashlib.sha256()
+                f.seek(0)
+                self._hash(f, hasher, self.size)
+                self.delta_file = self.csv_file
+            else:
+                self.delta_file = self._write_delta(f, hasher)
+        self.digest = hasher.hexdigest()
+        if self.state is not None:
+            print(f"Inkrementális feldolgozás: {self.csv_file}, {self.size - self.offset} új bájt "
+                  f"(korábban feldolgozva: {self.offset} bájt)")
+        return self
+
+    def __exit__(self, *exc):
+        if self.delta_file != self.csv_file and os.path.exists(self.delta_file):
+            os.remove(self.delta_file)
+        self.delta_file = None
+
+    @staticmethod
+    def _hash(f, hasher, length: int) -> None:
+        while length > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, length))
+            if not block:
+                break
+            hasher.update(block)
+            length -= len(block)
+
+    def _write_delta(self, f, hasher) -> str:
+        """A kimutatás fejléce és az f aktuális pozíciójától a rögzített méretig tartó új bájtok egy
+        ideiglenes fájlba; az új bájtok a hasher-be is bekerülnek.
+        """
+        with open(self.csv_file, "rb") as header_file:
+            header = header_file.readline()
+        if not header.endswith(b"\n"):
+            header += b"\n"
+        fd, path = tempfile.mkstemp(prefix="tax_wizard_delta.", suffix=".csv")
+        with os.fdopen(fd, "wb") as out:
+            out.write(header)
+            remaining = self.size - f.tell()
+            while remaining > 0:
+                block = f.read(min(HASH_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                out.write(block)
+                remaining -= len(block)
+        return path
+
+    def save(self, state: dict) -> None:
+        """A processzor feldolgozás utáni állapotának mentése a kimutatás ujjlenyomatával."""
+        save_state(self.state_file, {
+            "version": STATE_VERSION,
+            "key": self.key,
+            "size": self.size,
+            "digest": self.digest,
+            "state": state,
+        })
@@ -0,0 +1,155 @@
+import sys
+import json
+import time
+import atexit
+import threading
+
+from contextlib import contextmanager
+
+# A feldolgozás szakaszai a kiírás sorrendjében
+STAGES = ("load", "filter", "convert", "aggregate", "write")
+
+# Figyelmeztetés kategóriánként ennyi példát írunk ki
+WARNING_EXAMPLES = 3
+
+
+class RunStats:
+    """Egy futás mérőszámai: szakaszonkénti idő (lásd STAGES), számlálók és kategóriánként
+    összesített figyelmeztetések. A soronkénti hibákat nem egyenként írjuk ki, hanem a
+    warn() gyűjti őket, és a flush_warnings() kategóriánként egy sorban jelenti.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.timings = {}
+            self.counters = {}
+            self.warnings = {}
+            # Kategóriánkénti darabszámok a kiírt (flush_warnings) figyelmeztetésekkel együtt
+            self.warning_totals = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, iterable, name: str):
+        """Az iterálás (pl. CSV darabok olvasása) idejét a name szakaszhoz adja."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - start)
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, value=1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def warn(self, category: str, example=None, count: int = 1) -> None:
+        """count darab (soronkénti) figyelmeztetés rögzítése; a kategória első néhány példáját
+        (example lehet egy érték, vagy példák listája) megőrzi.
+        """
+        examples = example if isinstance(example, (list, tuple)) else ([] if example is None else [example])
+        with self._lock:
+            entry = self.warnings.setdefault(category, [0, []])
+            entry[0] += count
+            self.warning_totals[category] = self.warning_totals.get(category, 0) + count
+            for example in examples[:WARNING_EXAMPLES - len(entry[1])]:
+                entry[1].append(str(example))
+
+    def flush_warnings(self) -> None:
+        """Kategóriánként egy sorban kiírja, majd törli az összegyűlt figyelmeztetéseket. A kimenet a
+        standard hiba, így nem keveredik a standard kimenetre írt gépi feldolgozásra szánt (pl. --stats
+        json) eredménnyel, akkor sem, ha a kiírás csak a program végén (atexit) történik.
+        """
+        with self._lock:
+            warnings, self.warnings = self.warnings, {}
+        for category, (count, examples) in warnings.items():
+            details = f" (pl. {', '.join(examples)})" if examples else ""
+            print(f"Figyelem: {category}: {count} eset{details}", file=sys.stderr)
+
+    def as_dict(self, exchange_service=None) -> dict:
+        """A mérőszámok JSON-ként kiírható alakban; az exchange_service számlálói "mnb" alatt."""
+        with self._lock:
+            data = {
+                "total_s": round(time.perf_counter() - self.started, 4),
+                "stages": {name: round(seconds, 4) for name, seconds in self.timings.items()},
+                "counters": dict(self.counters),
+                "warnings": dict(self.warning_totals),
+            }
+        if exchange_service is not None:
+            data["mnb"] = exchange_service.stats()
+        return data
+
+    def merge(self, data: dict) -> None:
+        """Egy másik folyamat (pl. kötegelt feldolgozás munkafolyamata) as_dict() eredményének hozzáadása.
+        A figyelmeztetéseknek csak a darabszáma kerül át (a másik folyamat már kiírta őket).
+        """
+        for name, seconds in data.get("stages", {}).items():
+            self.add_time(name, seconds)
+        for name, value in data.get("counters", {}).items():
+            self.count(name, value)
+        for name, value in data.get("mnb", {}).items():
+            if name.endswith("_max_s"):
+                with self._lock:
+                    self.counters[f"mnb.{name}"] = max(self.counters.get(f"mnb.{name}", 0), value)
+            else:
+                self.count(f"mnb.{name}", value)
+        with self._lock:
+            for category, count in data.get("warnings", {}).items():
+                self.warning_totals[category] = self.warning_totals.get(category, 0) + count
+
+    def report(self, output_format: str = "text", exchange_service=None) -> None:
+        """Összesítés kiírása: olvasható szövegként, vagy egyetlen JSON sorként."""
+        data = self.as_dict(exchange_service)
+        mnb = dict(data.pop("mnb", {}))
+        for name in [n for n in data["counters"] if n.startswith("mnb.")]:
+            key = name[4:]
+            value = data["counters"].pop(name)
+            mnb[key] = max(mnb.get(key, 0), value) if key.endswith("_max_s") else mnb.get(key, 0) + value
+        data["mnb"] = mnb
+        if output_format == "json":
+            print(json.dumps(data, ensure_ascii=False))
+            return
+
+        stages = sorted(data["stages"].items(), key=lambda item: (
+            STAGES.index(item[0]) if item[0] in STAGES else len(STAGES), item[0]
+        ))
+        print("Futási statisztika:")
+        print(f"  Teljes idő: {data['total_s']:.3f} mp")
+        if stages:
+            print("  Szakaszok: " + " | ".join(f"{name} {seconds:.3f} mp" for name, seconds in stages))
+        if mnb:
+            print(
+                f"  MNB: cache találat {mnb.get('cache_hits', 0)}, hiány {mnb.get('cache_misses', 0)}; "
+                f"SOAP hívás {mnb.get('soap_calls', 0)} (hiba {mnb.get('soap_errors', 0)}, "
+                f"újrapróbálkozás {mnb.get('soap_retries', 0)}, "
+                f"{mnb.get('soap_bytes', 0)} bájt, {mnb.get('soap_latency_s', 0):.3f} mp, "
+                f"max {mnb.get('soap_latency_max_s', 0):.3f} mp); "
+                f"árfolyam-hozzárendelés {mnb.get('lookups', 0)} sor, ebből árfolyam nélkül {mnb.get('lookups_missing', 0)}"
+            )
+        for name, value in sorted(data["counters"].items()):
+            print(f"  {name}: {value}")
+        if data["warnings"]:
+            print("  Figyelmeztetések: " + ", ".join(f"{c} ({n})" for c, n in data["warnings"].items()))
+
+
+# A folyamat közös mérője; a program végén a ki nem írt figyelmeztetéseket is jelenti
+stats = RunStats()
+atexit.register(stats.flush_warnings)
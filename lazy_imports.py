@@ -0,0 +1,32 @@
+import sys
+import importlib.util
+
+
+def lazy_import(name: str):
+    """A name modul késleltetett betöltése (importlib.util.LazyLoader): a visszaadott modul objektum
+    csak az első attribútum-hozzáféréskor tölti be ténylegesen a modult. Így a nehéz könyvtárak
+    (pandas, numpy) betöltését csak az azokat ténylegesen használó kódutak fizetik meg, a --help,
+    a hibás argumentumok vagy a hiányzó bemeneti fájl nem.
+    Ha a modul már be van töltve (vagy késleltetve regisztrálva), azt adja vissza.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def load(*names: str) -> None:
+    """A késleltetett modulok tényleges betöltése (pl. egy hosszan futó szerver indulásakor, hogy ne
+    az első kérés fizesse meg; Python 3.11 alatt a LazyLoader első betöltése nem szálbiztos).
+    """
+    for name in names:
+        module = lazy_import(name)
+        # Az első attribútum-hozzáférés végrehajtja a modult
+        getattr(module, "__name__")
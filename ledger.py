@@ -0,0 +1,66 @@
+import os
+import json
+import tempfile
+
+# A főkönyv fájl formátumának verziója
+LEDGER_VERSION = 1
+
+
+class PositionLedger:
+    """Több évet átfogó pozíció főkönyv (JSON): adóévenként az év végén nyitott tételek (lot) a
+    vétel napjával, mennyiségével, egységárával és HUF bekerülési értékével (lásd
+    lot_matching.LotMatcher.lots). Egy adóév feldolgozása a megelőző utolsó év végi állapotból
+    indul, így elég az adott év kimutatását feldolgozni, a korábbi vételeket nem kell újra átváltani.
+    A főkönyv egy párosítási módszerhez (fifo / lifo) tartozik.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.method = None
+        self.years = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != LEDGER_VERSION:
+                raise ValueError(f"Ismeretlen főkönyv verzió: {path}")
+            self.method = data.get("method")
+            self.years = {int(year): snapshot for year, snapshot in data.get("years", {}).items()}
+
+    def check_method(self, method: str) -> None:
+        if self.method is not None and self.method != method:
+            raise ValueError(
+                f"A főkönyv ({self.path}) {self.method} módszerrel készült, nem használható {method} módszerrel."
+            )
+
+    def opening(self, year: int):
+        """Az adóév előtti utolsó év végi állapot ({"as_of": "YYYY-MM-DD", "lots": [...]}), vagy None."""
+        earlier = [y for y in self.years if y < year]
+        return self.years[max(earlier)] if earlier else None
+
+    def record(self, year: int, method: str, lots: list) -> None:
+        """Az adóév végi nyitott tételek rögzítése."""
+        self.check_method(method)
+        self.method = method
+        later = sorted(y for y in self.years if y > year)
+        if later:
+            # A későbbi évek a korábbi nyitó állapotból készültek: újra kell futtatni őket
+            print(f"Figyelem: a főkönyv későbbi éveit ({', '.join(map(str, later))}) újra kell futtatni.")
+        self.years[year] = {"as_of": f"{year}-12-31", "lots": lots}
+
+    def save(self) -> None:
+        """A főkönyv kiírása (atomikus cserével)."""
+        data = {
+            "version": LEDGER_VERSION,
+            "method": self.method,
+            "years": {str(year): self.years[year] for year in sorted(self.years)},
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".ledger.", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
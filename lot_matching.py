@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from collections import deque
+from lazy_imports import lazy_import
+from instrumentation import stats
+
+pd = lazy_import("pandas")
+
+# Ennél kisebb maradék mennyiséget (lebegőpontos hiba) nullának tekintünk
+QUANTITY_EPSILON = 1e-9
+
+REALIZED_COLUMNS = [
+    "Ticker", "Currency", "Quantity", "Buy Date", "Sell Date",
+    "Buy Sum (FC)", "Sell Sum (FC)", "Realized PnL (FC)",
+    "Buy Rate", "Sell Rate",
+    "Buy Sum (HUF)", "Sell Sum (HUF)", "Realized PnL (HUF)"
+]
+OPEN_COLUMNS = ["Ticker", "Currency", "Quantity", "Buy Sum (FC)", "Buy Sum (HUF)"]
+# A match_lots bemenetének oszlopai
+TRADE_COLUMNS = ["Ticker", "Currency", "Date", "Side", "Quantity", "Amount (FC)", "Amount (HUF)", "Exchange Rate"]
+
+
+class Lot:
+    """Egy vásárlásból megmaradt (még el nem adott) tétel, egységárakkal."""
+    __slots__ = ("date", "quantity", "unit_fc", "unit_huf", "rate")
+
+    def __init__(self, date, quantity, unit_fc, unit_huf, rate):
+        self.date = date
+        self.quantity = quantity
+        self.unit_fc = unit_fc
+        self.unit_huf = unit_huf
+        self.rate = rate
+
+
+class LotMatcher:
+    """Eladások párosítása a korábbi vásárlási tételekkel (lot) tickerenként.
+    method: "fifo" (a legrégebbi tétel fogy először) vagy "lifo" (a legutóbbi).
+    Minden párosított rész külön realizált sort ad a vétel és az eladás napi HUF árfolyamával.
+    Egy tétel legfeljebb egyszer fogy el teljesen, így a futásidő a kötések számával lineáris.
+    """
+    METHODS = ("fifo", "lifo")
+
+    def __init__(self, method: str = "fifo"):
+        if method not in self.METHODS:
+            raise ValueError(f"Ismeretlen lot párosítási módszer: {method}")
+        self.method = method
+        self.queues = {}
+        self.realized = []
+        # Fedezet nélküli (a kimutatásban nem szereplő vásárlásból származó) eladott mennyiség
+        self.unmatched = {}
+        # Mennyiség nélküli, de összeggel rendelkező kötések: (oldal, ticker, deviza, nap, összeg)
+        self.missing_quantity = []
+
+    def add_lots(self, lots: list) -> None:
+        """Korábbi időszakból áthozott nyitott tételek (lásd lots(), ledger.PositionLedger)."""
+        for lot in lots:
+            self.queues.setdefault((lot["ticker"], lot["currency"]), deque()).append(
+                Lot(lot["date"], lot["quantity"], lot["unit_fc"], lot["unit_huf"], lot["rate"])
+            )
+
+    def lots(self) -> list:
+        """A megmaradt tételek JSON-ként kiírható alakban, tickerenként időrendben."""
+        return [
+            {"ticker": ticker, "currency": currency, "date": lot.date, "quantity": lot.quantity,
+             "unit_fc": lot.unit_fc, "unit_huf": lot.unit_huf, "rate": lot.rate}
+            for (ticker, currency), queue in sorted(self.queues.items())
+            for lot in queue
+            if lot.quantity > QUANTITY_EPSILON
+        ]
+
+    def buy(self, key, date, quantity, amount_fc, amount_huf, rate) -> None:
+        """Új tétel; mennyiség nélkül az összeg nem rendelhető tételhez, csak feljegyezzük."""
+        if not quantity > QUANTITY_EPSILON:
+            self._missing("buy", key, date, amount_fc)
+            return
+        self.queues.setdefault(key, deque()).append(
+            Lot(date, quantity, amount_fc / quantity, amount_huf / quantity, rate)
+        )
+
+    def sell(self, key, date, quantity, amount_fc, amount_huf, rate) -> None:
+        """Párosítás a nyitott tételekkel; mennyiség nélkül a bevételt nulla bekerülési értékkel
+        (mennyiség nélküli sorként) realizáljuk.
+        """
+        if not quantity > QUANTITY_EPSILON:
+            if self._missing("sell", key, date, amount_fc):
+                ticker, currency = key
+                self.realized.append((
+                    ticker, currency, float("nan"), None, date,
+                    0.0, amount_fc, amount_fc,
+                    None, rate,
+                    0.0, amount_huf, amount_huf
+                ))
+            return
+        unit_fc = amount_fc / quantity
+        unit_huf = amount_huf / quantity
+        queue = self.queues.get(key)
+        remaining = quantity
+        while remaining > QUANTITY_EPSILON and queue:
+            lot = queue[0] if self.method == "fifo" else queue[-1]
+            matched = min(remaining, lot.quantity)
+            self._emit(key, matched, lot.date, date, lot.unit_fc, unit_fc, lot.rate, rate, lot.unit_huf, unit_huf)
+            lot.quantity -= matched
+            remaining -= matched
+            if lot.quantity <= QUANTITY_EPSILON:
+                if self.method == "fifo":
+                    queue.popleft()
+                else:
+                    queue.pop()
+        if remaining > QUANTITY_EPSILON:
+            # Nincs mivel párosítani: nulla bekerülési értékkel realizáljuk
+            self.unmatched[key] = self.unmatched.get(key, 0.0) + remaining
+            self._emit(key, remaining, None, date, 0.0, unit_fc, None, rate, 0.0, unit_huf)
+
+    def _missing(self, side, key, date, amount_fc) -> bool:
+        """Mennyiség nélküli kötés feljegyzése, ha van összege (a nulla összegű sor elhagyható)."""
+        if pd.isna(amount_fc) or abs(amount_fc) <= QUANTITY_EPSILON:
+            return False
+        self.missing_quantity.append((side, key[0], key[1], date, amount_fc))
+        return True
+
+    def _emit(self, key, quantity, buy_date, sell_date, buy_unit_fc, sell_unit_fc,
+              buy_rate, sell_rate, buy_unit_huf, sell_unit_huf) -> None:
+        ticker, currency = key
+        buy_fc = buy_unit_fc * quantity
+        sell_fc = sell_unit_fc * quantity
+        buy_huf = buy_unit_huf * quantity
+        sell_huf = sell_unit_huf * quantity
+        self.realized.append((
+            ticker, currency, quantity, buy_date, sell_date,
+            buy_fc, sell_fc, sell_fc - buy_fc,
+            buy_rate, sell_rate,
+            buy_huf, sell_huf, sell_huf - buy_huf
+        ))
+
+    def realized_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.realized, columns=REALIZED_COLUMNS)
+
+    def open_frame(self) -> pd.DataFrame:
+        """A megmaradt tételek tickerenként összesítve."""
+        rows = []
+        for (ticker, currency), queue in sorted(self.queues.items()):
+            quantity = sum(lot.quantity for lot in queue)
+            if quantity <= QUANTITY_EPSILON:
+                continue
+            rows.append((
+                ticker, currency, quantity,
+                sum(lot.unit_fc * lot.quantity for lot in queue),
+                sum(lot.unit_huf * lot.quantity for lot in queue)
+            ))
+        return pd.DataFrame(rows, columns=OPEN_COLUMNS)
+
+
+def match_lots(trades: pd.DataFrame, method: str = "fifo", matcher: LotMatcher = None):
+    """Egyetlen időrendi menetben párosítja a kötéseket.
+    trades oszlopai: Ticker, Currency, Date, Side ("buy"/"sell"), Quantity, Amount (FC),
+    Amount (HUF), Exchange Rate. Azonos időpontban a vásárlás megelőzi az eladást.
+    matcher: egy korábbi időszak nyitott tételeivel feltöltött LotMatcher (lásd add_lots); a
+    párosítás után a megmaradt tételeket tartalmazza.
+    Visszatérés: (realized_df, open_df).
+    """
+    matcher = matcher if matcher is not None else LotMatcher(method)
+    if not trades.empty:
+        ordered = trades.assign(_sell=(trades["Side"] == "sell")).sort_values(["Date", "_sell"], kind="stable")
+        dates = ordered["Date"].dt.strftime("%Y-%m-%d")
+        columns = zip(
+            ordered["Ticker"], ordered["Currency"], dates, ordered["Side"],
+            ordered["Quantity"].abs(), ordered["Amount (FC)"].abs(),
+            ordered["Amount (HUF)"].abs(), ordered["Exchange Rate"]
+        )
+        for ticker, currency, date, side, quantity, amount_fc, amount_huf, rate in columns:
+            if side == "buy":
+                matcher.buy((ticker, currency), date, quantity, amount_fc, amount_huf, rate)
+            else:
+                matcher.sell((ticker, currency), date, quantity, amount_fc, amount_huf, rate)
+
+    if matcher.unmatched:
+        stats.warn(
+            "Vásárlás nélküli eladás (nulla bekerülési értékkel számolva)",
+            [f"{t}/{c}: {q:g}" for (t, c), q in sorted(matcher.unmatched.items())],
+            count=len(matcher.unmatched)
+        )
+    for side, category in (("buy", "Mennyiség nélküli vétel (a bekerülési érték nem rendelhető tételhez)"),
+                           ("sell", "Mennyiség nélküli eladás (nulla bekerülési értékkel számolva)")):
+        rows = [row for row in matcher.missing_quantity if row[0] == side]
+        if rows:
+            stats.warn(category, [f"{t}/{c} {d}: {a:g}" for _, t, c, d, a in rows], count=len(rows))
+    return matcher.realized_frame(), matcher.open_frame()
+
+
+def fold_positions(positions, trades: pd.DataFrame):
+    """Az összesítő (aggregate) módszer gyűjtői: a kötéseket (TRADE_COLUMNS) egyetlen csoportosítással
+    (Ticker, Currency) szerinti sorokba összegzi (vétel és eladás devizában és HUF-ban, utolsó eladás
+    napja), és hozzáadja a korábbi gyűjtőkhöz (positions, streaming módban darabonként; kezdetben None).
+    Visszatérés: a gyűjtők DataFrame-je (Ticker, Currency szerint rendezve).
+    """
+    if trades.empty:
+        return positions
+    sell = (trades["Side"] == "sell").to_numpy()
+    amounts = pd.DataFrame({
+        "Ticker": trades["Ticker"],
+        "Currency": trades["Currency"],
+        "buy_fc": trades["Amount (FC)"].where(~sell, 0.0),
+        "sell_fc": trades["Amount (FC)"].where(sell, 0.0),
+        "buy_huf": trades["Amount (HUF)"].where(~sell, 0.0),
+        "sell_huf": trades["Amount (HUF)"].where(sell, 0.0),
+        "sale_date": trades["Date"].where(sell),
+    })
+    if positions is not None:
+        amounts = pd.concat([positions, amounts], ignore_index=True)
+    return amounts.groupby(["Ticker", "Currency"], as_index=False).agg(
+        buy_fc=("buy_fc", "sum"), sell_fc=("sell_fc", "sum"), buy_huf=("buy_huf", "sum"),
+        sell_huf=("sell_huf", "sum"), sale_date=("sale_date", "max")
+    )
+
+
+def position_frames(positions):
+    """Az összesítő módszer táblái a gyűjtőkből: eladással rendelkező sorok a realizált, a többi a
+    nyitott pozíciók közé kerül. Visszatérés: (realized_df, open_df).
+    """
+    if positions is None:
+        return pd.DataFrame(), pd.DataFrame()
+    sold = positions["sell_fc"] != 0
+    realized, held = positions[sold], positions[~sold]
+    realized_df = pd.DataFrame({
+        "Ticker": realized["Ticker"],
+        "Currency": realized["Currency"],
+        "Buy Sum (FC)": realized["buy_fc"],
+        "Sell Sum (FC)": realized["sell_fc"],
+        "Realized PnL (FC)": realized["sell_fc"] - realized["buy_fc"],
+        "Buy Sum (HUF)": realized["buy_huf"],
+        "Sell Sum (HUF)": realized["sell_huf"],
+        "Realized PnL (HUF)": realized["sell_huf"] - realized["buy_huf"],
+        "Sale Date": realized["sale_date"].dt.strftime("%Y-%m-%d"),
+    })
+    open_df = pd.DataFrame({
+        "Ticker": held["Ticker"],
+        "Currency": held["Currency"],
+        "Buy Sum (FC)": held["buy_fc"],
+        "Buy Sum (HUF)": held["buy_huf"],
+    })
+    # Tétel nélkül (a korábbi működésnek megfelelően) oszlopok nélküli üres tábla
+    return (
+        realized_df.reset_index(drop=True) if not realized_df.empty else pd.DataFrame(),
+        open_df.reset_index(drop=True) if not open_df.empty else pd.DataFrame(),
+    )
@@ -1,126 +1,367 @@
-import os
-import json
-import xml.etree.ElementTree as ET
+import re
+import time
+import atexit
+import threading
 
-from datetime import datetime, timedelta
-from zeep import Client, Settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from lazy_imports import lazy_import
+from rate_cache import MemoryRateStore, open_default_store
+from rate_archive import ARCHIVE_FILE, open_archive
+from rate_calendar import RateCalendar, UNKNOWN, to_epoch_day, from_epoch_day
+from rate_provider import (
+    CONNECT_TIMEOUT,
+    MNB_WSDL_URL,
+    REQUEST_TIMEOUT,
+    RETRY_ATTEMPTS,
+    WSDL_CACHE_FILE,
+    FileRateProvider,
+    MNBSoapProvider,
+    RateProvider
+)
+from instrumentation import stats as run_stats
 
-# A cache fájl elérési útja: a felhasználó otthoni könyvtárában lesz
-CACHE_FILE = os.path.join(os.path.expanduser("~"), "exchange_rate_cache.json")
+np = lazy_import("numpy")
 
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print("Hiba a cache fájl betöltésekor:", e)
-            return {}
-    return {}
+# Ennyi nappal korábbi munkanap árfolyamára léphetünk vissza hétvége/ünnepnap esetén
+FALLBACK_DAYS = 5
+
+# Párhuzamos lekérésnél egyszerre futó kérések száma
+MAX_WORKERS = 4
+
+# Párhuzamos lekérésnél a hosszú intervallumokat ekkora (napos) darabokra bontjuk
+RANGE_CHUNK_DAYS = 366
 
-def save_cache(cache):
-    try:
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(cache, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print("Hiba a cache fájl mentésekor:", e)
+# Ennyi új árfolyam gyűlik össze a memóriában, mielőtt egy tranzakcióban a tárolóba írjuk
+WRITE_BATCH_SIZE = 500
 
-# A cache értékeket először a fájlból töltjük be, ha létezik
-exchange_rate_cache = load_cache()
+# Érvényes ISO devizakód (pl. "USD"); a hiányzó értékekből keletkező "NAN" stb. kiszűrésére
+CURRENCY_CODE_RE = re.compile(r"^(?!NAN$)[A-Z]{3}$")
+
+
+class RateUnavailableError(RuntimeError):
+    """A szükséges árfolyam nincs a cache-ben, és (offline módban, vagy mert a forrás nem érhető el)
+    nem is kérhető le.
+    """
 
 
 class MNBExchangeService:
-    """Az MNB árfolyam szolgáltatásával kapcsolatos műveletek, cache-eléssel."""
-    def __init__(self, wsdl_url="http://www.mnb.hu/arfolyamok.asmx?wsdl", strict=False):
-        settings = Settings(strict=strict, xml_huge_tree=True)
-        self.client = Client(wsdl_url, settings=settings)
+    """Az MNB árfolyam szolgáltatásával kapcsolatos műveletek, cache-eléssel.
+    A cache tárolója cserélhető (lásd rate_cache.RateStore), alapértelmezetten SQLite.
+    A hiányzó árfolyamokat max_workers szálon, devizánként párhuzamosan kéri le; max_workers=1
+    esetén egyetlen, az összes devizát tartalmazó kérést küld.
+    Az árfolyamok forrása cserélhető (lásd rate_provider.RateProvider), alapértelmezetten az MNB
+    SOAP szolgáltatása, amelynek zeep kliense csak az első valódi cache hiánynál jön létre.
+    A nem tartós forrás (pl. helyi árfolyam fájl) értékei csak memóriában cache-elődnek.
+    Offline módban a forrást nem használja: hiányzó árfolyamnál RateUnavailableError kivételt dob.
+    Ugyanígy, ha a forrás az újrapróbálkozások után sem érhető el (lásd rate_provider.MNBSoapProvider):
+    a futás megszakad, a lekérdezetlen árfolyamok nem kerülhetnek 0 vagy 1 értékkel a riportba.
+    allow_missing: a lekérdezett, de nem létező (pl. az MNB által nem jegyzett napra vagy devizára eső)
+    árfolyamok kezelése a feldolgozóknál (lásd tax_wizard.attach_exchange_rates): alapértelmezetten
+    RateUnavailableError, True esetén a korábbi működés (figyelmeztetés, a kötések 0, a jövedelmek 1
+    értékkel számolva).
+    Ha van árfolyam archívum (lásd rate_archive.RateArchive; alapértelmezetten az MNB forrásnál a
+    ~/mnb_rates.bin, ha létezik; archive=False esetén nincs), az időszakába eső napokat a forrás és
+    a cache helyett abból olvassa.
+    A stats() számlálói: cache találat / hiány (devizánként és lekérdezett tartományonként), SOAP
+    hívások, hibák, újrapróbálkozások, válaszméret és késleltetés, valamint a hozzárendelt és árfolyam
+    nélküli sorok száma.
+    """
+    COUNTERS = ("cache_hits", "cache_misses", "soap_calls", "soap_errors", "soap_retries", "soap_bytes",
+                "soap_latency_s", "soap_latency_max_s", "lookups", "lookups_missing")
 
-    def get_exchange_rate(self, date, currency: str) -> float:
-        """Lekéri az adott dátum (fallback esetén az előző nap) alapján a deviza árfolyamát.
-        Ha a deviza HUF, visszatér 1.0-vel. A lekérdezést cache-eli egy JSON fájlban.
+    def __init__(self, wsdl_url=MNB_WSDL_URL, strict=False, store=None,
+                 max_workers=MAX_WORKERS, request_timeout=REQUEST_TIMEOUT, offline=False,
+                 wsdl_cache_file=WSDL_CACHE_FILE, provider: RateProvider = None, archive: str = None,
+                 connect_timeout=CONNECT_TIMEOUT, retries=RETRY_ATTEMPTS, allow_missing=False):
+        self.offline = offline
+        self.allow_missing = allow_missing
+        # Explicit forrás (pl. teszt vagy árfolyam fájl) mellé csak kérésre nyitjuk meg az archívumot
+        if archive is None and provider is None:
+            archive = ARCHIVE_FILE
+        self.archive = open_archive(archive)
+        self.provider = provider if provider is not None else MNBSoapProvider(
+            wsdl_url, strict, request_timeout, wsdl_cache_file, connect_timeout, retries, pool_size=max_workers
+        )
+        if store is None:
+            store = open_default_store() if self.provider.CACHEABLE else MemoryRateStore()
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        # Devizánkénti naptár a tároló előtt, és a még ki nem írt új értékek kötege;
+        # a párhuzamos lekérések eredményei a zár alatt kerülnek bele
+        self._calendars = {}
+        self._pending = []
+        self._lock = threading.RLock()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        atexit.register(self.flush)
+
+    def _count(self, name: str, value=1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def _record_call(self, latency: float, error: bool = False) -> None:
+        with self._lock:
+            self.counters["soap_calls"] += 1
+            self.counters["soap_errors"] += int(error)
+            self.counters["soap_latency_s"] += latency
+            self.counters["soap_latency_max_s"] = max(self.counters["soap_latency_max_s"], latency)
+
+    def stats(self) -> dict:
+        """A számlálók pillanatnyi értéke (a soap_* számlálók a forrás hívásait mérik). A soap_calls a
+        forrásnak ténylegesen elküldött kérések száma, az újrapróbálkozásokkal együtt, ha a forrás ezt
+        számolja (lásd RateProvider.attempts); egyébként a forráshoz intézett lekérések száma.
         """
+        with self._lock:
+            counters = dict(self.counters)
+        attempts = self.provider.attempts()
+        if attempts is not None:
+            counters["soap_calls"] = attempts
+        counters["soap_bytes"] = self.provider.bytes_received()
+        counters["soap_retries"] = self.provider.retries()
+        counters["soap_latency_s"] = round(counters["soap_latency_s"], 4)
+        counters["soap_latency_max_s"] = round(counters["soap_latency_max_s"], 4)
+        return counters
 
-        # Ha a date string, próbáljuk meg datetime objektummá konvertálni.
+    def _archived(self, currency: str, first: int, last: int) -> bool:
+        """Igaz, ha a deviza [first, last] napjai az árfolyam archívumból olvashatók."""
+        return self.archive is not None and self.archive.covers(currency, first, last)
+
+    def _calendar(self, currency: str) -> RateCalendar:
+        with self._lock:
+            calendar = self._calendars.get(currency)
+            if calendar is None:
+                calendar = self._calendars[currency] = RateCalendar(FALLBACK_DAYS)
+            return calendar
+
+    def _load(self, currency: str, first: int, last: int) -> RateCalendar:
+        """A [first, last] napokból a naptárban még nem vizsgáltakat egy indexelt lekérdezéssel
+        betölti a tárolóból.
+        """
+        calendar = self._calendar(currency)
+        if calendar.covered(first, last):
+            return calendar
+        rows = self.store.get_range(
+            currency, from_epoch_day(first).isoformat(), from_epoch_day(last).isoformat()
+        )
+        with self._lock:
+            for day_str, (rate, published) in rows.items():
+                day = to_epoch_day(day_str)
+                if not calendar.is_checked(day):
+                    calendar.set(day, rate, to_epoch_day(published) if published else UNKNOWN)
+        return calendar
+
+    def _remember(self, currency: str, items) -> None:
+        """Az újonnan kapott (nap, árfolyam, publikációs nap) értékeket a mentési kötegbe teszi
+        (árfolyam None: vizsgált, árfolyam nélküli nap, lásd RateCalendar.fill).
+        """
+        with self._lock:
+            for day, rate, published in items:
+                self._pending.append((
+                    currency,
+                    from_epoch_day(day).isoformat(),
+                    rate,
+                    from_epoch_day(published).isoformat() if published != UNKNOWN else None
+                ))
+            if len(self._pending) >= WRITE_BATCH_SIZE:
+                self.flush()
+
+    def flush(self) -> None:
+        """A még ki nem írt árfolyamokat egyetlen kötegben a tárolóba menti."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            try:
+                self.store.put_many(pending)
+            except Exception as e:
+                print("Hiba a cache mentésekor:", e)
+
+    @staticmethod
+    def _to_datetime(date):
+        """A dátumot (string, datetime vagy pandas Timestamp) datetime objektummá alakítja.
+        Hibás formátum esetén None-t ad vissza.
+        """
         if isinstance(date, str):
             try:
-                date = datetime.strptime(date, "%Y-%m-%d")
+                return datetime.strptime(date, "%Y-%m-%d")
             except ValueError:
                 try:
-                    date = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
-                except ValueError as e:
-                    print(f"Hibás dátum formátum: {date} -> {e}")
+                    return datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    run_stats.warn("Hibás dátum formátum", date)
                     return None
-
-        # A cache kulcsa: "YYYY-MM-DD|CURRENCY"
-        key = f"{date.strftime('%Y-%m-%d')}|{currency.upper()}"
-        if key in exchange_rate_cache:
-            return exchange_rate_cache[key]
-        if currency.upper() == "HUF":
-            exchange_rate_cache[key] = 1.0
-            save_cache(exchange_rate_cache)
-            return 1.0
-
-        start_date_str = (date - timedelta(days=5)).strftime("%Y-%m-%d")
-        end_date_str = date.strftime("%Y-%m-%d")
-        request_data = {
-            'startDate': start_date_str,
-            'endDate': end_date_str,
-            'currencyNames': currency.upper()
-        }
-        try:
-            response_xml = self.client.service.GetExchangeRates(**request_data)
-        except Exception as e:
-            print("Hiba a GetExchangeRates metódus hívásakor:", e)
+        if date is None or date != date:  # None vagy NaT
             return None
+        return date
+
+    def prefetch(self, currencies, start, end) -> None:
+        """Lekéri az összes megadott deviza hiányzó árfolyamát a [start, end] intervallumra, és
+        feltölti a naptárat (és a cache-t) minden naptári napra. A kérések párhuzamosan futnak
+        (lásd max_workers), így a teljes várakozás nagyjából a leglassabb kérés ideje. Hétvégén és
+        ünnepnapon az utolsó (legfeljebb FALLBACK_DAYS nappal korábbi) munkanap árfolyama érvényes,
+        ugyanúgy, mint a get_exchange_rate esetén.
+        """
+        start = self._to_datetime(start)
+        end = self._to_datetime(end)
+        if start is None or end is None:
+            return
+        first, last = sorted((to_epoch_day(start), to_epoch_day(end)))
 
+        currencies = sorted({
+            c.strip().upper() for c in currencies
+            if isinstance(c, str) and CURRENCY_CODE_RE.match(c.strip().upper())
+        })
+
+        missing = []
+        for currency in currencies:
+            if self._archived(currency, first, last):
+                self._count("cache_hits")
+                continue
+            calendar = self._load(currency, first, last)
+            covered = calendar.covered(first, last)
+            self._count("cache_hits" if covered or currency == "HUF" else "cache_misses")
+            if covered:
+                continue
+            if currency == "HUF":
+                self._remember(currency, calendar.fill(first, last, [(day, 1.0) for day in range(first, last + 1)]))
+            else:
+                missing.append(currency)
+
+        if missing and self.offline:
+            raise RateUnavailableError(
+                f"Offline mód: hiányzó árfolyamok ({', '.join(missing)}) a "
+                f"{from_epoch_day(first)} - {from_epoch_day(last)} időszakra."
+            )
+        if missing:
+            if self.max_workers == 1:
+                tasks = [(missing, first, last)]
+            else:
+                # Devizánként és RANGE_CHUNK_DAYS napos darabonként külön kérés, párhuzamosan
+                tasks = [
+                    ([currency], chunk_first, min(chunk_first + RANGE_CHUNK_DAYS - 1, last))
+                    for currency in missing
+                    for chunk_first in range(first, last + 1, RANGE_CHUNK_DAYS)
+                ]
+
+            if len(tasks) == 1:
+                self._fetch_range(*tasks[0])
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                    futures = [executor.submit(self._fetch_range, *task) for task in tasks]
+                    for future in as_completed(futures):
+                        future.result()
+
+        self.flush()
+
+    def _fetch_range(self, currencies, first: int, last: int) -> None:
+        """Egy kérés a forráshoz (MNB esetén GetExchangeRates) a megadott devizákra és a [first, last] napokra; az eredményt
+        naptári naponként (hétvégére/ünnepnapra az előző munkanap árfolyamával) a naptárba tölti.
+        """
+        start = time.perf_counter()
         try:
-            root = ET.fromstring(response_xml)
+            rates = self.provider.fetch(currencies, from_epoch_day(first - FALLBACK_DAYS), from_epoch_day(last))
+        except RateUnavailableError:
+            raise
         except Exception as e:
-            print(f"XML feldolgozási hiba: {e}")
-            return None
+            self._record_call(time.perf_counter() - start, error=True)
+            # Nem folytatjuk hiányzó árfolyamokkal: a HUF értékek hibásak lennének
+            raise RateUnavailableError(
+                f"Hiba a GetExchangeRates metódus hívásakor ({', '.join(currencies)}, "
+                f"{from_epoch_day(first)} - {from_epoch_day(last)}): {e}. A futás megszakad."
+            ) from e
+        self._record_call(time.perf_counter() - start)
 
-        days = []
-        for day in root.findall("Day"):
-            day_date = day.attrib.get("date")
-            try:
-                parsed_date = datetime.strptime(day_date, "%Y-%m-%d")
-                days.append((parsed_date, day))
-            except Exception as ex:
-                print(f"Hiba a dátum értelmezésekor: {day_date} -> {ex}")
+        for currency in currencies:
+            publications = [(to_epoch_day(d), rate) for d, rate in rates.get(currency, {}).items()]
+            calendar = self._calendar(currency)
+            with self._lock:
+                new_items = calendar.fill(first, last, publications)
+            self._remember(currency, new_items)
 
-        if not days:
-            print("Nem található 'Day' elem a válaszban.")
-            return None
+    def lookup_rates(self, currency: str, days):
+        """Vektorizált lekérdezés a naptárból (hálózati hívás nélkül; előtte a prefetch tölti fel).
+        days: 1970-01-01 óta eltelt napok tömbje. Visszatérés: (árfolyamok, publikációs napok)
+        numpy tömbök; hiányzó árfolyam esetén NaN, illetve UNKNOWN.
+        """
+        currency = currency.upper()
+        if len(days) and self._archived(currency, int(min(days)), int(max(days))):
+            rates, published = self.archive.lookup_many(currency, days, FALLBACK_DAYS)
+        else:
+            if len(days):
+                self._load(currency, int(min(days)), int(max(days)))
+            rates, published = self._calendar(currency).lookup_many(days)
+        with self._lock:
+            self.counters["lookups"] += len(rates)
+            self.counters["lookups_missing"] += int(np.isnan(rates).sum())
+        return rates, published
 
-        requested_date_str = date.strftime("%Y-%m-%d")
-        # Megpróbáljuk megtalálni a kért dátumhoz tartozó napot,
-        # ha nem, akkor a legutolsó elérhető napot választjuk.
-        chosen_day = None
-        for d, day in days:
-            if d.strftime("%Y-%m-%d") == requested_date_str:
-                chosen_day = day
-                break
-        if not chosen_day:
-            chosen_day = max(days, key=lambda x: x[0])[1]
-
-        for rate in chosen_day.findall("Rate"):
-            if rate.attrib.get("curr", "").upper() == currency.upper():
-                try:
-                    value = float(rate.text.replace(",", "."))
-                    exchange_rate_cache[key] = value
-                    save_cache(exchange_rate_cache)
-                    return value
-                except Exception as e:
-                    print(f"Az árfolyam érték konvertálása sikertelen ({rate.text}): {e}")
-                    return None
+    def resolve_rate(self, date, currency: str):
+        """Lekéri a deviza árfolyamát az adott napra, és visszaadja azt a publikációs (MNB munka-)
+        napot is, amelyre a nap visszavezethető: (árfolyam, datetime.date). Ha a deviza HUF, az
+        árfolyam 1.0. A kiértékelt napokat (a sikertelen lekérdezést is) a naptár megjegyzi.
+        Árfolyam hiányában (None, None).
+        """
+
+        # Ha a date string, próbáljuk meg datetime objektummá konvertálni.
+        date = self._to_datetime(date)
+        if date is None:
+            return None, None
+
+        currency = currency.upper()
+        day = to_epoch_day(date)
+        if self._archived(currency, day, day):
+            self._count("cache_hits")
+            rate, published = self.archive.lookup(currency, day, FALLBACK_DAYS)
+            return rate, (from_epoch_day(published) if published is not None else None)
+        calendar = self._load(currency, day, day)
+        self._count("cache_hits" if calendar.is_checked(day) else "cache_misses")
+        if not calendar.is_checked(day):
+            if currency == "HUF":
+                self._remember(currency, calendar.fill(day, day, [(day, 1.0)]))
+            elif self.offline:
+                raise RateUnavailableError(
+                    f"Offline mód: nincs {currency} árfolyam a cache-ben ({from_epoch_day(day)})."
+                )
+            else:
+                # A megelőző napokat is kitöltjük, így a szomszédos hétvégi/ünnepnapokra nem kérdezünk újra
+                self._fetch_range([currency], day - FALLBACK_DAYS, day)
+
+        rate, published = calendar.lookup(day)
+        if rate is None:
+            if calendar.is_checked(day):
+                run_stats.warn("Nem található MNB árfolyam", f"{currency} {from_epoch_day(day)}")
+            return None, None
+        return rate, (from_epoch_day(published) if published is not None else None)
 
-        print(f"A {currency} árfolyam nem található a válaszban.")
-        return None
+    def get_exchange_rate(self, date, currency: str) -> float:
+        """Lekéri az adott dátum (fallback esetén az előző munkanap) alapján a deviza árfolyamát.
+        Ha a deviza HUF, visszatér 1.0-vel. A lekérdezést cache-eli a tárolóban.
+        """
+        return self.resolve_rate(date, currency)[0]
 
     def convert_to_huf(self, amount: float, date: datetime, currency: str) -> float:
         """Átváltja az adott összeget forintra a lekérdezett árfolyammal."""
         rate = self.get_exchange_rate(date, currency)
         if rate is None:
-            print(f"Nincs árfolyam adat {currency} esetén {date.strftime('%Y-%m-%d')}.")
+            run_stats.warn("Nincs árfolyam adat", f"{currency} {date.strftime('%Y-%m-%d')}")
             return None
         return amount * rate
+
+
+def exchange_service_for(source=None, offline: bool = False, allow_missing: bool = False) -> MNBExchangeService:
+    """A processzoroknak átadott árfolyam forrásból MNBExchangeService: None esetén az alapértelmezett
+    (MNB SOAP, SQLite cache), RateProvider esetén az azt használó szolgáltatás, egyébként változatlanul.
+    """
+    if source is None:
+        return MNBExchangeService(offline=offline, allow_missing=allow_missing)
+    if isinstance(source, RateProvider):
+        return MNBExchangeService(offline=offline, provider=source, allow_missing=allow_missing)
+    return source
+
+
+def open_exchange_service(rates_file: str = None, offline: bool = False,
+                          allow_missing: bool = False) -> MNBExchangeService:
+    """A parancssori futtatások szolgáltatása: rates_file megadása esetén az abból olvasó
+    (hálózatot nem használó) forrással, egyébként az MNB SOAP szolgáltatással.
+    """
+    return exchange_service_for(FileRateProvider(rates_file) if rates_file else None, offline, allow_missing)
@@ -0,0 +1,159 @@
+import os
+import json
+import struct
+import tempfile
+
+from datetime import datetime
+from lazy_imports import lazy_import
+from rate_cache import CACHE_DIR
+from rate_calendar import UNKNOWN, to_epoch_day, from_epoch_day
+
+np = lazy_import("numpy")
+
+# Az alapértelmezett árfolyam archívum; ha létezik, az MNBExchangeService ebből olvas
+ARCHIVE_FILE = os.path.join(CACHE_DIR, "mnb_rates.bin")
+
+# Fájl azonosító és verzió; utána a fejléc hossza (uint32, little-endian) és a JSON fejléc
+MAGIC = b"MNBRATE1"
+HEADER_LENGTH = struct.Struct("<I")
+
+# A tömbök 8 bájtos határra igazítva kezdődnek
+ALIGNMENT = 8
+
+
+class RateArchive:
+    """A teljes MNB árfolyam történet tömör, memóriába leképezett (mmap) archívuma.
+    Devizánként egy float64 tömb, amelyet a nap 1970-01-01 óta eltelt napjainak az origin-től vett
+    eltolása indexel; a publikációs napokon az árfolyam, a többi napon NaN. A fejléc (JSON) a
+    devizánkénti origin-t, hosszt és bájt-eltolást, valamint az archívum [first_day, last_day]
+    időszakát tartalmazza. A fájl csak olvasható leképezése párhuzamos folyamatok között megosztható,
+    a lekérdezés feldolgozási lépés nélküli, O(1) tömbindexelés.
+    """
+
+    def __init__(self, path: str = ARCHIVE_FILE):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Nem árfolyam archívum: {path}")
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            header = json.loads(f.read(length).decode("utf-8"))
+        self.header = header
+        self.first_day = header["first_day"]
+        self.last_day = header["last_day"]
+        self.currencies = {
+            currency: np.memmap(path, dtype="<f8", mode="r", offset=entry["offset"], shape=(entry["length"],))
+            for currency, entry in header["currencies"].items()
+        }
+        self.origins = {currency: entry["origin"] for currency, entry in header["currencies"].items()}
+        # A deviza utolsó publikációs napja (a tömb utolsó eleme)
+        self.last_days = {
+            currency: entry["origin"] + entry["length"] - 1 for currency, entry in header["currencies"].items()
+        }
+
+    def covers(self, currency: str, first: int, last: int) -> bool:
+        """Igaz, ha a deviza szerepel az archívumban, és a [first, last] napok a deviza első és utolsó
+        publikációs napja közé esnek (a később bevezetett vagy megszűnt devizák időszaka rövidebb az
+        archívuménál; a kívül eső napokat a hívó a cache-ből vagy az MNB-től kéri le).
+        """
+        return (currency in self.currencies and self.origins[currency] <= first
+                and last <= self.last_days[currency])
+
+    def lookup_many(self, currency: str, days, fallback_days: int):
+        """Vektorizált lekérdezés: (árfolyamok, publikációs napok) tömbök. Nem publikációs napra a
+        legfeljebb fallback_days nappal korábbi utolsó publikáció érvényes; ennek hiányában NaN / UNKNOWN.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        values = self.currencies[currency]
+        rates = np.full(len(days), np.nan)
+        published = np.full(len(days), UNKNOWN, dtype=np.int64)
+        pos = days - self.origins[currency]
+        # A deviza utolsó publikációja utáni napok is visszavezethetők rá
+        pending = (pos >= 0) & (pos < len(values) + fallback_days)
+        for back in range(fallback_days + 1):
+            index = np.flatnonzero(pending & (pos - back >= 0) & (pos - back < len(values)))
+            if not len(index):
+                continue
+            found = values[pos[index] - back]
+            hit = ~np.isnan(found)
+            index = index[hit]
+            rates[index] = found[hit]
+            published[index] = days[index] - back
+            pending[index] = False
+        return rates, published
+
+    def lookup(self, currency: str, day: int, fallback_days: int):
+        """(árfolyam, publikációs nap) az adott napra; (None, None), ha nincs árfolyam."""
+        rates, published = self.lookup_many(currency, [day], fallback_days)
+        if np.isnan(rates[0]):
+            return None, None
+        return float(rates[0]), int(published[0])
+
+
+def write_archive(path: str, rates: dict, source: str = None) -> dict:
+    """Az archívum kiírása (atomikus cserével).
+    rates: {deviza: {nap (date / datetime / "YYYY-MM-DD"): árfolyam}} a publikációs napokra.
+    Visszatérés: a kiírt fejléc.
+    """
+    arrays = {}
+    for currency, days in sorted(rates.items()):
+        if not days:
+            continue
+        offsets = np.array([to_epoch_day(day) for day in days], dtype=np.int64)
+        origin = int(offsets.min())
+        values = np.full(int(offsets.max()) - origin + 1, np.nan, dtype="<f8")
+        values[offsets - origin] = np.fromiter(days.values(), dtype=np.float64, count=len(days))
+        arrays[currency.upper()] = (origin, values)
+    if not arrays:
+        raise ValueError("Az árfolyam export nem tartalmaz árfolyamot.")
+
+    first_day = min(origin for origin, _ in arrays.values())
+    last_day = max(origin + len(values) - 1 for origin, values in arrays.values())
+    # A fejlécben a tömbök abszolút bájt-eltolása szerepel, ami a fejléc hosszától függ:
+    # a hosszt helyőrző eltolásokkal becsüljük, és a végleges fejlécet erre a méretre egészítjük ki
+    entries = {currency: {"origin": origin, "length": len(values), "offset": 0}
+               for currency, (origin, values) in arrays.items()}
+    header = {
+        "version": 1,
+        "first_day": first_day,
+        "last_day": last_day,
+        "first_date": from_epoch_day(first_day).isoformat(),
+        "last_date": from_epoch_day(last_day).isoformat(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "currencies": entries,
+    }
+    reserved = len(json.dumps(header).encode("utf-8")) + 32 * len(entries)
+    data_start = -(-(len(MAGIC) + HEADER_LENGTH.size + reserved) // ALIGNMENT) * ALIGNMENT
+    offset = data_start
+    for currency, (_, values) in arrays.items():
+        entries[currency]["offset"] = offset
+        offset += values.nbytes
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (data_start - len(MAGIC) - HEADER_LENGTH.size - len(encoded))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".mnb_rates.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(HEADER_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+            for _, values in arrays.values():
+                f.write(values.tobytes())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header
+
+
+def open_archive(path: str):
+    """Az archívum megnyitása; hiányzó fájl esetén None, hibás fájl esetén figyelmeztetés és None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return RateArchive(path)
+    except Exception as e:
+        print(f"Hiba az árfolyam archívum megnyitásakor ({path}):", e)
+        return None
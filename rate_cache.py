@@ -0,0 +1,264 @@
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Az alapértelmezett cache fájlok a felhasználó otthoni könyvtárában vannak
+CACHE_DIR = os.path.expanduser("~")
+SQLITE_CACHE_FILE = os.path.join(CACHE_DIR, "exchange_rate_cache.sqlite3")
+# A korábbi verziók JSON cache-e; az SQLite tároló első megnyitáskor egyszer átemeli
+LEGACY_JSON_CACHE_FILE = os.path.join(CACHE_DIR, "exchange_rate_cache.json")
+
+
+@contextmanager
+def file_lock(path: str):
+    """Folyamatok közötti kizárólagos zár egy mellékelt .lock fájlon."""
+    with open(path + ".lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_legacy_json(path: str) -> dict:
+    """Beolvassa a régi "YYYY-MM-DD|CURRENCY": rate formátumú JSON cache-t
+    {(deviza, "YYYY-MM-DD"): (árfolyam, publikációs nap)} alakban. A publikációs nap a régi
+    formátumban nem szerepel, ezért None; az új bejegyzések [árfolyam, publikációs nap] listák.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except Exception as e:
+        print("Hiba a cache fájl betöltésekor:", e)
+        return {}
+    rates = {}
+    for key, rate in raw.items():
+        date_str, _, currency = key.partition("|")
+        if not currency or rate is None:
+            continue
+        if isinstance(rate, list):
+            # [null, null]: vizsgált nap, amelyre nincs árfolyam
+            rates[(currency.upper(), date_str)] = (float(rate[0]) if rate[0] is not None else None, rate[1])
+        else:
+            rates[(currency.upper(), date_str)] = (float(rate), None)
+    return rates
+
+
+class RateStore:
+    """Árfolyam cache tároló interfész.
+    A kulcs a (deviza, "YYYY-MM-DD") pár, az érték az adott naptári napra érvényes árfolyam és
+    annak MNB publikációs napja ("YYYY-MM-DD", ismeretlen esetén None). Az árfolyam None, ha a
+    múltbeli napot már lekérdeztük, de nincs rá árfolyam (negatív cache: nem kérdezzük le újra);
+    ilyen érték nem írhat felül tárolt árfolyamot.
+    """
+
+    def get(self, currency: str, date_str: str):
+        """(árfolyam, publikációs nap) vagy None."""
+        raise NotImplementedError
+
+    def get_range(self, currency: str, start_str: str, end_str: str) -> dict:
+        """Az [start_str, end_str] intervallumba eső tárolt értékek:
+        {"YYYY-MM-DD": (árfolyam, publikációs nap)}.
+        """
+        raise NotImplementedError
+
+    def put_many(self, items) -> None:
+        """(deviza, "YYYY-MM-DD", árfolyam, publikációs nap) négyesek mentése egyetlen kötegben."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryRateStore(RateStore):
+    """Csak memóriában tárolt cache (tesztekhez, egyszeri futtatásokhoz)."""
+
+    def __init__(self, rates: dict = None):
+        self.rates = dict(rates or {})
+
+    def get(self, currency, date_str):
+        return self.rates.get((currency, date_str))
+
+    def get_range(self, currency, start_str, end_str):
+        return {
+            d: value for (c, d), value in self.rates.items()
+            if c == currency and start_str <= d <= end_str
+        }
+
+    def put_many(self, items):
+        for currency, date_str, rate, published in items:
+            if rate is not None or self.rates.get((currency, date_str), (None,))[0] is None:
+                self.rates[(currency, date_str)] = (rate, published)
+
+
+class JSONRateStore(MemoryRateStore):
+    """A korábbi JSON formátumú cache fájl, folyamatok közötti zárral és atomikus cserével.
+    Mentéskor a lemezen lévő állapotot újraolvassa és összefésüli, így párhuzamos futások
+    nem írják felül egymás értékeit.
+    """
+
+    def __init__(self, path: str = LEGACY_JSON_CACHE_FILE):
+        self.path = path
+        super().__init__(read_legacy_json(path))
+
+    def put_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        with file_lock(self.path):
+            memory, self.rates = self.rates, read_legacy_json(self.path)
+            super().put_many([(c, d, rate, published) for (c, d), (rate, published) in memory.items()] + items)
+            raw = {
+                f"{d}|{c}": [rate, published] if published or rate is None else rate
+                for (c, d), (rate, published) in sorted(self.rates.items())
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".exchange_rate_cache.", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(raw, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except Exception as e:
+                print("Hiba a cache fájl mentésekor:", e)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+class SQLiteRateStore(RateStore):
+    """SQLite alapú, (deviza, dátum) szerint indexelt cache.
+    Az írások tranzakciónként kötegelve történnek, a párhuzamos folyamatokat az SQLite
+    zárolása (WAL mód) választja el. Első megnyitáskor egyszer átemeli a régi JSON cache-t.
+    """
+
+    def __init__(self, path: str = SQLITE_CACHE_FILE, legacy_json: str = LEGACY_JSON_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS rates ("
+            " currency TEXT NOT NULL, date TEXT NOT NULL, rate REAL, published TEXT,"
+            " PRIMARY KEY (currency, date)) WITHOUT ROWID"
+        )
+        columns = {row[1]: row for row in self.conn.execute("PRAGMA table_info(rates)")}
+        if "published" not in columns:
+            # Korábbi séma: a publikációs nap oszlop hiányzik
+            self.conn.execute("ALTER TABLE rates ADD COLUMN published TEXT")
+        if columns["rate"][3]:
+            self._allow_missing_rates()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+    def _allow_missing_rates(self) -> None:
+        """Korábbi séma: a rate oszlop NOT NULL, így a negatív cache nem tárolható; a tábla újraépítése."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Másik folyamat közben már újraépíthette
+                if [row for row in self.conn.execute("PRAGMA table_info(rates)") if row[1] == "rate"][0][3]:
+                    self.conn.execute(
+                        "CREATE TABLE rates_new ("
+                        " currency TEXT NOT NULL, date TEXT NOT NULL, rate REAL, published TEXT,"
+                        " PRIMARY KEY (currency, date)) WITHOUT ROWID"
+                    )
+                    self.conn.execute(
+                        "INSERT INTO rates_new (currency, date, rate, published)"
+                        " SELECT currency, date, rate, published FROM rates"
+                    )
+                    self.conn.execute("DROP TABLE rates")
+                    self.conn.execute("ALTER TABLE rates_new RENAME TO rates")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _migrate_json(self, legacy_json: str) -> None:
+        with self._lock:
+            done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if done or not os.path.exists(legacy_json):
+                return
+            rates = read_legacy_json(legacy_json)
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Másik folyamat közben már átemelhette
+                if self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone() is None:
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO rates (currency, date, rate, published) VALUES (?, ?, ?, ?)",
+                        [(c, d, rate, published) for (c, d), (rate, published) in rates.items()]
+                    )
+                    self.conn.execute(
+                        "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (legacy_json,)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        print(f"A régi JSON cache átemelve ({len(rates)} árfolyam): {legacy_json} -> {self.path}")
+
+    def get(self, currency, date_str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT rate, published FROM rates WHERE currency = ? AND date = ?", (currency, date_str)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def get_range(self, currency, start_str, end_str):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT date, rate, published FROM rates WHERE currency = ? AND date BETWEEN ? AND ?",
+                (currency, start_str, end_str)
+            ).fetchall()
+        return {d: (rate, published) for d, rate, published in rows}
+
+    def put_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A hiányt jelző (NULL) sor tárolt árfolyamot nem ír felül
+                self.conn.executemany(
+                    "INSERT INTO rates (currency, date, rate, published) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (currency, date) DO UPDATE SET rate = excluded.rate, published = excluded.published"
+                    " WHERE excluded.rate IS NOT NULL", items
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def open_default_store() -> RateStore:
+    """Az alapértelmezett (SQLite) tároló; ha az nem nyitható meg, a JSON fájlra esik vissza."""
+    try:
+        return SQLiteRateStore()
+    except sqlite3.Error as e:
+        print("Hiba az SQLite cache megnyitásakor, JSON cache használata:", e)
+        return JSONRateStore()
@@ -0,0 +1,139 @@
+from datetime import date, datetime, timedelta
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+EPOCH = date(1970, 1, 1)
+
+# Ismeretlen publikációs nap (pl. a régi JSON cache-ből átemelt árfolyamoknál)
+UNKNOWN = -1
+
+
+def to_epoch_day(value) -> int:
+    """Dátum (date, datetime vagy "YYYY-MM-DD") -> 1970-01-01 óta eltelt napok száma."""
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], "%Y-%m-%d")
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def from_epoch_day(day: int) -> date:
+    return EPOCH + timedelta(days=int(day))
+
+
+class RateCalendar:
+    """Egy deviza sűrű, naptári napokra indexelt árfolyam naptára.
+    Minden naphoz tárolja az árfolyamot és azt a publikációs (MNB munka-) napot, amelyre a nap
+    visszavezethető; hétvégén és ünnepnapon ez az előző munkanap. A vizsgált, de árfolyam nélküli
+    napok is rögzítésre kerülnek (checked igaz, rate NaN), így ugyanazt a napot nem kérdezzük le újra;
+    a fill ezeket is visszaadja, hogy a tároló a következő futásokra is megjegyezze (negatív cache).
+    A lekérdezés O(1): a nap indexe a tömbökben a nap és az origin különbsége.
+    """
+
+    def __init__(self, fallback_days: int):
+        self.fallback_days = fallback_days
+        self.origin = None
+        self.rates = np.empty(0, dtype=np.float64)
+        self.published = np.empty(0, dtype=np.int32)
+        self.checked = np.empty(0, dtype=bool)
+
+    def _ensure(self, first: int, last: int) -> None:
+        """Kiterjeszti a tömböket, hogy a [first, last] napokat lefedjék."""
+        if self.origin is not None:
+            end = self.origin + len(self.rates) - 1
+            if first >= self.origin and last <= end:
+                return
+            first, last = min(self.origin, first), max(end, last)
+        size = last - first + 1
+        rates = np.full(size, np.nan)
+        published = np.full(size, UNKNOWN, dtype=np.int32)
+        checked = np.zeros(size, dtype=bool)
+        if self.origin is not None:
+            offset = self.origin - first
+            rates[offset:offset + len(self.rates)] = self.rates
+            published[offset:offset + len(self.published)] = self.published
+            checked[offset:offset + len(self.checked)] = self.checked
+        self.origin, self.rates, self.published, self.checked = first, rates, published, checked
+
+    def _slice(self, first: int, last: int):
+        if self.origin is None or first < self.origin or last >= self.origin + len(self.rates):
+            return None
+        return slice(first - self.origin, last - self.origin + 1)
+
+    def covered(self, first: int, last: int) -> bool:
+        """Igaz, ha a [first, last] minden napja vizsgált már (árfolyammal vagy anélkül)."""
+        s = self._slice(first, last)
+        return s is not None and bool(self.checked[s].all())
+
+    def set(self, day: int, rate: float, published_day: int = UNKNOWN) -> None:
+        """Egy ismert (pl. a tárolóból betöltött) nap rögzítése; rate None: vizsgált, árfolyam nélküli nap."""
+        self._ensure(day, day)
+        i = day - self.origin
+        self.rates[i] = rate if rate is not None else np.nan
+        self.published[i] = published_day
+        self.checked[i] = True
+
+    def fill(self, first: int, last: int, publications) -> list:
+        """A [first, last] napokat előre kitöltéssel (forward-fill) feltölti a publikált
+        (publikációs nap, árfolyam) párokból, legfeljebb fallback_days nap visszalépéssel.
+        Visszatérés: az újonnan kapott (nap, árfolyam, publikációs nap) hármasok listája; a most
+        vizsgált, árfolyam nélküli múltbeli napok (nap, None, UNKNOWN) alakban.
+        """
+        self._ensure(first, last)
+        days = np.arange(first, last + 1)
+        pub_days = np.array([p for p, _ in publications], dtype=np.int64)
+        pub_rates = np.array([r for _, r in publications], dtype=np.float64)
+        order = np.argsort(pub_days, kind="stable")
+        pub_days, pub_rates = pub_days[order], pub_rates[order]
+
+        rates = np.full(len(days), np.nan)
+        published = np.full(len(days), UNKNOWN, dtype=np.int64)
+        valid = np.zeros(len(days), dtype=bool)
+        if len(pub_days):
+            idx = np.searchsorted(pub_days, days, side="right") - 1
+            valid = idx >= 0
+            valid[valid] = days[valid] - pub_days[idx[valid]] <= self.fallback_days
+            rates[valid] = pub_rates[idx[valid]]
+            published[valid] = pub_days[idx[valid]]
+
+        s = self._slice(first, last)
+        old_rates, old_published = self.rates[s], self.published[s]
+        changed = valid & ((old_published != published) | (old_rates != rates))
+        # A mai és jövőbeli napokat nem cache-eljük negatívan: később még lehet rájuk árfolyam
+        missing = ~valid & ~self.checked[s] & (days < to_epoch_day(date.today()))
+        # A korábban ismert árfolyamot nem írjuk felül hiánnyal
+        self.rates[s] = np.where(valid, rates, old_rates)
+        self.published[s] = np.where(valid, published, old_published)
+        self.checked[s] |= valid | missing
+        return [
+            (int(d), float(r), int(p))
+            for d, r, p in zip(days[changed], rates[changed], published[changed])
+        ] + [(int(d), None, UNKNOWN) for d in days[missing]]
+
+    def is_checked(self, day: int) -> bool:
+        s = self._slice(day, day)
+        return s is not None and bool(self.checked[s.start])
+
+    def lookup(self, day: int):
+        """(árfolyam, publikációs nap) az adott napra; None, ha nincs árfolyam vagy ismeretlen."""
+        s = self._slice(day, day)
+        if s is None or np.isnan(self.rates[s.start]):
+            return None, None
+        published = int(self.published[s.start])
+        return float(self.rates[s.start]), (published if published != UNKNOWN else None)
+
+    def lookup_many(self, days):
+        """Vektorizált lekérdezés: (árfolyamok, publikációs napok) tömbök;
+        ismeretlen vagy árfolyam nélküli nap -> NaN / UNKNOWN.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        rates = np.full(len(days), np.nan)
+        published = np.full(len(days), UNKNOWN, dtype=np.int64)
+        if self.origin is None:
+            return rates, published
+        pos = days - self.origin
+        inside = (pos >= 0) & (pos < len(self.rates))
+        rates[inside] = self.rates[pos[inside]]
+        published[inside] = self.published[pos[inside]]
+        return rates, published
@@ -0,0 +1,389 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+
+from datetime import date, datetime
+from lazy_imports import lazy_import
+from rate_cache import CACHE_DIR
+from instrumentation import stats as run_stats
+
+pd = lazy_import("pandas")
+
+# Az MNB WSDL helyi másolata; ha létezik, a kliens ebből épül fel hálózati letöltés nélkül
+WSDL_CACHE_FILE = os.path.join(CACHE_DIR, "mnb_arfolyamok.wsdl")
+
+MNB_WSDL_URL = "http://www.mnb.hu/arfolyamok.asmx?wsdl"
+
+# A kapcsolódás és egy kérés (válasz olvasásának) időkorlátja (másodperc)
+CONNECT_TIMEOUT = 5
+REQUEST_TIMEOUT = 30
+
+# Átmeneti hiba (hálózati hiba, időtúllépés, HTTP 5xx / 429) esetén ennyi próbálkozás egy kérésre;
+# a várakozás RETRY_BACKOFF másodpercről indul, és próbálkozásonként duplázódik (legfeljebb RETRY_BACKOFF_MAX)
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 8.0
+
+# Ezekre a HTTP válaszokra (túlterhelés, átjáró hiba) a törzs feldolgozása nélkül újrapróbálkozunk;
+# a HTTP 500 SOAP Fault-ot hordozhat, azt a zeep dolgozza fel
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# A nyitva tartott (keep-alive) kapcsolatok száma; legalább a párhuzamos lekérések száma
+POOL_SIZE = 4
+
+# Ennyi egymást követő sikertelen próbálkozás után a megszakító kinyit, és CIRCUIT_RESET másodpercig
+# minden kérést azonnal elutasít
+CIRCUIT_FAILURES = 5
+CIRCUIT_RESET = 60.0
+
+
+class SourceUnavailableError(RuntimeError):
+    """Az árfolyam forrás nem érhető el (az újrapróbálkozások elfogytak, vagy a megszakító nyitva van)."""
+
+
+def _to_date(value) -> date:
+    """date, datetime vagy "YYYY-MM-DD" -> date."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def parse_mnb_rates(response_xml) -> dict:
+    """Feldolgozza a GetExchangeRates válaszát (MNBExchangeRates XML).
+    Visszatérés: {deviza: {datetime: árfolyam}} minden a válaszban szereplő napra.
+    """
+    try:
+        root = ET.fromstring(response_xml)
+    except Exception as e:
+        print(f"XML feldolgozási hiba: {e}")
+        return {}
+
+    rates = {}
+    for day in root.findall("Day"):
+        day_date = day.attrib.get("date")
+        try:
+            parsed_date = datetime.strptime(day_date, "%Y-%m-%d")
+        except Exception:
+            run_stats.warn("Hibás dátum az MNB válaszban", day_date)
+            continue
+        for rate in day.findall("Rate"):
+            curr = rate.attrib.get("curr", "").upper()
+            try:
+                value = float(rate.text.replace(",", "."))
+            except Exception:
+                run_stats.warn("Hibás árfolyam érték az MNB válaszban", rate.text)
+                continue
+            rates.setdefault(curr, {})[parsed_date] = value
+    return rates
+
+
+class RateProvider:
+    """Árfolyam forrás interfész: a publikált (munkanapi) MNB árfolyamok egy időszakra.
+    A hétvégék és ünnepnapok visszavezetését az előző munkanapra, a cache-elést és az offline
+    módot az MNBExchangeService végzi; a forrás csak a publikációs napok árfolyamait adja.
+    CACHEABLE: az eredmény menthető-e a tartós (SQLite) árfolyam cache-be.
+    """
+    CACHEABLE = False
+
+    def fetch(self, currencies, start, end) -> dict:
+        """A devizák [start, end] közötti publikált árfolyamai: {deviza: {date: árfolyam}}.
+        Elérhetetlen forrás esetén kivételt dob.
+        """
+        raise NotImplementedError
+
+    def bytes_received(self) -> int:
+        """A forrásból eddig kapott adat mérete (bájt), ahol értelmezhető."""
+        return 0
+
+    def retries(self) -> int:
+        """Az átmeneti hibák miatt megismételt kérések száma, ahol értelmezhető."""
+        return 0
+
+    def attempts(self):
+        """A forrásnak ténylegesen elküldött kérések száma (az újrapróbálkozásokkal együtt), ahol a
+        forrás maga számolja; egyébként None (ekkor a fetch hívásokat az MNBExchangeService számolja).
+        """
+        return None
+
+
+class CircuitBreaker:
+    """Megszakító a forrás hívásaihoz: failures egymást követő sikertelen próbálkozás után kinyit, és
+    reset_timeout másodpercig minden hívást azonnal elutasít, így a párhuzamos lekérések nem várják
+    ki egyenként a teljes újrapróbálkozási sort. Utána félig nyitott: egyetlen próbahívást enged
+    (a többi hívót továbbra is elutasítja); ha a próbahívás sikeres, bezárul, ha sikertelen, újra
+    kinyit. Több szálból is használható.
+    """
+
+    def __init__(self, failures: int = CIRCUIT_FAILURES, reset_timeout: float = CIRCUIT_RESET):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._count = 0
+        self._opened_at = None
+        self._last_error = None
+        # A folyamatban lévő próbahívást végző szál azonosítója (félig nyitott állapotban)
+        self._trial = None
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """SourceUnavailableError, ha a megszakító nyitva van, vagy félig nyitott állapotban egy másik
+        szál próbahívása még folyamatban van. A várakozási idő leteltekor a hívó szál kapja a próbahívást.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial is None and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._trial = threading.get_ident()
+                return
+            count, error = self._count, self._last_error
+        raise SourceUnavailableError(
+            f"a megszakító nyitva ({count} egymást követő sikertelen próbálkozás, utolsó hiba: {error})"
+        )
+
+    def record(self, success: bool, error: Exception = None) -> None:
+        """Egy próbálkozás eredménye. Sikertelen próbahívás után a megszakító újra kinyit (a
+        várakozási idő újraindul); a nyitás előtt indított, később befejeződő hívások eredménye
+        nem dönt a próbahívás helyett.
+        """
+        with self._lock:
+            trial = self._trial == threading.get_ident()
+            if trial:
+                self._trial = None
+            if success:
+                if self._opened_at is None or trial:
+                    self._count = 0
+                    self._opened_at = None
+            else:
+                self._count += 1
+                self._last_error = error
+                if trial or (self._opened_at is None and self._count >= self.failures):
+                    self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """A próbahívás eredmény nélküli lezárása (pl. nem átmeneti hiba esetén): a megszakító
+        állapota nem változik, a következő hívó kapja a próbahívást.
+        """
+        with self._lock:
+            if self._trial == threading.get_ident():
+                self._trial = None
+
+
+class MNBSoapProvider(RateProvider):
+    """Az MNB GetExchangeRates SOAP szolgáltatása (zeep).
+    A zeep kliens csak az első kérésnél jön létre, a WSDL helyi másolatából (wsdl_cache_file). A
+    kérések egy közös requests.Session kapcsolatkészletén (pool_size keep-alive kapcsolat) futnak,
+    külön kapcsolódási (connect_timeout) és olvasási (request_timeout) időkorláttal. Átmeneti hiba
+    esetén a kérést legfeljebb retries alkalommal, exponenciálisan növekvő várakozással próbálja
+    (lásd RETRY_BACKOFF); utána, vagy nyitott megszakító (breaker) esetén SourceUnavailableError
+    kivételt dob. A SOAP Fault (a szolgáltatás válaszolt) nem ismételhető.
+    """
+    CACHEABLE = True
+
+    def __init__(self, wsdl_url=MNB_WSDL_URL, strict=False, request_timeout=REQUEST_TIMEOUT,
+                 wsdl_cache_file=WSDL_CACHE_FILE, connect_timeout=CONNECT_TIMEOUT, retries=RETRY_ATTEMPTS,
+                 backoff=RETRY_BACKOFF, pool_size=POOL_SIZE, breaker: CircuitBreaker = None):
+        self.wsdl_url = wsdl_url
+        self.strict = strict
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.wsdl_cache_file = wsdl_cache_file
+        self.max_attempts = max(1, retries)
+        self.backoff = backoff
+        self.pool_size = max(1, pool_size)
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._client = None
+        self._bytes = 0
+        self._retries = 0
+        self._attempts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """A zeep kliens, első használatkor létrehozva."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
+
+    def _build_client(self):
+        # A zeep betöltése csak az első SOAP kérésnél (cache hiány esetén) szükséges
+        from zeep import Client, Settings
+        from zeep.transports import Transport
+        settings = Settings(strict=self.strict, xml_huge_tree=True)
+        timeout = (self.connect_timeout, self.request_timeout)
+        transport = Transport(timeout=timeout, operation_timeout=timeout, session=self._build_session())
+        wsdl = self._local_wsdl(transport)
+        if wsdl != self.wsdl_url:
+            try:
+                return Client(wsdl, settings=settings, transport=transport)
+            except Exception as e:
+                # Sérült helyi másolat: töröljük, és az eredeti címről töltjük be
+                print("Hiba a helyi WSDL betöltésekor, újraletöltés:", e)
+                os.remove(wsdl)
+        return Client(self.wsdl_url, settings=settings, transport=transport)
+
+    def _build_session(self):
+        """Kapcsolatkészlet a párhuzamos lekérésekhez; az újrapróbálkozást a fetch végzi."""
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.hooks["response"].append(self._check_status)
+        return session
+
+    @staticmethod
+    def _check_status(response, *args, **kwargs):
+        # Pl. egy HTML "Service Unavailable" oldalt a zeep nem SOAP Fault-ként, hanem HTTPError-ként lásson
+        if response.status_code in RETRY_STATUSES:
+            response.raise_for_status()
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        """Átmeneti hiba-e: hálózati hiba, időtúllépés, vagy HTTP 5xx / 429 válasz."""
+        from requests import RequestException
+        from zeep.exceptions import TransportError
+        if isinstance(error, TransportError):
+            return error.status_code >= 500 or error.status_code == 429
+        return isinstance(error, (RequestException, OSError))
+
+    def _local_wsdl(self, transport) -> str:
+        """A WSDL helyi másolatának elérési útja; ha még nincs meg, letölti és atomikusan elmenti.
+        Hiba esetén az eredeti URL-t adja vissza.
+        """
+        if not self.wsdl_cache_file:
+            return self.wsdl_url
+        if os.path.exists(self.wsdl_cache_file):
+            return self.wsdl_cache_file
+        try:
+            content = transport.load(self.wsdl_url)
+            directory = os.path.dirname(os.path.abspath(self.wsdl_cache_file))
+            fd, tmp_path = tempfile.mkstemp(prefix=".mnb_arfolyamok.", dir=directory)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self.wsdl_cache_file)
+            return self.wsdl_cache_file
+        except Exception as e:
+            # A hálózati hibát a kliens létrehozása jelzi (és az újrapróbálkozás kezeli)
+            if not self._retryable(e):
+                print("Hiba a WSDL helyi mentésekor:", e)
+            return self.wsdl_url
+
+    def fetch(self, currencies, start, end):
+        attempt = 0
+        while True:
+            self.breaker.check()
+            attempt += 1
+            with self._lock:
+                self._attempts += 1
+            try:
+                response_xml = self.client.service.GetExchangeRates(
+                    startDate=_to_date(start).isoformat(),
+                    endDate=_to_date(end).isoformat(),
+                    currencyNames=",".join(currencies)
+                )
+                break
+            except Exception as e:
+                if not self._retryable(e):
+                    # A szolgáltatás elérhetőségéről nem dönt (pl. SOAP Fault), a próbahívás lezárul
+                    self.breaker.release()
+                    raise
+                self.breaker.record(False, e)
+                if attempt >= self.max_attempts:
+                    raise SourceUnavailableError(f"{attempt} sikertelen próbálkozás, utolsó hiba: {e}") from e
+            # Átmeneti hiba: várakozás után újra (közben a megszakító kinyithat)
+            with self._lock:
+                self._retries += 1
+            time.sleep(min(self.backoff * 2 ** (attempt - 1), RETRY_BACKOFF_MAX))
+        self.breaker.record(True)
+        if not response_xml:
+            return {}
+        with self._lock:
+            self._bytes += len(response_xml.encode("utf-8") if isinstance(response_xml, str) else response_xml)
+        return parse_mnb_rates(response_xml)
+
+    def bytes_received(self):
+        return self._bytes
+
+    def retries(self):
+        return self._retries
+
+    def attempts(self):
+        return self._attempts
+
+
+class MemoryRateProvider(RateProvider):
+    """Memóriában megadott árfolyamok (tesztekhez, benchmarkokhoz).
+    rates: {deviza: {nap: árfolyam}}, a nap date, datetime vagy "YYYY-MM-DD". A calls lista
+    a kapott kéréseket (devizák, kezdőnap, végnap) rögzíti.
+    """
+
+    def __init__(self, rates: dict = None):
+        self.rates = {}
+        self.calls = []
+        for currency, days in (rates or {}).items():
+            self.add(currency, days)
+
+    def add(self, currency: str, days: dict) -> None:
+        target = self.rates.setdefault(currency.upper(), {})
+        for day, rate in days.items():
+            target[_to_date(day)] = float(rate)
+
+    def fetch(self, currencies, start, end):
+        start, end = _to_date(start), _to_date(end)
+        self.calls.append((tuple(currencies), start, end))
+        return {
+            currency: {day: rate for day, rate in self.rates.get(currency, {}).items() if start <= day <= end}
+            for currency in currencies
+            if currency in self.rates
+        }
+
+
+class FileRateProvider(MemoryRateProvider):
+    """Előre letöltött árfolyamok helyi fájlból, hálózat nélkül. Formátum a kiterjesztés szerint:
+    - .csv: date, currency, rate oszlopok (egy sor egy publikált árfolyam), vagy táblázatosan
+      egy date oszlop és devizánként egy oszlop (pl. date,EUR,USD)
+    - .json: {deviza: {"YYYY-MM-DD": árfolyam}}
+    - .xml: a GetExchangeRates válasza (MNBExchangeRates) változatlanul elmentve
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".csv":
+            self._read_csv(path)
+        elif extension == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                for currency, days in json.load(f).items():
+                    self.add(currency, days)
+        elif extension == ".xml":
+            with open(path, "rb") as f:
+                for currency, days in parse_mnb_rates(f.read()).items():
+                    self.add(currency, days)
+        else:
+            raise ValueError(f"Ismeretlen árfolyam fájl formátum: {path} (csv, json vagy xml)")
+
+    def _read_csv(self, path: str) -> None:
+        df = pd.read_csv(path, dtype=str)
+        df.columns = df.columns.str.strip().str.lower()
+        if "date" in df.columns and "currency" not in df.columns:
+            # Táblázatos export: devizánként egy oszlop
+            df = df.melt(id_vars="date", var_name="currency", value_name="rate")
+        missing = {"date", "currency", "rate"} - set(df.columns)
+        if missing:
+            raise ValueError(f"Hiányzó oszlopok az árfolyam fájlban ({path}): {', '.join(sorted(missing))}")
+        df = df.dropna(subset=["date", "currency", "rate"])
+        # Tizedesvessző is megengedett (mint az MNB válaszában)
+        rates = pd.to_numeric(df["rate"].str.strip().str.replace(",", ".", regex=False), errors="coerce")
+        days = pd.to_datetime(df["date"].str.strip().str[:10], format="%Y-%m-%d", errors="coerce")
+        valid = (rates.notna() & days.notna()).to_numpy()
+        currencies = df["currency"].str.strip().str.upper().to_numpy()[valid]
+        for currency, day, rate in zip(currencies, days.dt.date.to_numpy()[valid], rates.to_numpy()[valid]):
+            self.rates.setdefault(currency, {})[day] = float(rate)
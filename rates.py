@@ -0,0 +1,68 @@
+import os
+import sys
+import argparse
+
+from rate_archive import ARCHIVE_FILE, RateArchive, write_archive
+from rate_provider import FileRateProvider
+
+
+def import_rates(source: str, archive: str = ARCHIVE_FILE) -> dict:
+    """Az MNB teljes árfolyam exportjának (lásd rate_provider.FileRateProvider formátumai) átírása
+    memóriába leképezhető árfolyam archívumba. Visszatérés: az archívum fejléce.
+    """
+    provider = FileRateProvider(source)
+    return write_archive(archive, provider.rates, source=os.path.basename(source))
+
+
+def print_info(header: dict, path: str) -> None:
+    currencies = header["currencies"]
+    print(f"Árfolyam archívum: {path} ({os.path.getsize(path)} bájt)")
+    print(f"  Időszak: {header['first_date']} - {header['last_date']}, {len(currencies)} deviza")
+    print(f"  Forrás: {header.get('source') or '-'}, létrehozva: {header.get('created')}")
+    print("  Devizák: " + ", ".join(sorted(currencies)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MNB árfolyam archívum kezelése.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser(
+        "import",
+        help="Az MNB teljes árfolyam exportjának betöltése memóriába leképezhető archívumba.",
+    )
+    import_parser.add_argument(
+        "source",
+        type=str,
+        help="Az export fájl: a GetExchangeRates XML válasza, csv (date,currency,rate vagy date + devizánként egy oszlop) vagy json.",
+    )
+    import_parser.add_argument(
+        "-o", "--output",
+        dest="archive",
+        type=str,
+        default=ARCHIVE_FILE,
+        help=f"Az archívum elérési útja (alapértelmezés: {ARCHIVE_FILE}, ezt a tax-wizard automatikusan használja).",
+    )
+
+    info_parser = commands.add_parser("info", help="Az archívum időszaka és devizái.")
+    info_parser.add_argument("archive", type=str, nargs="?", default=ARCHIVE_FILE, help="Az archívum elérési útja.")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        if not os.path.exists(args.source):
+            sys.exit(f"{args.source} file not found.")
+        try:
+            header = import_rates(args.source, args.archive)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Hiba az árfolyam export betöltésekor: {e}")
+        print_info(header, args.archive)
+    else:
+        if not os.path.exists(args.archive):
+            sys.exit(f"{args.archive} file not found.")
+        try:
+            archive = RateArchive(args.archive)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Hiba az árfolyam archívum megnyitásakor: {e}")
+        print_info(archive.header, args.archive)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import io
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import tempfile
+import threading
+
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from instrumentation import stats
+from lazy_imports import load
+from mnb_exchange_service import RateUnavailableError, open_exchange_service
+from tax_wizard import LOT_METHODS, REPORT_FILES, REPORT_GENERATORS, build_report, report_generator, unavailable_format
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# A feltöltött kimutatás legnagyobb mérete (bájt)
+MAX_UPLOAD_BYTES = 200 * 1024 * 1024
+
+# A kimeneti formátumok HTTP tartalomtípusa; a munkalaponként könyvtárba írt formátumok zip-ben
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "json": "application/json",
+    "csv": "application/zip",
+    "parquet": "application/zip",
+}
+
+# Induláskor (--warm) ennyi teljes évre visszamenőleg töltjük be az árfolyamokat
+WARM_YEARS = 3
+
+
+class ReportService:
+    """Kimutatások feldolgozása egy folyamatosan futó szerverben. Az MNBExchangeService (a memóriában
+    tartott árfolyam-naptárak, az SQLite cache kapcsolata és a zeep kliens) a kérések között megmarad,
+    és a modulok betöltése is csak egyszer történik meg, így egy riport ideje a tényleges feldolgozás
+    ideje. A riportok egymás után készülnek (a futási statisztika és a figyelmeztetések
+    folyamatszintűek); a kérések fogadása párhuzamos.
+    """
+
+    def __init__(self, exchange_service, chunksize: int = None):
+        self.exchange_service = exchange_service
+        self.chunksize = chunksize
+        self.reports = 0
+        self._lock = threading.Lock()
+
+    def warm(self, currencies, years: int = WARM_YEARS) -> None:
+        """A devizák árfolyamainak betöltése az elmúlt years évre (és a folyó évre)."""
+        today = datetime.now()
+        self.exchange_service.prefetch(currencies, datetime(today.year - years, 1, 1), today)
+
+    def generate(self, mode: str, content: bytes, output_format: str = "xlsx", lot_method: str = "fifo",
+                 tax_year: int = None):
+        """Egy feltöltött kimutatás (a CSV tartalma) riportja.
+        Visszatérés: (a riport tartalma, tartalomtípus, fájlnév, figyelmeztetések kategóriánként).
+        """
+        if mode not in REPORT_FILES:
+            raise ValueError(f"Ismeretlen mód: {mode or '-'} ({', '.join(REPORT_FILES)})")
+        if output_format not in REPORT_GENERATORS:
+            raise ValueError(f"Ismeretlen formátum: {output_format} ({', '.join(REPORT_GENERATORS)})")
+        if unavailable_format(output_format):
+            raise ValueError(unavailable_format(output_format))
+        if lot_method not in LOT_METHODS:
+            raise ValueError(f"Ismeretlen lot_method: {lot_method} ({', '.join(LOT_METHODS)})")
+
+        with self._lock, tempfile.TemporaryDirectory(prefix="tax_wizard_server.") as directory:
+            stats.reset()
+            csv_file = os.path.join(directory, "statement.csv")
+            with open(csv_file, "wb") as f:
+                f.write(content)
+            try:
+                report_data, sheet_format = build_report(
+                    mode, csv_file, self.exchange_service, self.chunksize, lot_method, tax_year=tax_year
+                )
+                generator = report_generator(output_format, os.path.join(directory, REPORT_FILES[mode]))
+                with stats.stage("write"):
+                    generator.generate(report_data, sheet_format_configs=sheet_format)
+                # Az újonnan lekért árfolyamok a tartós cache-be
+                self.exchange_service.flush()
+            finally:
+                warnings = stats.as_dict()["warnings"]
+                stats.flush_warnings()
+            self.reports += 1
+            output = generator.output_file
+            filename = os.path.basename(output) + (".zip" if os.path.isdir(output) else "")
+            return self._read_output(output), CONTENT_TYPES[output_format], filename, warnings
+
+    @staticmethod
+    def _read_output(path: str) -> bytes:
+        """A generált riport tartalma; munkalaponkénti fájlok (könyvtár) esetén zip archívumként."""
+        if not os.path.isdir(path):
+            with open(path, "rb") as f:
+                return f.read()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name in sorted(os.listdir(path)):
+                archive.write(os.path.join(path, name), arcname=name)
+        return buffer.getvalue()
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    """HTTP végpontok:
+       - POST /report?mode=...&format=xlsx&lot_method=fifo&tax_year=...: a kérés törzse a kimutatás
+         (CSV), a válasz a riport (xlsx, json, vagy csv / parquet esetén zip); a figyelmeztetések
+         kategóriánkénti száma az X-Report-Warnings fejlécben (JSON)
+       - GET /health: a szerver állapota és az MNB árfolyam szolgáltatás számlálói
+       Hibás kérésre 400, elérhetetlen árfolyamra 503 a válasz, {"error": "..."} törzzsel.
+    """
+    server_version = "TaxWizard"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send_json(404, {"error": "Ismeretlen útvonal."})
+        service = self.server.service
+        self._send_json(200, {"status": "ok", "reports": service.reports, "mnb": service.exchange_service.stats()})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/report":
+            return self._send_json(404, {"error": "Ismeretlen útvonal."})
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self.close_connection = True
+            return self._send_json(411, {"error": "Hiányzó Content-Length fejléc."})
+        if length > MAX_UPLOAD_BYTES:
+            self.close_connection = True
+            return self._send_json(413, {"error": f"A kimutatás legfeljebb {MAX_UPLOAD_BYTES} bájt lehet."})
+        content = self.rfile.read(length)
+
+        start = time.perf_counter()
+        try:
+            tax_year = int(query["tax_year"]) if query.get("tax_year") else None
+            body, content_type, filename, warnings = self.server.service.generate(
+                query.get("mode", "").lower(), content, query.get("format", "xlsx"),
+                query.get("lot_method", "fifo"), tax_year
+            )
+        except RateUnavailableError as e:
+            return self._send_json(503, {"error": str(e)})
+        except (ValueError, KeyError) as e:
+            return self._send_json(400, {"error": f"Hibás kimutatás vagy paraméter: {e}"})
+        except Exception as e:
+            self.log_error("Hiba a riport készítésekor: %r", e)
+            return self._send_json(500, {"error": f"Hiba a riport készítésekor: {e}"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Report-Warnings", json.dumps(warnings))
+        self.send_header("X-Report-Time", f"{time.perf_counter() - start:.3f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(service: ReportService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """A service-t kiszolgáló (még el nem indított) HTTP szerver."""
+    server = ThreadingHTTPServer((host, port), ReportHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Riport szerver: a kimutatásokat helyi HTTP végponton fogadja, az árfolyam cache a kérések között a memóriában marad."
+    )
+    parser.add_argument("--host", dest="host", type=str, default=DEFAULT_HOST, help=f"A figyelt cím (alapértelmezés: {DEFAULT_HOST}).")
+    parser.add_argument("--port", dest="port", type=int, default=DEFAULT_PORT, help=f"A figyelt port (alapértelmezés: {DEFAULT_PORT}).")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Csak a helyi árfolyam cache-t használja; hiányzó árfolyam esetén a kérés 503 hibával tér vissza.",
+    )
+    parser.add_argument(
+        "--allow-missing-rates",
+        dest="allow_missing_rates",
+        action="store_true",
+        help="Hiányzó MNB árfolyam esetén 503 helyett figyelmeztetés, a kötések 0, a jövedelmek 1 értékkel számolva.",
+    )
+    parser.add_argument(
+        "--rates-file",
+        dest="rates_file",
+        type=str,
+        default=None,
+        help="Előre letöltött árfolyamok (csv: date,currency,rate; json; vagy az MNB XML válasza) az MNB szolgáltatás helyett.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        dest="chunksize",
+        type=int,
+        default=None,
+        help="Streaming mód: a kimutatásokat ennyi soros darabokban dolgozza fel (nagy kimutatásokhoz).",
+    )
+    parser.add_argument(
+        "--warm",
+        dest="warm",
+        type=str,
+        default=None,
+        help=f"Induláskor betölti a megadott devizák (pl. USD,EUR,GBP) árfolyamait az elmúlt {WARM_YEARS} évre.",
+    )
+
+    args = parser.parse_args()
+    if args.rates_file and not os.path.exists(args.rates_file):
+        sys.exit(f"{args.rates_file} file not found.")
+
+    try:
+        exchange_service = open_exchange_service(args.rates_file, args.offline, args.allow_missing_rates)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Hiba az árfolyam fájl betöltésekor: {e}")
+    # A CLI-vel ellentétben a szerver induláskor tölti be a nehéz könyvtárakat, nem az első kéréskor
+    load("pandas", "numpy")
+    service = ReportService(exchange_service, args.chunksize)
+    if args.warm:
+        try:
+            service.warm([currency.strip() for currency in args.warm.split(",")])
+        except RateUnavailableError as e:
+            print(f"Figyelem: {e}")
+
+    try:
+        server = make_server(service, args.host, args.port)
+    except OSError as e:
+        sys.exit(f"Hiba a szerver indításakor: {e}")
+    print(f"Riport szerver: http://{args.host}:{server.server_address[1]} (POST /report?mode=..., GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        exchange_service.flush()
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,522 @@
+from __future__ import annotations
+
 import os
 import sys
+import json
 import argparse
-import pandas as pd
 import re
-import numpy as np
+import importlib.util
 
-from datetime import datetime
-from openpyxl.utils import get_column_letter
+from datetime import date, datetime
+from lazy_imports import lazy_import
 from excel_config import (
     SHEET_FORMAT_CONFIGS,
+    SHEET_FORMAT_CONFIGS_LOTS,
     SHEET_FORMAT_CONFIGS_REVOLUT_SAVINGS,
+    SHEET_FORMAT_CONFIGS_REVOLUT_EXCHANGE,
     HUF_FORMAT,
     NUMBER_FORMAT
 )
-from mnb_exchange_service import MNBExchangeService
+from mnb_exchange_service import (
+    MNBExchangeService,
+    RateUnavailableError,
+    CURRENCY_CODE_RE,
+    exchange_service_for,
+    open_exchange_service
+)
+from instrumentation import WARNING_EXAMPLES, stats
+from rate_calendar import UNKNOWN
+from lot_matching import TRADE_COLUMNS, LotMatcher, match_lots, fold_positions, position_frames
+from incremental import IncrementalRun, default_state_file
+from ledger import PositionLedger
+
+# A pandas és a numpy csak az első használatkor töltődik be (a --help és a hibás argumentumok gyorsak);
+# az openpyxl-t az Excel generátor, a zeep-et az MNB SOAP forrás tölti be
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 STATEMENT_PREFIX = "[statement][transactions]"
 
+# Realizált PnL számítási módok: tételes párosítás (FIFO/LIFO), vagy tickerenkénti összesítés
+LOT_METHODS = ["fifo", "lifo", "aggregate"]
+
+# A Lightyear kimutatás dátumformátuma, pl. "19/05/2023 11:00:00"
+LIGHTYEAR_DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+# A Revolut tranzakciós kimutatás dátumai ISO 8601 szerintiek, pl. "2023-09-11T11:00:00.000000Z"
+REVOLUT_DATE_FORMAT = "ISO8601"
+# A Revolut megtakarítási kimutatás dátumformátuma, pl. "Dec 31, 2024, 2:21:51 AM"
+SAVINGS_DATE_FORMAT = "%b %d, %Y, %I:%M:%S %p"
+# A Revolut számlakivonat dátumformátuma, pl. "2024-01-15 10:00:00"
+EXCHANGE_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# A devizaváltás eladott lábának leírásából a vett deviza, pl. "Exchanged to USD"
+EXCHANGE_TARGET_RE = r"\bto ([A-Z]{3})\b"
+# A devizaváltás kimutatást mindig darabonként, alapértelmezetten ekkora darabokban olvassuk
+EXCHANGE_CHUNKSIZE = 100000
+# A megtakarítási riport havi (év*100 + hónap kulcsú) és devizánkénti gyűjtőinek oszlopai
+SAVINGS_MONTHLY_COLUMNS = ["Month", "Currency", "Description", "Value_num", "Amount_HUF"]
+SAVINGS_TOTAL_COLUMNS = ["Currency", "Value_num", "Amount_HUF"]
+# A jövedelem (kamat, osztalék) táblák oszlopai
+INCOME_COLUMNS = ["Date", "Currency", "Amount (FC)", "Exchange Rate", "Amount (HUF)", "Rate Date"]
+
+# Összeg mezők (pl. "USD 1,234.56", "-£0.02") devizajele vagy -kódja; a "â‚¬" / "â¬" a rossz
+# kódolással beolvasott "€"
+AMOUNT_CURRENCY_RE = re.compile(r"£|\$|€|â‚?¬|\b[A-Z]{3}\b")
+CURRENCY_SYMBOLS = {"£": "GBP", "$": "USD", "€": "EUR", "â‚¬": "EUR", "â¬": "EUR"}
+# Az összeg számértékét adó karakterek; a többi (devizajel, ezres elválasztó, szóköz) elhagyható
+AMOUNT_NUMBER_CHARS = "0123456789.-"
+# A nem numerikus karakterek elhagyása után érvényes szám
+AMOUNT_NUMBER_RE = r"-?(?:\d+\.?\d*|\.\d+)"
+# Ennél hosszabb összeg mezőket (hibás sorok) nem a karaktermátrixban bontunk fel
+AMOUNT_MAX_WIDTH = 64
+
+
+def split_amount_chars(text: np.ndarray):
+    """Fix szélességű unicode (numpy "U") tömb elemeit numerikus és egyéb karakterekre bontja, a
+    karakterek sorrendjét megtartva; a tömböt (n x szélesség) kódpont-mátrixként kezeli, így nincs
+    elemenkénti Python hívás. Visszatérés: (számjegyek, devizajelek) "U" tömbök.
+    """
+    width = text.dtype.itemsize // 4
+    matrix = text.view(np.uint32).reshape(len(text), width)
+    numeric = np.isin(matrix, np.frombuffer(AMOUNT_NUMBER_CHARS.encode("utf-32-le"), dtype=np.uint32))
+    parts = []
+    for keep in (numeric, ~numeric & (matrix != 0)):
+        # Stabil rendezéssel a megtartott karakterek kerülnek előre; a többi 0, amit a "U" típus levág
+        order = np.argsort(~keep, axis=1, kind="stable")
+        kept = np.where(np.take_along_axis(keep, order, axis=1), np.take_along_axis(matrix, order, axis=1), 0)
+        parts.append(np.ascontiguousarray(kept).view(text.dtype).ravel())
+    return parts[0], parts[1]
+
+
+def parse_amounts(values: pd.Series) -> pd.DataFrame:
+    """Összeg mezők vektorizált feldolgozása, a különböző értékeken egyszer: a számérték a nem
+    numerikus karakterek (devizajel, ezres elválasztó) elhagyásával, a deviza a megmaradó jelekből
+    (devizajel vagy ISO kód) adódik. A hiányzó érték 0.0; a nem értelmezhető értékeket összesítve
+    jelzi, és 0-val számol.
+    Visszatérés: a values indexével azonos DataFrame a "Currency" (ISO kód vagy None) és az
+    "Amount" oszlopokkal.
+    """
+    codes, uniques = pd.factorize(values)
+    text = np.asarray(uniques, dtype=object).astype(str)
+    if text.dtype.itemsize // 4 <= AMOUNT_MAX_WIDTH:
+        cleaned, symbols = split_amount_chars(text)
+    else:
+        chars = set("".join(text))
+        numeric = set(AMOUNT_NUMBER_CHARS)
+        text = pd.Series(text, dtype=object)
+        cleaned = text.str.translate({ord(c): None for c in chars - numeric}).to_numpy(dtype=str)
+        symbols = text.str.translate({ord(c): None for c in chars & numeric}).to_numpy(dtype=str)
+
+    # A Python float() szerinti (pontos) kerekítéssel; hibás érték esetén elemenkénti ellenőrzés
+    try:
+        amount = cleaned.astype(np.float64)
+    except ValueError:
+        valid = pd.Series(cleaned, dtype=object).str.fullmatch(AMOUNT_NUMBER_RE).to_numpy(dtype=bool)
+        amount = np.zeros(len(cleaned))
+        amount[valid] = cleaned[valid].astype(np.float64)
+        bad = np.flatnonzero(~valid)
+        stats.warn(
+            "Nem értelmezhető összeg (0-val számolva)",
+            [str(uniques[i]) for i in bad[:WARNING_EXAMPLES]],
+            count=int(np.isin(codes, bad).sum())
+        )
+
+    # A devizajel-változatok (pl. "USD ,", "-£") száma kicsi: ezekre egyenként keresünk
+    symbol_codes, symbol_uniques = pd.factorize(symbols)
+    found = [AMOUNT_CURRENCY_RE.search(symbol) for symbol in symbol_uniques]
+    currency = np.array([CURRENCY_SYMBOLS.get(m.group(), m.group()) if m else None for m in found], dtype=object)
+
+    # A hiányzó értékek kódja -1, ez a hozzáfűzött utolsó elemre (None, 0.0) mutat
+    currency = np.append(currency[symbol_codes], None)
+    amount = np.append(amount, 0.0)
+    return pd.DataFrame({"Currency": currency[codes], "Amount": amount[codes]}, index=values.index)
+
+
+def attach_exchange_rates(df: pd.DataFrame, exchange_service, date_col: str, ccy_col: str) -> pd.DataFrame:
+    """Minden sorhoz hozzárendeli a tranzakció napján érvényes MNB árfolyamot és annak publikációs napját.
+    A devizánkénti sűrű árfolyam-naptár (lásd rate_calendar.RateCalendar) a hétvégéket és ünnepnapokat
+    már az előző munkanapra vezeti vissza, így a hozzárendelés devizánként egyetlen tömbindexelés.
+    Ha egy érvényes devizakódú sorhoz nincs árfolyam, RateUnavailableError kivételt dob, kivéve ha a
+    szolgáltatás ezt megengedi (allow_missing, --allow-missing-rates): ekkor figyelmeztetés mellett NaN.
+    Visszatérés: a df indexével azonos DataFrame az "Exchange Rate" (hiány esetén NaN) és a
+    "Rate Date" (az árfolyam MNB publikációs napja, "YYYY-MM-DD") oszlopokkal.
+    """
+    result = pd.DataFrame({"Exchange Rate": np.nan, "Rate Date": None}, index=df.index)
+    if df.empty:
+        return result
+
+    dates = df[date_col]
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    valid = dates.notna().to_numpy()
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    currencies_col = df[ccy_col].astype(object).to_numpy()
+    currencies = [c for c in pd.unique(currencies_col[valid]) if isinstance(c, str)]
+    exchange_service.prefetch(currencies, dates.min(), dates.max())
+
+    rates = np.full(len(df), np.nan)
+    published = np.full(len(df), UNKNOWN, dtype=np.int64)
+    for currency in currencies:
+        mask = valid & (currencies_col == currency)
+        rates[mask], published[mask] = exchange_service.lookup_rates(currency, days[mask])
+
+    # Érvényes devizakódú sorok, amelyekhez mégsem volt árfolyam: ezek HUF értéke nem számolható ki
+    codes = [c for c in currencies if CURRENCY_CODE_RE.match(c)]
+    missing = valid & np.isnan(rates) & np.isin(currencies_col, codes)
+    if missing.any():
+        examples = [f"{c} {d:%Y-%m-%d}" for c, d in zip(currencies_col[missing][:3], dates[missing][:3])]
+        if not getattr(exchange_service, "allow_missing", False):
+            raise RateUnavailableError(
+                f"Hiányzó MNB árfolyam {int(missing.sum())} sorhoz (pl. {', '.join(examples)}). "
+                f"A riport nem készül el; a hiányzó árfolyamú sorok 0 / 1 értékkel való számolásához "
+                f"használd az --allow-missing-rates kapcsolót."
+            )
+        stats.warn("Hiányzó MNB árfolyam", examples, count=int(missing.sum()))
+
+    rate_dates = published.astype("datetime64[D]")
+    rate_dates[published == UNKNOWN] = np.datetime64("NaT")
+    result["Exchange Rate"] = rates
+    result["Rate Date"] = pd.Series(rate_dates, index=df.index).dt.strftime("%Y-%m-%d")
+    return result
+
+
+def concat_parts(parts: list, columns: list = None) -> pd.DataFrame:
+    """Darabonkénti részeredmények összefűzése; részek hiányában a megadott oszlopokkal üres DataFrame."""
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
+
+
+def read_statement(csv_file: str, usecols: list, dtypes: dict, chunksize: int = None, **kwargs):
+    """A kimutatás beolvasása a processzor betöltési sémája szerint: csak a usecols oszlopok, a dtypes
+    típusaival (a kis számosságú szöveges mezők kategóriaként, így a szűrés és a csoportosítás egész
+    kódokon fut). A dátum oszlopokat a processzor alakítja át explicit formátummal (lásd parse_dates).
+    Visszatérés: DataFrame, chunksize esetén a darabok iterátora.
+    """
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in usecols}
+    return pd.read_csv(csv_file, usecols=usecols, dtype=dtypes, chunksize=chunksize, **kwargs)
+
+
+def parse_dates(values: pd.Series, date_format: str, **kwargs) -> pd.Series:
+    """Dátum szövegek átalakítása explicit formátummal, hogy a (darabonkénti) formátumfelismerés ne
+    térhessen el; az attól eltérő sorokat soronkénti felismeréssel (kwargs, pl. dayfirst) próbálja meg.
+    A nem értelmezhető érték NaT.
+    """
+    dates = pd.to_datetime(values, format=date_format, errors="coerce")
+    unparsed = dates.isna() & values.notna()
+    if unparsed.any():
+        dates[unparsed] = pd.to_datetime(values[unparsed], format="mixed", errors="coerce", **kwargs)
+    return dates
+
+
+def month_keys(dates: pd.Series) -> pd.Series:
+    """Egész hónap kulcsok (év * 100 + hónap, pl. 202412) a dátumokból. A csoportosítás ezeken fut,
+    a soronkénti "YYYY-MM" formázás helyett; a rendezésük a szöveges alakéval azonos.
+    """
+    return dates.dt.year * 100 + dates.dt.month
+
+
+def month_labels(keys: pd.Series) -> pd.Series:
+    """A hónap kulcsok "YYYY-MM" alakban (csak az összesített sorokra)."""
+    keys = keys.astype(int)
+    return (keys // 100).astype(str) + "-" + (keys % 100).astype(str).str.zfill(2)
+
+
+def strip_categories(values: pd.Series) -> pd.Series:
+    """Kategória oszlop szóközeinek levágása a (kevés) kategórián, nem soronként."""
+    stripped = values.cat.categories.str.strip()
+    if stripped.is_unique:
+        return values.cat.rename_categories(stripped)
+    # Levágás után egybeeső kategóriák (pl. "Buy" és " Buy"): soronként
+    return values.astype(values.cat.categories.dtype).str.strip().astype("category")
+
+
+def plain_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """A kategória oszlopok visszaalakítása szöveggé: az állapotba és a riportba a betöltési sémától
+    független táblák kerülnek (a darabonként eltérő kategóriák összefűzése sem gond).
+    """
+    columns = {col: df[col].cat.categories.dtype for col in df.columns
+               if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    return df.astype(columns) if columns else df
+
+
+def tax_period(tax_year: int = None, as_of: str = None):
+    """A feldolgozandó sorok időszaka (első nap, utolsó nap) Timestamp-ekkel: az as_of (pl. a nyitó
+    főkönyv napja) utáni naptól a tax_year végéig; a hiányzó határ nyitott. None, ha nincs korlát.
+    """
+    if tax_year is None and as_of is None:
+        return None
+    first = pd.Timestamp(as_of) + pd.Timedelta(days=1) if as_of else None
+    last = pd.Timestamp(year=tax_year, month=12, day=31) if tax_year else None
+    return first, last
+
+
+def filter_period(df: pd.DataFrame, period) -> pd.DataFrame:
+    """A Date oszlop (naptári nap) szerint a period (lásd tax_period) időszakba eső sorok."""
+    if period is None or df.empty:
+        return df
+    dates = df["Date"]
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.dt.normalize()
+    first, last = period
+    mask = days.notna()
+    if first is not None:
+        mask &= days >= first
+    if last is not None:
+        mask &= days <= last
+    return df[mask]
+
+
+def in_tax_year(df: pd.DataFrame, column: str, tax_year: int = None) -> pd.DataFrame:
+    """A column ("YYYY-MM-DD" szöveg) szerint a tax_year évébe eső sorok; tax_year nélkül a teljes df."""
+    if tax_year is None or df.empty:
+        return df
+    return df[df[column].astype(str).str.startswith(f"{tax_year}-")].reset_index(drop=True)
+
+
+def statement_span(frames, ccy_col: str):
+    """Egy menetben (darabonként) összegyűjti a kimutatás devizáit és dátumtartományát a prefetch-hez.
+    Visszatérés: (devizák halmaza, legkorábbi dátum, legkésőbbi dátum).
+    """
+    currencies, start, end = set(), None, None
+    for frame in frames:
+        currencies.update(c for c in frame[ccy_col].dropna().unique() if isinstance(c, str))
+        lo, hi = frame["Date"].min(), frame["Date"].max()
+        if pd.notna(lo):
+            start = lo if start is None else min(start, lo)
+            end = hi if end is None else max(end, hi)
+    return currencies, start, end
+
+
+class StatementProcessor:
+    """A kimutatás feldolgozók közös váza. A kimutatást a betöltési séma (USECOLS, DTYPES) szerint, csak a
+       használt oszlopokkal olvassa be: egészben, vagy chunksize megadása esetén streaming módban, chunksize
+       soros darabokban, így a memóriahasználatot a darabméret határozza meg, nem a kimutatás mérete.
+       A darabokat (_prepare után) a period időszakára szűri, és egyenként a feldolgozási állapotba
+       gyűjti (_fold); a riport a teljes állapotból készül (_finish).
+       exchange_service: MNBExchangeService, vagy közvetlenül egy árfolyam forrás (rate_provider.RateProvider,
+       pl. helyi árfolyam fájl); ha nincs megadva, az MNB szolgáltatását használja.
+       state: egy korábbi feldolgozás állapota (lásd new_state, incremental); a CSV sorai ehhez adódnak.
+    """
+    USECOLS = []
+    DTYPES = {}
+    # Az árfolyamok előtöltéséhez (lásd _load): a deviza oszlop, és streaming módban a beolvasott oszlopok
+    CCY_COLUMN = None
+    SPAN_COLUMNS = None
+    # További read_csv beállítások (lásd read_statement)
+    READ_OPTIONS = {}
 
-class LightyearProcessor:
-    """Lightyear CSV tranzakciós adatok feldolgozása."""
-    def __init__(self, csv_file: str):
+    def __init__(self, csv_file: str, exchange_service: MNBExchangeService = None, chunksize: int = None,
+                 state: dict = None, tax_year: int = None, period=None):
         self.csv_file = csv_file
-        self.df = pd.read_csv(csv_file, parse_dates=["Date"], dayfirst=True)
-        self.df["Type"] = self.df["Type"].astype(str).str.strip()
-        self.df["CCY"] = self.df["CCY"].astype(str).str.strip()
-        self.exchange_service = MNBExchangeService()
+        self.chunksize = chunksize
+        self.state = state
+        self.tax_year = tax_year
+        self.period = period
+        self.df = None
+        # A beolvasott oszlopok (az alosztály a feldolgozás módjától függően szűkítheti)
+        self.usecols = self.USECOLS
+        self.exchange_service = exchange_service_for(exchange_service)
+
+    def _load(self) -> None:
+        """Beolvassa a kimutatást (streaming módban csak a devizáit és a dátumtartományát), majd a teljes
+        kimutatás időszakára egyetlen hívással betölti az árfolyamokat.
+        """
+        if self.chunksize:
+            with stats.stage("load"):
+                currencies, start, end = statement_span(self._read(self.SPAN_COLUMNS), self.CCY_COLUMN)
+        else:
+            with stats.stage("load"):
+                self.df = filter_period(
+                    self._prepare(read_statement(self.csv_file, self.usecols, self.DTYPES, **self.READ_OPTIONS)),
+                    self.period
+                )
+            currencies, start, end = (
+                self.df[self.CCY_COLUMN].dropna().unique(), self.df["Date"].min(), self.df["Date"].max()
+            )
+        with stats.stage("convert"):
+            self.exchange_service.prefetch(currencies, start, end)
+
+    def _read(self, usecols):
+        """Streaming mód: a CSV darabjai a megadott oszlopokkal."""
+        for chunk in read_statement(self.csv_file, usecols, self.DTYPES, self.chunksize, **self.READ_OPTIONS):
+            yield filter_period(self._prepare(chunk), self.period)
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        """A beolvasott sorok tisztítása; a Date oszlop datetime típusú lesz."""
+        raise NotImplementedError
+
+    def _chunks(self):
+        """A feldolgozandó adatok: a teljes DataFrame, vagy streaming módban a CSV darabjai."""
+        if self.df is not None:
+            yield self.df
+        else:
+            yield from self._read(self.usecols)
+
+    def new_state(self) -> dict:
+        raise NotImplementedError
 
     def process(self):
-        """Feldolgozza a CSV-t és DataFrame-eket készít:
-           - realized_df: Realizált (eladott) pozíciók
-           - open_df: Nyitott pozíciók
-           - interest_df: Kamatjövedelem
-           - dividend_df: Osztalékjövedelem
+        """Feldolgozza a kimutatást: a beolvasott sorok a self.state állapotba (inkrementális módban a
+        korábbi futások állapotába) kerülnek, a riport táblái (lásd _finish) a teljes állapotból készülnek.
+        """
+        state = self.state if self.state is not None else self.new_state()
+        for chunk in stats.timed(self._chunks(), "load"):
+            if not chunk.empty:
+                self._fold(chunk, state)
+        self.state = state
+        return self._finish(state)
+
+    def _fold(self, chunk: pd.DataFrame, state: dict) -> None:
+        raise NotImplementedError
+
+    def _finish(self, state: dict):
+        raise NotImplementedError
+
+
+class BrokerProcessor(StatementProcessor):
+    """Bróker kimutatások (kötések és jövedelmek) feldolgozása: a kötésekből a realizált és a nyitott
+       pozíciók, a jövedelem sorokból (INCOME_TYPES) a HUF-ra átváltott jövedelem táblák készülnek.
+       Az alosztályok a betöltési sémát, a _prepare metódust, valamint az oszlopok és a Type értékek
+       megfeleltetését adják meg.
+       lot_method: a realizált PnL számítása, "fifo" (alapértelmezett), "lifo" vagy "aggregate"
+       (a korábbi, (Ticker, Currency) szerinti összesítés; ehhez a Quantity oszlop nem szükséges).
+       tax_year: a riportba csak az adóév realizált eredménye és jövedelmei kerülnek, a nyitott pozíciók
+       az év végi állapotot mutatják (a korábbi kötések csak a párosításhoz kellenek).
+       opening: az adóév előtti év végi nyitott tételek (lásd ledger.PositionLedger.opening); ekkor a
+       kimutatásnak csak az azt követő sorait dolgozza fel.
+    """
+    # Az összeg oszlop (a deviza oszlop a CCY_COLUMN)
+    AMOUNT_COLUMN = None
+    # A kötések Type értékei, közülük az eladásé
+    TRADE_TYPES = ()
+    SELL_TYPE = None
+    # A jövedelem táblák: állapot kulcs ("interest", "dividend") -> Type érték
+    INCOME_TYPES = {}
+
+    def __init__(self, csv_file: str, exchange_service: MNBExchangeService = None, chunksize: int = None,
+                 lot_method: str = "fifo", state: dict = None, tax_year: int = None, opening: dict = None):
+        super().__init__(csv_file, exchange_service, chunksize, state, tax_year,
+                         tax_period(tax_year, opening["as_of"] if opening else None))
+        self.lot_method = lot_method
+        self.opening = opening
+        self.matcher = None
+        if lot_method == "aggregate":
+            # Az összesítés a mennyiséget nem használja: a Quantity oszlop hiányozhat, be sem olvassuk
+            self.usecols = [col for col in self.USECOLS if col != "Quantity"]
+        self._load()
+
+    def new_state(self) -> dict:
+        """Üres feldolgozási állapot: a kötések (Ticker, Currency) szerinti gyűjtői (aggregate, lásd
+        lot_matching.fold_positions), illetve a tételes párosításhoz az átváltott kötések, valamint a
+        jövedelem sorok.
         """
-        trades = self.df[
-            self.df["Type"].isin(["Buy", "Sell", "Distribution"]) &
-            (self.df["Ticker"].notnull()) &
-            (self.df["Ticker"] != "")
-        ]
-        interests = self.df[self.df["Type"] == "Interest"]
-        dividends = self.df[self.df["Type"] == "Dividend"]
-
-        realized_df, open_df = self._process_trades(trades)
-        interest_df = self._process_income(interests)
-        dividend_df = self._process_income(dividends)
-        return realized_df, open_df, interest_df, dividend_df
-
-    def _process_trades(self, trades: pd.DataFrame):
-        realized_list = []
-        open_positions_list = []
-
-        for (ticker, ccy), group in trades.groupby(["Ticker", "CCY"]):
-            # Szűrés: vásárlások (Buy, Distribution) és eladások (Sell)
-            buy_rows = group[group["Type"].isin(["Buy", "Distribution"])]
-            sell_rows = group[group["Type"] == "Sell"]
-
-            # Összegzés idegen pénznemben
-            total_buy_fc = buy_rows["Net Amt."].sum()
-            total_sell_fc = sell_rows["Net Amt."].sum() if not sell_rows.empty else 0
-
-            # Vásárlások HUF-ban: minden sorra külön átváltás (vásárlás napján érvényes árfolyam)
-            total_buy_huf = self._sum_in_huf(buy_rows, ccy)
-
-            # Eladások HUF-ban: minden eladási sorra külön átváltás (eladás napján érvényes árfolyam)
-            total_sell_huf = self._sum_in_huf(sell_rows, ccy)
-
-            if total_sell_fc != 0:
-                realized_pnl_fc = total_sell_fc - total_buy_fc
-                realized_pnl_huf = total_sell_huf - total_buy_huf
-                sale_date = sell_rows["Date"].max()
-
-                realized_list.append({
-                    "Ticker": ticker,
-                    "Currency": ccy,
-                    "Buy Sum (FC)": total_buy_fc,
-                    "Sell Sum (FC)": total_sell_fc,
-                    "Realized PnL (FC)": realized_pnl_fc,
-                    "Buy Sum (HUF)": total_buy_huf,
-                    "Sell Sum (HUF)": total_sell_huf,
-                    "Realized PnL (HUF)": realized_pnl_huf,
-                    "Sale Date": sale_date.strftime("%Y-%m-%d")
-                })
+        return {"positions": None, "trades": [], **{key: [] for key in self.INCOME_TYPES}}
+
+    def _fold(self, chunk: pd.DataFrame, state: dict) -> None:
+        """Egy darab sorainak átváltása és hozzáadása az állapothoz."""
+        df = chunk.copy()
+        # Minden sorhoz hozzárendeljük a napi árfolyamot és annak publikációs napját
+        with stats.stage("convert"):
+            df[["Exchange Rate", "Rate Date"]] = attach_exchange_rates(
+                df, self.exchange_service, "Date", self.CCY_COLUMN
+            )
+        # Kötések: a Tickerrel rendelkező, TRADE_TYPES típusú sorok
+        with stats.stage("filter"):
+            trades = df[df["Type"].isin(self.TRADE_TYPES) & df["Ticker"].notnull() & (df["Ticker"] != "")]
+        # Árfolyam nélküli sorok (érvénytelen deviza, vagy allow_missing mellett a hiányzó árfolyamúak, lásd
+        # attach_exchange_rates): a korábbi működésnek megfelelően a kötéseket 0-val, a jövedelmeket 1-gyel számoljuk
+        with stats.stage("convert"):
+            amount_huf = trades[self.AMOUNT_COLUMN] * trades["Exchange Rate"].fillna(0)
+        with stats.stage("aggregate"):
+            trades = plain_columns(pd.DataFrame({
+                "Ticker": trades["Ticker"],
+                "Currency": trades[self.CCY_COLUMN],
+                "Date": trades["Date"],
+                "Side": np.where(trades["Type"] == self.SELL_TYPE, "sell", "buy"),
+                "Quantity": trades["Quantity"] if "Quantity" in trades else np.nan,
+                "Amount (FC)": trades[self.AMOUNT_COLUMN],
+                "Amount (HUF)": amount_huf,
+                "Exchange Rate": trades["Exchange Rate"]
+            }))
+            if self.lot_method == "aggregate":
+                # (Ticker, Currency) szerinti gyűjtők, egyetlen csoportosítással
+                state["positions"] = fold_positions(state["positions"], trades)
             else:
-                open_positions_list.append({
-                    "Ticker": ticker,
-                    "Currency": ccy,
-                    "Buy Sum (FC)": total_buy_fc,
-                    "Buy Sum (HUF)": total_buy_huf
-                })
-
-        realized_df = pd.DataFrame(realized_list)
-        open_df = pd.DataFrame(open_positions_list)
-        return realized_df, open_df
-
-    def _sum_in_huf(self, df: pd.DataFrame, ccy: str) -> float:
-        total = 0.0
-        for idx, row in df.iterrows():
-            rate = self.exchange_service.get_exchange_rate(row["Date"], ccy)
-            if rate is None:
-                rate = 0
-            total += row["Net Amt."] * rate
-        return total
+                # A tételes párosításhoz időrendben, a teljes kötéslistán kell végigmenni
+                state["trades"].append(trades)
+            for key, income_type in self.INCOME_TYPES.items():
+                state[key].append(self._process_income(df[df["Type"] == income_type]))
 
+    def _finish(self, state: dict):
+        """A riport táblái az állapotból; a darabonkénti részeket az állapotban is összevonja.
+        Visszatérés: (realized_df, open_df, interest_df, dividend_df); a kimutatásban nem szereplő
+        jövedelem típus (INCOME_TYPES) táblája üres.
+        """
+        with stats.stage("aggregate"):
+            if self.lot_method == "aggregate":
+                realized_df, open_df = position_frames(state["positions"])
+                realized_df = in_tax_year(realized_df, "Sale Date", self.tax_year)
+            else:
+                state["trades"] = [concat_parts(state["trades"], TRADE_COLUMNS)]
+                # A nyitó főkönyv tételeiből indulva; a párosítás után a matcher az év végi nyitott tételeket tartalmazza
+                self.matcher = LotMatcher(self.lot_method)
+                if self.opening:
+                    self.matcher.add_lots(self.opening["lots"])
+                realized_df, open_df = match_lots(state["trades"][0], self.lot_method, self.matcher)
+                realized_df = in_tax_year(realized_df, "Sell Date", self.tax_year)
+            for key in self.INCOME_TYPES:
+                state[key] = [concat_parts(state[key])]
+        income = {
+            key: in_tax_year(state[key][0], "Date", self.tax_year) if key in self.INCOME_TYPES
+            else pd.DataFrame(columns=INCOME_COLUMNS)
+            for key in ("interest", "dividend")
+        }
+        return realized_df, open_df, income["interest"], income["dividend"]
+
+    def closing_lots(self) -> list:
+        """A feldolgozás (process) után nyitva maradt tételek a főkönyv számára (lásd ledger)."""
+        return self.matcher.lots() if self.matcher is not None else []
 
     def _process_income(self, income_df: pd.DataFrame):
-        income_rows = []
-        for idx, row in income_df.iterrows():
-            rate = self.exchange_service.get_exchange_rate(row["Date"], row["CCY"])
-            conv_amount = row["Net Amt."] * (rate if rate is not None else 1)
-            income_rows.append({
-                "Date": row["Date"].strftime("%Y-%m-%d"),
-                "Currency": row["CCY"],
-                "Amount (FC)": row["Net Amt."],
-                "Exchange Rate": rate if rate is not None else 1,
-                "Amount (HUF)": conv_amount
-            })
-        return pd.DataFrame(income_rows)
+        """Jövedelem (kamat, osztalék) sorok, HUF-ra átváltva."""
+        if income_df.empty:
+            return pd.DataFrame()
+        rate = income_df["Exchange Rate"].fillna(1)
+        amount = income_df[self.AMOUNT_COLUMN]
+        return plain_columns(pd.DataFrame({
+            "Date": income_df["Date"].dt.strftime("%Y-%m-%d"),
+            "Currency": income_df[self.CCY_COLUMN],
+            "Amount (FC)": amount,
+            "Exchange Rate": rate,
+            "Amount (HUF)": amount * rate,
+            "Rate Date": income_df["Rate Date"]
+        })).reset_index(drop=True)
+
+
+class LightyearProcessor(BrokerProcessor):
+    """Lightyear CSV tranzakciós adatok feldolgozása.
+       A Buy, Sell és Distribution típusú sorokból készülnek a realizált és nyitott pozíciók, az
+       Interest és Dividend típusú sorokból a kamat- és osztalékjövedelem.
+       A betöltési séma a Type, CCY és Ticker oszlopokat kategóriaként olvassa be.
+    """
+    USECOLS = ["Date", "Ticker", "Type", "Quantity", "CCY", "Net Amt."]
+    DTYPES = {"Date": str, "Ticker": "category", "Type": "category", "Quantity": "float64", "CCY": "category",
+              "Net Amt.": "float64"}
+    CCY_COLUMN = "CCY"
+    SPAN_COLUMNS = ["Date", "CCY"]
+    AMOUNT_COLUMN = "Net Amt."
+    TRADE_TYPES = ("Buy", "Sell", "Distribution")
+    SELL_TYPE = "Sell"
+    INCOME_TYPES = {"interest": "Interest", "dividend": "Dividend"}
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        for col in ("Type", "CCY"):
+            if col in df.columns:
+                df[col] = strip_categories(df[col])
+        df["Date"] = parse_dates(df["Date"], LIGHTYEAR_DATE_FORMAT, dayfirst=True)
+        return df
 
     def to_report(self) -> dict:
         """Visszaad egy dictionary-t, melyben a Lightyear adatokhoz tartozó DataFrame-ek szerepelnek a munkalap nevekkel."""
@@ -145,127 +545,34 @@ class LightyearProcessor:
         }
 
 
-class RevolutProcessor:
+class RevolutProcessor(BrokerProcessor):
     """Revolut CSV tranzakciós adatok feldolgozása.
        A CSV file oszlopai: Date, Ticker, Type, Quantity, Price per share, Total Amount, Currency, FX Rate.
        A tranzakciók közül a 'BUY - MARKET' és 'SELL - MARKET' típusú sorokból készíti el a realizált/nyitott pozíciókat,
-       míg az 'DIVIDEND' típusú sorokból az osztalékjövedelem riportot.
+       míg az 'DIVIDEND' típusú sorokból az osztalékjövedelem riportot (kamatjövedelem Revolut esetén nincs).
+       A betöltési séma a Type, Currency és Ticker oszlopokat kategóriaként olvassa be.
     """
-    def __init__(self, csv_file: str):
-        self.csv_file = csv_file
-        # A Date oszlop automatikus konvertálása datetime típusra (ISO 8601 formátum esetén)
-        self.df = pd.read_csv(csv_file, parse_dates=["Date"])
-        # Trim string mezők
-        self.df["Type"] = self.df["Type"].astype(str).str.strip()
-        self.df["Currency"] = self.df["Currency"].astype(str).str.strip()
-        self.df["Ticker"] = self.df["Ticker"].astype(str).str.strip()
-        # A "Total Amount" oszlop értékeit számmá alakítjuk (a valuta jelek eltávolításával)
-        self.df["Total Amount"] = self.df["Total Amount"].apply(self._convert_currency_str)
-        # Inicializáljuk az MNB árfolyam szolgáltatást
-        self.exchange_service = MNBExchangeService()
-
-    @staticmethod
-    def _convert_currency_str(s):
-        """Segédfüggvény: eltávolítja a valuta jeleket és egyéb nem numerikus karaktereket a sztringből,
-           majd float értékké alakítja azt.
-        """
-        if pd.isna(s):
-            return 0.0
-        # Eltávolítjuk a nem számjegy, pont vagy mínusz karaktereket
-        s_clean = re.sub(r"[^\d\.\-]", "", s)
-        try:
-            return float(s_clean)
-        except Exception as e:
-            print(f"Hiba a {s} érték átalakításakor: {e}")
-            return 0.0
+    USECOLS = ["Date", "Ticker", "Type", "Quantity", "Total Amount", "Currency"]
+    DTYPES = {"Date": str, "Ticker": "category", "Type": "category", "Quantity": "float64", "Total Amount": str,
+              "Currency": "category"}
+    CCY_COLUMN = "Currency"
+    SPAN_COLUMNS = ["Date", "Currency"]
+    AMOUNT_COLUMN = "Total Amount"
+    TRADE_TYPES = ("BUY - MARKET", "SELL - MARKET")
+    SELL_TYPE = "SELL - MARKET"
+    INCOME_TYPES = {"dividend": "DIVIDEND"}
 
-    def process(self):
-        """Feldolgozza a CSV-t és DataFrame-eket készít:
-           - realized_df: Realizált (eladott) pozíciók
-           - open_df: Nyitott pozíciók
-           - dividend_df: Osztalékjövedelem
-           Az interest_df itt üres DataFrame (mivel Revolut esetén nincs kamatjövedelem).
-        """
-        # Tranzakciók: csak azok a sorok, ahol Ticker értékű, és a Type 'BUY - MARKET' vagy 'SELL - MARKET'
-        trades = self.df[
-            (self.df["Ticker"].notnull()) & (self.df["Ticker"] != "") &
-            (self.df["Type"].isin(["BUY - MARKET", "SELL - MARKET"]))
-        ]
-        # Osztalék: a Type 'DIVIDEND'
-        dividends = self.df[self.df["Type"] == "DIVIDEND"]
-
-        realized_df, open_df = self._process_trades(trades)
-        dividend_df = self._process_income(dividends)
-        # Üres DataFrame az interest számára (ha nincs ilyen tétel Revolut esetén)
-        interest_df = pd.DataFrame(columns=["Date", "Currency", "Amount (FC)", "Exchange Rate", "Amount (HUF)"])
-        return realized_df, open_df, interest_df, dividend_df
-
-    def _process_trades(self, trades: pd.DataFrame):
-        realized_list = []
-        open_positions_list = []
-        # Csoportosítás Ticker és Currency szerint
-        for (ticker, currency), group in trades.groupby(["Ticker", "Currency"]):
-            buy_rows = group[group["Type"] == "BUY - MARKET"]
-            sell_rows = group[group["Type"] == "SELL - MARKET"]
-
-            total_buy_fc = buy_rows["Total Amount"].sum()
-            total_sell_fc = sell_rows["Total Amount"].sum() if not sell_rows.empty else 0.0
-
-            # Átváltás HUF-ra: minden sorra külön, a tranzakció napján érvényes árfolyammal
-            total_buy_huf = self._sum_in_huf(buy_rows, currency)
-            total_sell_huf = self._sum_in_huf(sell_rows, currency)
-
-            if total_sell_fc != 0:
-                realized_pnl_fc = total_sell_fc - total_buy_fc
-                realized_pnl_huf = total_sell_huf - total_buy_huf
-                sale_date = sell_rows["Date"].max()
-                realized_list.append({
-                    "Ticker": ticker,
-                    "Currency": currency,
-                    "Buy Sum (FC)": total_buy_fc,
-                    "Sell Sum (FC)": total_sell_fc,
-                    "Realized PnL (FC)": realized_pnl_fc,
-                    "Buy Sum (HUF)": total_buy_huf,
-                    "Sell Sum (HUF)": total_sell_huf,
-                    "Realized PnL (HUF)": realized_pnl_huf,
-                    "Sale Date": sale_date.strftime("%Y-%m-%d")
-                })
-            else:
-                open_positions_list.append({
-                    "Ticker": ticker,
-                    "Currency": currency,
-                    "Buy Sum (FC)": total_buy_fc,
-                    "Buy Sum (HUF)": total_buy_huf
-                })
-
-        realized_df = pd.DataFrame(realized_list)
-        open_df = pd.DataFrame(open_positions_list)
-        return realized_df, open_df
-
-    def _sum_in_huf(self, df: pd.DataFrame, currency: str) -> float:
-        """Összegzi az adott sorokban szereplő 'Total Amount' értékeket, átváltva az aktuális árfolyammal HUF-ra."""
-        total = 0.0
-        for idx, row in df.iterrows():
-            rate = self.exchange_service.get_exchange_rate(row["Date"], currency)
-            if rate is None:
-                rate = 0.0
-            total += row["Total Amount"] * rate
-        return total
-
-    def _process_income(self, income_df: pd.DataFrame):
-        """Feldolgozza az osztalék sorokat, átváltva az összegeket HUF-ra."""
-        income_rows = []
-        for idx, row in income_df.iterrows():
-            rate = self.exchange_service.get_exchange_rate(row["Date"], row["Currency"])
-            conv_amount = row["Total Amount"] * (rate if rate is not None else 1)
-            income_rows.append({
-                "Date": row["Date"].strftime("%Y-%m-%d"),
-                "Currency": row["Currency"],
-                "Amount (FC)": row["Total Amount"],
-                "Exchange Rate": rate if rate is not None else 1,
-                "Amount (HUF)": conv_amount
-            })
-        return pd.DataFrame(income_rows)
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Trim string mezők (a kategóriákon)
+        for col in ("Type", "Currency", "Ticker"):
+            if col in df.columns:
+                df[col] = strip_categories(df[col])
+        # A Date oszlop konvertálása datetime típusra (ISO 8601 formátum)
+        df["Date"] = parse_dates(df["Date"], REVOLUT_DATE_FORMAT)
+        # A "Total Amount" oszlop értékeit számmá alakítjuk (a valuta jelek eltávolításával)
+        if "Total Amount" in df.columns:
+            df["Total Amount"] = parse_amounts(df["Total Amount"])["Amount"]
+        return df
 
     def to_report(self) -> dict:
         """Visszaad egy dictionary-t, melyben a Revolut adatokhoz tartozó DataFrame-ek szerepelnek a munkalap nevekkel.
@@ -297,118 +604,136 @@ class RevolutProcessor:
         }
 
 
-class RevolutSavingsProcessor:
+class RevolutSavingsProcessor(StatementProcessor):
     """
     Revolut deviza megtakarítási számlák tranzakciós adatok feldolgozása.
     A CSV file oszlopai: Date, Description, Value, Price per share, Quantity of shares, Currency, Value_num.
     Csak azokat a tételeket veszi figyelembe, ahol a Description "Interest..." vagy "Service Fee..." szöveggel kezdődik.
     A tranzakció napján érvényes MNB árfolyam alapján kiszámolja a HUF értéket.
+    tax_year: csak az adóév sorait dolgozza fel.
+    A betöltési séma (USECOLS, DTYPES) szerint csak a használt oszlopokat olvassa be, a Description
+    oszlopot (és a Value-ból képzett Currency oszlopot) kategóriaként.
     """
-    def __init__(self, csv_file: str):
-        self.csv_file = csv_file
-        self.df = pd.read_csv(csv_file, skip_blank_lines=True)
+    USECOLS = ["Date", "Description", "Value"]
+    DTYPES = {"Date": str, "Description": "category", "Value": str}
+    # A Currency oszlopot a _prepare képzi a Value mezőből
+    CCY_COLUMN = "Currency"
+    SPAN_COLUMNS = ["Date", "Value"]
+    READ_OPTIONS = {"skip_blank_lines": True}
+
+    def __init__(self, csv_file: str, exchange_service: MNBExchangeService = None, chunksize: int = None,
+                 state: dict = None, tax_year: int = None):
+        super().__init__(csv_file, exchange_service, chunksize, state, tax_year,
+                         tax_period(tax_year, f"{tax_year - 1}-12-31" if tax_year else None))
+        self._load()
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
         # Ha szükséges: töröljük az esetleges ismétlődő fejléc sorokat
-        self.df = self.df[self.df["Date"] != "Date"]
+        df = df[df["Date"] != "Date"].copy()
         # Konvertáljuk a Date oszlopot datetime típusra; formátum például: "Dec 31, 2024, 2:21:51 AM"
-        self.df["Date"] = pd.to_datetime(self.df["Date"], errors="coerce")
-        self.df = self.df.dropna(subset=["Date"])
+        # (explicit formátummal, pl. a "May" ne legyen %B)
+        df["Date"] = parse_dates(df["Date"], SAVINGS_DATE_FORMAT)
+        df = df.dropna(subset=["Date"])
         # Tisztítjuk a Description oszlopot
-        self.df["Description"] = self.df["Description"].astype(str).str.strip()
-        # Feltételezzük, hogy a Value oszlopban szerepel a deviza jel; hozzuk létre a Currency és a numerikus érték oszlopát:
-        self.df["Currency"] = self.df["Value"].apply(self._extract_currency)
-        self.df["Value_num"] = self.df["Value"].apply(self._convert_currency_value)
-        self.exchange_service = MNBExchangeService()
-
-    def _extract_currency(self, s: str) -> str:
-        """Kivonja a devizakódot a Value mezőből a szimbólum alapján."""
-        if isinstance(s, str):
-            if "£" in s:
-                return "GBP"
-            elif "$" in s:
-                return "USD"
-            elif "€" in s or "â¬" in s:
-                return "EUR"
-        return None
+        if "Description" in df.columns:
+            df["Description"] = strip_categories(df["Description"])
+        # Feltételezzük, hogy a Value oszlopban szerepel a deviza jel; hozzuk létre a Currency és a numerikus érték oszlopát
+        # (a feldolgozott Value oszlopra nincs tovább szükség)
+        amounts = parse_amounts(df["Value"])
+        df["Currency"] = amounts["Currency"].astype("category")
+        df["Value_num"] = amounts["Amount"]
+        return df.drop(columns="Value")
 
-    def _convert_currency_value(self, s: str) -> float:
-        """Eltávolítja a nem numerikus karaktereket, és float értékké alakítja a sztringet."""
-        if pd.isna(s):
-            return 0.0
-        s_clean = re.sub(r"[^\d\.\-]", "", s)
-        try:
-            return float(s_clean)
-        except Exception as e:
-            print(f"Hiba a {s} átalakításakor: {e}")
-            return 0.0
+    def new_state(self) -> dict:
+        """Üres feldolgozási állapot: a havi (Month, Currency, Description) gyűjtők, valamint a
+        devizánkénti "Interest" és "Service Fee" részösszegek.
+        """
+        return {"monthly": [], "interest": [], "fee": []}
 
-    def process(self):
+    def _fold(self, chunk: pd.DataFrame, state: dict) -> None:
+        """Egy darab sorainak szűrése ("Interest" vagy "Service Fee" tételek), átváltása a napi MNB
+        árfolyamon, és hozzáadása a havi (egész hónap kulcsú, lásd month_keys) és devizánkénti gyűjtőkhöz.
         """
-        Szűri a CSV adatokat, hogy csak a "Interest" vagy "Service Fee" tételek maradjanak.
-        Létrehozza a YearMonth oszlopot, majd kiszámolja a napi MNB árfolyam alapján a HUF értéket.
-        Két DataFrame-et készít:
+        with stats.stage("filter"):
+            # A Description kategória: a feltételek a (kevés) kategórián értékelődnek ki
+            interest = chunk["Description"].str.startswith("Interest", na=False)
+            fee = chunk["Description"].str.startswith("Service Fee", na=False)
+            keep = interest | fee
+            rows = chunk[keep]
+
+        # Számoljuk ki az egyes sorok HUF értékét a napi árfolyammal (árfolyam nélküli sor esetén 0)
+        with stats.stage("convert"):
+            rates = attach_exchange_rates(rows, self.exchange_service, "Date", "Currency")["Exchange Rate"]
+            amounts = pd.DataFrame({
+                "Month": month_keys(rows["Date"]),
+                "Currency": rows["Currency"],
+                "Description": rows["Description"],
+                "Interest": interest[keep],
+                "Value_num": rows["Value_num"],
+                "Amount_HUF": rows["Value_num"] * rates.fillna(0),
+            })
+        with stats.stage("aggregate"):
+            sums = {"Value_num": "sum", "Amount_HUF": "sum"}
+            # Részletes havi bontás: csoportosítunk Month, Currency és Description szerint
+            state["monthly"].append(plain_columns(amounts.groupby(
+                ["Month", "Currency", "Description"], as_index=False, observed=True
+            ).agg(sums)))
+            # Devizánkénti részösszegek külön az "Interest" és a "Service Fee" tételekre, egy csoportosítással
+            totals = plain_columns(amounts.groupby(["Interest", "Currency"], as_index=False, observed=True).agg(sums))
+            state["interest"].append(totals[totals["Interest"]].drop(columns="Interest"))
+            state["fee"].append(totals[~totals["Interest"]].drop(columns="Interest"))
+
+    def _finish(self, state: dict) -> dict:
+        """A riport lapjai az állapotból; a darabonkénti részösszegeket az állapotban is összevonja.
         - "Megtakarítás": havi bontásban, devizanemenként és Description szerint összegzett eredeti (Value_num) és HUF értékek.
         - "Összesítő": devizanemenként az összesített értékek, valamint egy új oszlopban a bruttó (Service Fee nélküli) összeget.
         """
-        df_filtered = self.df[
-            self.df["Description"].str.startswith("Interest", na=False) |
-            self.df["Description"].str.startswith("Service Fee", na=False)
-        ].copy()
-
-        # Számoljuk ki az egyes sorok HUF értékét
-        def convert_row(row):
-            rate = self.exchange_service.get_exchange_rate(row["Date"], row["Currency"])
-            if rate is None:
-                rate = 0
-            return row["Value_num"] * rate
-
-        df_filtered["Amount_HUF"] = df_filtered.apply(convert_row, axis=1)
-        df_filtered["YearMonth"] = df_filtered["Date"].dt.strftime("%Y-%m")
-
-        # Részletes havi bontás: csoportosítunk YearMonth, Currency és Description szerint
-        monthly_df = df_filtered.groupby(
-            ["YearMonth", "Currency", "Description"], as_index=False
-        ).agg({
-            "Value_num": "sum",
-            "Amount_HUF": "sum"
-        })
-
-        # Összesítő: Először külön csoportosítjuk a "Interest" és "Service Fee" tételeket
-        interest_df = df_filtered[df_filtered["Description"].str.startswith("Interest", na=False)]
-        fee_df = df_filtered[df_filtered["Description"].str.startswith("Service Fee", na=False)]
+        with stats.stage("aggregate"):
+            monthly = concat_parts(state["monthly"], SAVINGS_MONTHLY_COLUMNS).groupby(
+                ["Month", "Currency", "Description"], as_index=False
+            ).agg({
+                "Value_num": "sum",
+                "Amount_HUF": "sum"
+            })
+            interest_df = concat_parts(state["interest"], SAVINGS_TOTAL_COLUMNS).groupby("Currency", as_index=False).agg({
+                "Value_num": "sum",
+                "Amount_HUF": "sum"
+            })
+            fee_df = concat_parts(state["fee"], SAVINGS_TOTAL_COLUMNS).groupby("Currency", as_index=False).agg({
+                "Value_num": "sum",
+                "Amount_HUF": "sum"
+            })
+            state["monthly"], state["interest"], state["fee"] = [monthly], [interest_df], [fee_df]
+            monthly_df = monthly.assign(Month=month_labels(monthly["Month"])).rename(columns={"Month": "YearMonth"})
 
-        interest_summary = interest_df.groupby("Currency", as_index=False).agg({
-            "Value_num": "sum",
-            "Amount_HUF": "sum"
-        }).rename(columns={
-            "Value_num": "Interest_Eredeti",
-            "Amount_HUF": "Interest_HUF"
-        })
+            # Összesítő: külön összegezzük az "Interest" és "Service Fee" tételeket
+            interest_summary = interest_df.rename(columns={
+                "Value_num": "Interest_Eredeti",
+                "Amount_HUF": "Interest_HUF"
+            })
 
-        fee_summary = fee_df.groupby("Currency", as_index=False).agg({
-            "Value_num": "sum",
-            "Amount_HUF": "sum"
-        }).rename(columns={
-            "Value_num": "Fee_Eredeti",
-            "Amount_HUF": "Fee_HUF"
-        })
+            fee_summary = fee_df.rename(columns={
+                "Value_num": "Fee_Eredeti",
+                "Amount_HUF": "Fee_HUF"
+            })
 
-        summary_df = pd.merge(interest_summary, fee_summary, on="Currency", how="outer").fillna(0)
+            summary_df = pd.merge(interest_summary, fee_summary, on="Currency", how="outer").fillna(0)
 
-        # Nettó összeg: Interest + Fee (a Fee értéke várhatóan negatív)
-        summary_df["Összeg (eredeti devizában)"] = summary_df["Interest_Eredeti"] + summary_df["Fee_Eredeti"]
-        summary_df["Összeg (HUF)"] = summary_df["Interest_HUF"] + summary_df["Fee_HUF"]
+            # Nettó összeg: Interest + Fee (a Fee értéke várhatóan negatív)
+            summary_df["Összeg (eredeti devizában)"] = summary_df["Interest_Eredeti"] + summary_df["Fee_Eredeti"]
+            summary_df["Összeg (HUF)"] = summary_df["Interest_HUF"] + summary_df["Fee_HUF"]
 
-        # Bruttó összeg: azaz amikor a Service Fee nincs levonva = csak az Interest értékek
-        summary_df["Összeg bruttó (eredeti devizában)"] = summary_df["Interest_Eredeti"]
-        summary_df["Összeg bruttó (HUF)"] = summary_df["Interest_HUF"]
+            # Bruttó összeg: azaz amikor a Service Fee nincs levonva = csak az Interest értékek
+            summary_df["Összeg bruttó (eredeti devizában)"] = summary_df["Interest_Eredeti"]
+            summary_df["Összeg bruttó (HUF)"] = summary_df["Interest_HUF"]
 
-        # Opcionálisan rendezhetjük az oszlopokat
-        summary_df = summary_df[[
-            "Currency",
-            "Interest_Eredeti", "Fee_Eredeti", "Összeg (eredeti devizában)",
-            "Interest_HUF", "Fee_HUF", "Összeg (HUF)",
-            "Összeg bruttó (eredeti devizában)", "Összeg bruttó (HUF)"
-        ]]
+            # Opcionálisan rendezhetjük az oszlopokat
+            summary_df = summary_df[[
+                "Currency",
+                "Interest_Eredeti", "Fee_Eredeti", "Összeg (eredeti devizában)",
+                "Interest_HUF", "Fee_HUF", "Összeg (HUF)",
+                "Összeg bruttó (eredeti devizában)", "Összeg bruttó (HUF)"
+            ]]
 
         return {"Megtakarítás": monthly_df, "Összesítő": summary_df}
 
@@ -418,12 +743,171 @@ class RevolutSavingsProcessor:
         return self.process()
 
 
+class RevolutExchangeProcessor(StatementProcessor):
+    """Revolut számlakivonat devizaváltásainak feldolgozása.
+    A CSV file oszlopai: Type, Product, Started Date, Completed Date, Description, Amount, Fee, Currency, State, Balance.
+    Egy váltás két EXCHANGE típusú sor (pl. "Exchanged to USD"): az eladott deviza negatív, a vett
+    deviza pozitív összeggel, azonos Started Date értékkel. A két lábat a Completed Date napján érvényes
+    MNB árfolyamon váltja HUF-ra. Az átváltási különbözet (Conversion Difference) a vett és az eladott
+    összeg (díjjal együtt) HUF értékének különbsége: azonos napi árfolyamon ez a Revolut és az MNB
+    árfolyama közötti eltérés és a díj, nem realizált árfolyamnyereség (ahhoz az eladott deviza
+    bekerülési értéke kellene, ami a számlakivonatból nem ismert).
+    A kimutatást mindig darabonként (chunksize, alapértelmezetten EXCHANGE_CHUNKSIZE soronként), egyetlen
+    menetben olvassa: darabonként párosít, átvált és havi (év*100 + hónap kulcsú) devizapár gyűjtőkbe
+    összegez; a darabhatáron kettévált váltások lábai a következő darabbal párosulnak.
+    tax_year: csak az adóév sorait dolgozza fel.
+    """
+    USECOLS = ["Type", "Started Date", "Completed Date", "Description", "Amount", "Fee", "Currency", "State"]
+    REQUIRED = ["Type", "Started Date", "Completed Date", "Description", "Amount", "Currency"]
+    DTYPES = {"Type": "category", "Started Date": str, "Completed Date": str, "Description": str,
+              "Amount": "float64", "Fee": "float64", "Currency": "category", "State": "category"}
+    PAIR_COLUMNS = ["Month", "From", "To", "Exchanges", "Sold (FC)", "Bought (FC)", "Sold (HUF)", "Bought (HUF)"]
+
+    def __init__(self, csv_file: str, exchange_service: MNBExchangeService = None, chunksize: int = None,
+                 state: dict = None, tax_year: int = None):
+        # Az árfolyamokat darabonként, a darab időszakára tölti be (lásd attach_exchange_rates)
+        super().__init__(csv_file, exchange_service, chunksize or EXCHANGE_CHUNKSIZE, state, tax_year,
+                         tax_period(tax_year, f"{tax_year - 1}-12-31" if tax_year else None))
+
+    def _chunks(self):
+        """A CSV darabjai a használt oszlopokkal; a Date oszlop a Completed Date napja."""
+        reader = pd.read_csv(self.csv_file, usecols=lambda c: c in self.USECOLS, dtype=self.DTYPES,
+                             chunksize=self.chunksize)
+        for chunk in reader:
+            missing = [col for col in self.REQUIRED if col not in chunk.columns]
+            if missing:
+                raise ValueError(f"Hiányzó oszlopok a devizaváltás kimutatásban: {', '.join(missing)}")
+            yield filter_period(self._prepare(chunk), self.period)
+
+    @staticmethod
+    def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+        for col in ("Type", "Currency", "State"):
+            if col in df.columns:
+                df[col] = strip_categories(df[col])
+        df["Started Date"] = df["Started Date"].str.strip()
+        if "Fee" not in df.columns:
+            df["Fee"] = 0.0
+        if "State" not in df.columns:
+            df["State"] = "COMPLETED"
+        df["Date"] = parse_dates(df["Completed Date"].str.strip(), EXCHANGE_DATE_FORMAT)
+        return df
+
+    def new_state(self) -> dict:
+        """Üres feldolgozási állapot: a még párosítatlan váltáslábak és a havi devizapár gyűjtők."""
+        return {"pending": pd.DataFrame(), "monthly": []}
+
+    def _fold(self, chunk: pd.DataFrame, state: dict) -> None:
+        """Egy darab váltásainak párosítása, átváltása és hozzáadása a havi gyűjtőkhöz."""
+        with stats.stage("filter"):
+            legs = plain_columns(
+                chunk[(chunk["Type"] == "EXCHANGE") & (chunk["State"] == "COMPLETED") & chunk["Date"].notna()]
+            )
+            legs = pd.concat([state["pending"], legs], ignore_index=True) if not state["pending"].empty \
+                else legs.reset_index(drop=True)
+            # Párosítási kulcs: a váltás kezdete és a vett deviza (az eladott lábon a leírásból)
+            sold_side = (legs["Amount"] < 0).to_numpy()
+            target = legs["Description"].str.extract(EXCHANGE_TARGET_RE, expand=False)
+            target = target.where(sold_side, legs["Currency"])
+            legs = legs.assign(_key=legs["Started Date"] + "|" + target)
+            sold = legs[sold_side & legs["_key"].notna().to_numpy()]
+            bought = legs[(legs["Amount"] > 0) & legs["_key"].notna()]
+            # Azonos kulcson belül a lábak sorrendben párosulnak
+            pairs = pd.merge(
+                sold.assign(_n=sold.groupby("_key").cumcount()).reset_index(),
+                bought.assign(_n=bought.groupby("_key").cumcount()).reset_index(),
+                on=["_key", "_n"], suffixes=(" from", " to")
+            )
+            matched = np.zeros(len(legs), dtype=bool)
+            matched[pairs["index from"].to_numpy()] = True
+            matched[pairs["index to"].to_numpy()] = True
+            state["pending"] = legs[~matched].drop(columns="_key").reset_index(drop=True)
+
+        if pairs.empty:
+            return
+        with stats.stage("convert"):
+            pairs = pairs.rename(columns={"Date from": "Date"})
+            rate_from = attach_exchange_rates(pairs, self.exchange_service, "Date", "Currency from")["Exchange Rate"]
+            rate_to = attach_exchange_rates(pairs, self.exchange_service, "Date", "Currency to")["Exchange Rate"]
+            sold_fc = -pairs["Amount from"] + pairs["Fee from"].fillna(0)
+            bought_fc = pairs["Amount to"] - pairs["Fee to"].fillna(0)
+            # Árfolyam nélküli láb esetén (a többi módhoz hasonlóan, lásd attach_exchange_rates) 0-val számolunk
+            converted = pd.DataFrame({
+                "Month": month_keys(pairs["Date"]),
+                "From": pairs["Currency from"],
+                "To": pairs["Currency to"],
+                "Sold (FC)": sold_fc,
+                "Bought (FC)": bought_fc,
+                "Sold (HUF)": sold_fc * rate_from.fillna(0),
+                "Bought (HUF)": bought_fc * rate_to.fillna(0),
+            })
+        with stats.stage("aggregate"):
+            state["monthly"].append(converted.groupby(["Month", "From", "To"], as_index=False).agg(
+                **{"Exchanges": ("Sold (FC)", "size")},
+                **{col: (col, "sum") for col in ("Sold (FC)", "Bought (FC)", "Sold (HUF)", "Bought (HUF)")}
+            ))
+
+    def _finish(self, state: dict):
+        """A havi devizapár tábla és az összesítő az állapotból; a gyűjtőket az állapotban is összevonja.
+        Visszatérés: (havi devizapár tábla, összesítő).
+        """
+        if not state["pending"].empty:
+            examples = [f"{r['Currency']} {r['Amount']:g} {r['Started Date']}"
+                        for _, r in state["pending"].head(WARNING_EXAMPLES).iterrows()]
+            stats.warn("Párosítatlan devizaváltás láb (kihagyva)", examples, count=len(state["pending"]))
+        with stats.stage("aggregate"):
+            monthly = concat_parts(state["monthly"], self.PAIR_COLUMNS).groupby(
+                ["Month", "From", "To"], as_index=False
+            ).sum()
+            state["monthly"] = [monthly]
+            pair = monthly["From"] + " -> " + monthly["To"]
+            monthly_df = pd.DataFrame({
+                "YearMonth": month_labels(monthly["Month"]),
+                "Pair": pair,
+                "Exchanges": monthly["Exchanges"].astype(int),
+                "Sold (FC)": monthly["Sold (FC)"],
+                "Bought (FC)": monthly["Bought (FC)"],
+                "Sold (HUF)": monthly["Sold (HUF)"],
+                "Bought (HUF)": monthly["Bought (HUF)"],
+                "Conversion Difference (HUF)": monthly["Bought (HUF)"] - monthly["Sold (HUF)"],
+            })
+            summary_df = monthly_df.drop(columns="YearMonth").groupby("Pair", as_index=False).sum()
+            # Összesen: csak a HUF oszlopok adhatók össze devizapárok között
+            summary_df.loc[len(summary_df)] = {
+                "Pair": "Összesen",
+                "Exchanges": summary_df["Exchanges"].sum(),
+                "Sold (HUF)": summary_df["Sold (HUF)"].sum(),
+                "Bought (HUF)": summary_df["Bought (HUF)"].sum(),
+                "Conversion Difference (HUF)": summary_df["Conversion Difference (HUF)"].sum(),
+            }
+            summary_df["Exchanges"] = summary_df["Exchanges"].astype(int)
+        return monthly_df, summary_df
+
+    def to_report(self) -> dict:
+        """Visszaad egy dictionary-t a devizaváltások munkalapjaival:
+             - 'Devizaváltás': havi bontásban, devizapáronként a váltások száma, az eladott és vett összegek
+               devizában és HUF-ban, valamint az átváltási különbözet (HUF)
+             - 'Összesítő': devizapáronként összesítve, az utolsó sorban a HUF összegek
+        """
+        monthly_df, summary_df = self.process()
+        return {"Devizaváltás": monthly_df, "Összesítő": summary_df}
+
+
 class ExcelReportGenerator:
     """Közös Excel jelentés generátor, amely a report_data dictionary-t várja.
        report_data: dict, ahol a kulcs a munkalap neve, az érték egy DataFrame.
+       fast=True (alapértelmezett) esetén az openpyxl write-only módjában, soronként írja a munkalapokat:
+       a számformátumokat oszloponként, az írás közben állítja be, az oszlopszélességeket pedig előre, a
+       DataFrame-ekből (vektorizáltan) számolja. Az eredmény cellaértékekben, formátumokban és
+       oszlopszélességekben azonos a pandas + utólagos cellánkénti formázás (fast=False) kimenetével.
     """
-    def __init__(self, output_file: str = "report.xlsx"):
+    EXTENSION = ".xlsx"
+    # A pandas openpyxl írója ezekkel a formátumokkal írja a dátum értékeket
+    DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+    DATE_FORMAT = "YYYY-MM-DD"
+
+    def __init__(self, output_file: str = "report.xlsx", fast: bool = True):
         self.output_file = output_file
+        self.fast = fast
 
     def apply_number_format(self, worksheet, column, start_row, format_str):
         for row in worksheet.iter_rows(min_row=start_row, min_col=column, max_col=column):
@@ -432,6 +916,7 @@ class ExcelReportGenerator:
 
     def auto_adjust_columns(self, worksheet):
         """Automatikusan beállítja az oszlop szélességét a tartalom alapján."""
+        from openpyxl.utils import get_column_letter
         for col in worksheet.columns:
             max_length = 0
             col_letter = get_column_letter(col[0].column)
@@ -444,14 +929,127 @@ class ExcelReportGenerator:
             adjusted_width = max_length + 2
             worksheet.column_dimensions[col_letter].width = adjusted_width
 
+    @staticmethod
+    def column_widths(df: pd.DataFrame) -> list:
+        """Oszlopszélességek a DataFrame-ből, az auto_adjust_columns szabályával: a fejléc és a nem üres
+        (nem NaN, nem 0, nem üres szöveg) értékek szöveges alakjának leghosszabbika + 2.
+        """
+        widths = []
+        for i in range(df.shape[1]):
+            name, col = df.columns[i], df.iloc[:, i]
+            max_length = len(str(name)) if str(name) else 0
+            if pd.api.types.is_bool_dtype(col):
+                lengths = col[col].astype(str).str.len()
+            elif pd.api.types.is_numeric_dtype(col):
+                values = col[col.notna() & (col != 0)]
+                if pd.api.types.is_float_dtype(values):
+                    # A cellába Python float kerül, így a hossz a float64 szöveges alakjából számolandó
+                    values = values.astype("float64")
+                lengths = values.astype(str).str.len()
+            elif pd.api.types.is_datetime64_any_dtype(col):
+                lengths = pd.Series([len(str(v)) for v in col.dropna().dt.to_pydatetime()], dtype="int64")
+            else:
+                values = col.dropna()
+                lengths = values[values.map(bool).astype(bool)].astype(str).str.len()
+            if len(lengths):
+                max_length = max(max_length, int(lengths.max()))
+            widths.append(max_length + 2)
+        return widths
+
+    def _cell_values(self, col: pd.Series):
+        """Egy oszlop cellaértékei és (dátumok esetén) számformátumai úgy, ahogy a pandas openpyxl
+        írója is kiírná őket: hiányzó érték -> "", numpy típusok -> Python típusok.
+        """
+        formats = None
+        if pd.api.types.is_datetime64_any_dtype(col):
+            values = np.array(col.dt.to_pydatetime(), dtype=object, copy=True)
+            formats = self.DATETIME_FORMAT
+        elif pd.api.types.is_float_dtype(col):
+            values = col.astype("float64").to_numpy().astype(object)
+            numbers = col.to_numpy(dtype="float64", na_value=np.nan)
+            values[np.isposinf(numbers)] = "inf"
+            values[np.isneginf(numbers)] = "-inf"
+        elif pd.api.types.is_bool_dtype(col) or pd.api.types.is_integer_dtype(col):
+            values = col.to_numpy().astype(object)
+        else:
+            values = col.to_numpy(dtype=object, copy=True)
+        values[pd.isna(col).to_numpy()] = ""
+        return values, formats
+
+    def _write_sheet(self, workbook, sheet_name: str, df: pd.DataFrame, formats: dict) -> None:
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+        ws = workbook.create_sheet(sheet_name)
+        column_formats = {}
+        for format_type, columns in (formats or {}).items():
+            format_str = HUF_FORMAT if format_type == "huf_format" else NUMBER_FORMAT
+            for cols in columns:
+                for col in cols:
+                    column_formats[col] = format_str
+
+        widths = self.column_widths(df)
+        # A formázott, de a DataFrame-en túli oszlopok üres, formázott cellákat kapnak (mint a cellánkénti formázásnál)
+        n_columns = len(widths)
+        if len(df):
+            n_columns = max([n_columns] + list(column_formats))
+        for i in range(n_columns):
+            width = widths[i] if i < len(widths) else 2
+            ws.column_dimensions[get_column_letter(i + 1)].width = width
+
+        if df.shape[1]:
+            ws.append([str(name) for name in df.columns])
+        columns = []
+        for i in range(n_columns):
+            if i < df.shape[1]:
+                values, date_format = self._cell_values(df.iloc[:, i])
+            else:
+                values, date_format = np.full(len(df), None, dtype=object), None
+            columns.append((values, column_formats.get(i + 1), date_format))
+
+        # Formátumonként egyetlen stílus; a cellák ezt kapják meg, így a stílus nem cellánként regisztrálódik
+        styles = {}
+
+        def styled(value, format_str):
+            if format_str not in styles:
+                template = WriteOnlyCell(ws)
+                template.number_format = format_str
+                styles[format_str] = template._style
+            cell = WriteOnlyCell(ws, value=value)
+            cell._style = styles[format_str]
+            return cell
+
+        for r in range(len(df)):
+            row = []
+            for values, number_format, date_format in columns:
+                value = values[r]
+                if number_format is not None:
+                    row.append(styled(value, number_format))
+                elif date_format is not None and isinstance(value, datetime):
+                    row.append(styled(value, date_format))
+                elif date_format is not None and isinstance(value, date):
+                    row.append(styled(value, self.DATE_FORMAT))
+                else:
+                    row.append(value)
+            ws.append(row)
+
     def generate(self, report_data: dict, sheet_format_configs=None) -> None:
+        if self.fast:
+            from openpyxl import Workbook
+            workbook = Workbook(write_only=True)
+            for sheet_name, df in report_data.items():
+                title = sheet_name[:31]
+                self._write_sheet(workbook, title, df, (sheet_format_configs or {}).get(title))
+            workbook.save(self.output_file)
+            print(f"Excel fájl sikeresen generálva: {self.output_file}")
+            return
+
         with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
             for sheet_name, df in report_data.items():
                 df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
 
             workbook = writer.book
 
-            for sheet_name, formats in sheet_format_configs.items():
+            for sheet_name, formats in (sheet_format_configs or {}).items():
                 if sheet_name in writer.sheets:
                     ws = writer.sheets[sheet_name]
                     for format_type, columns in formats.items():
@@ -466,6 +1064,169 @@ class ExcelReportGenerator:
 
         print(f"Excel fájl sikeresen generálva: {self.output_file}")
 
+
+class DirectoryReportGenerator:
+    """Gépi feldolgozásra szánt kimenet: munkalaponként egy fájl az output_dir könyvtárban.
+       A sheet_format_configs (Excel formázás) ezeknél a kimeneteknél nem értelmezett.
+       A könyvtár neve formátumonként különbözik (EXTENSION), így a formátumok nem írják felül egymást.
+    """
+    EXTENSION = None
+    FILE_EXTENSION = None
+
+    def __init__(self, output_dir: str = "report"):
+        self.output_file = output_dir
+
+    def _path(self, sheet_name: str) -> str:
+        filename = re.sub(r'[\\/:*?"<>|]', "_", sheet_name)
+        return os.path.join(self.output_file, filename + self.FILE_EXTENSION)
+
+    def write_sheet(self, path: str, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def generate(self, report_data: dict, sheet_format_configs=None) -> None:
+        os.makedirs(self.output_file, exist_ok=True)
+        for sheet_name, df in report_data.items():
+            self.write_sheet(self._path(sheet_name), df)
+        print(f"{self.FILE_EXTENSION[1:].upper()} fájlok sikeresen generálva: {self.output_file}")
+
+
+class CSVReportGenerator(DirectoryReportGenerator):
+    """Munkalaponként egy UTF-8 CSV fájl."""
+    EXTENSION = "_csv"
+    FILE_EXTENSION = ".csv"
+
+    def write_sheet(self, path, df):
+        df.to_csv(path, index=False)
+
+
+class ParquetReportGenerator(DirectoryReportGenerator):
+    """Munkalaponként egy Parquet fájl, típusos oszlopokkal: a dátum oszlopok (pl. Date, Rate Date)
+       szöveg helyett dátumként kerülnek kiírásra. pyarrow vagy fastparquet szükséges hozzá (lásd ENGINES).
+    """
+    EXTENSION = "_parquet"
+    FILE_EXTENSION = ".parquet"
+    # A pandas Parquet motorjai; egyik sem kötelező függőség
+    ENGINES = ("pyarrow", "fastparquet")
+    DATE_COLUMNS = ("Date", "Rate Date", "Buy Date", "Sell Date", "Sale Date")
+
+    def write_sheet(self, path, df):
+        df = df.copy()
+        for col in self.DATE_COLUMNS:
+            if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+        df.to_parquet(path, index=False)
+
+
+class JSONReportGenerator:
+    """Egyetlen JSON dokumentum az összes munkalappal:
+       {munkalap: {"schema": {...}, "data": [sor, ...]}} (a pandas "table" formátuma, index nélkül).
+    """
+    EXTENSION = ".json"
+
+    def __init__(self, output_file: str = "report.json"):
+        self.output_file = output_file
+
+    def generate(self, report_data: dict, sheet_format_configs=None) -> None:
+        document = {
+            sheet_name: json.loads(df.to_json(orient="table", index=False, date_format="iso", double_precision=15))
+            for sheet_name, df in report_data.items()
+        }
+        with open(self.output_file, "w", encoding="utf-8") as f:
+            json.dump(document, f, ensure_ascii=False)
+        print(f"JSON fájl sikeresen generálva: {self.output_file}")
+
+
+# Kimeneti formátumok (--format); a fájl / könyvtár neve a kiterjesztés nélküli alapnév + EXTENSION
+REPORT_GENERATORS = {
+    "xlsx": ExcelReportGenerator,
+    "csv": CSVReportGenerator,
+    "parquet": ParquetReportGenerator,
+    "json": JSONReportGenerator,
+}
+
+
+def report_generator(output_format: str, output_base: str):
+    """A kimeneti formátumhoz tartozó generátor a kiterjesztés nélküli output_base alapnévvel."""
+    generator_class = REPORT_GENERATORS[output_format]
+    return generator_class(output_base + generator_class.EXTENSION)
+
+
+def unavailable_format(output_format: str):
+    """Hibaüzenet, ha a kimeneti formátumhoz szükséges opcionális csomag (ENGINES) nincs telepítve,
+    egyébként None. A csomagot nem tölti be, így az argumentumok ellenőrzésekor is gyors.
+    """
+    engines = getattr(REPORT_GENERATORS[output_format], "ENGINES", ())
+    if engines and not any(importlib.util.find_spec(engine) for engine in engines):
+        return (f"A {output_format} formátumhoz a {' vagy a '.join(engines)} csomag szükséges "
+                f"(pip install {engines[0]}).")
+    return None
+
+
+# Módonként a generált riport alapneve (a kiterjesztést a kimeneti formátum adja)
+REPORT_FILES = {
+    "lightyear": "lightyear_report",
+    "revolut": "revolut_report",
+    "revolut_saving": "revolut_saving_report",
+    "revolut_exchange": "revolut_exchange_report",
+}
+
+
+def build_report(mode: str, csv_file: str, exchange_service: MNBExchangeService, chunksize: int = None,
+                 lot_method: str = "fifo", state_file: str = None, tax_year: int = None, ledger_file: str = None):
+    """Feldolgozza a megadott módú kimutatást.
+    state_file megadása esetén inkrementálisan: a kimutatásnak csak a legutóbbi futás óta hozzáfűzött
+    sorait dolgozza fel, a state_file-ban tárolt állapotból indulva, majd az állapotot frissíti
+    (lásd incremental.IncrementalRun).
+    tax_year: csak az adóév eredményei kerülnek a riportba. ledger_file (tax_year mellett, fifo / lifo
+    párosítással): a pozíció főkönyvből az előző év végi nyitott tételekből indul, és elmenti az adóév
+    végi nyitott tételeket (lásd ledger.PositionLedger).
+    Visszatérés: (report_data, sheet_format_configs) az ExcelReportGenerator számára.
+    """
+    if ledger_file:
+        ledger = PositionLedger(ledger_file)
+        ledger.check_method(lot_method)
+        processor = make_processor(mode, csv_file, exchange_service, chunksize, lot_method,
+                                   tax_year=tax_year, opening=ledger.opening(tax_year))
+        report_data = processor.to_report()
+        ledger.record(tax_year, lot_method, processor.closing_lots())
+        ledger.save()
+        return report_data, sheet_format_for(mode, lot_method)
+    if not state_file:
+        processor = make_processor(mode, csv_file, exchange_service, chunksize, lot_method, tax_year=tax_year)
+        return processor.to_report(), sheet_format_for(mode, lot_method)
+
+    key_method = lot_method if mode in ("lightyear", "revolut") else None
+    with IncrementalRun(csv_file, state_file, mode, key_method) as run:
+        processor = make_processor(mode, run.delta_file, exchange_service, chunksize, lot_method, run.state)
+        report_data = processor.to_report()
+        run.save(processor.state)
+    return report_data, sheet_format_for(mode, lot_method)
+
+
+def make_processor(mode: str, csv_file: str, exchange_service: MNBExchangeService, chunksize: int = None,
+                   lot_method: str = "fifo", state: dict = None, tax_year: int = None, opening: dict = None):
+    """A mód szerinti processzor (state: egy korábbi feldolgozás állapota; tax_year, opening: lásd a
+    processzorokat)."""
+    if mode == "lightyear":
+        return LightyearProcessor(csv_file, exchange_service, chunksize, lot_method, state, tax_year, opening)
+    if mode == "revolut":
+        return RevolutProcessor(csv_file, exchange_service, chunksize, lot_method, state, tax_year, opening)
+    if mode == "revolut_saving":
+        return RevolutSavingsProcessor(csv_file, exchange_service, chunksize, state, tax_year)
+    if mode == "revolut_exchange":
+        return RevolutExchangeProcessor(csv_file, exchange_service, chunksize, state, tax_year)
+    raise ValueError(f"Ismeretlen mód: {mode}")
+
+
+def sheet_format_for(mode: str, lot_method: str = "fifo") -> dict:
+    """A mód (és a realizált PnL számítási módja) szerinti Excel formátum konfiguráció."""
+    if mode == "revolut_saving":
+        return SHEET_FORMAT_CONFIGS_REVOLUT_SAVINGS
+    if mode == "revolut_exchange":
+        return SHEET_FORMAT_CONFIGS_REVOLUT_EXCHANGE
+    return SHEET_FORMAT_CONFIGS if lot_method == "aggregate" else SHEET_FORMAT_CONFIGS_LOTS
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Generál Excel jelentést a CSV fájl alapján (lightyear, revolut, revolut_saving vagy revolut_exchange)."
@@ -486,32 +1247,122 @@ def main():
         help="A CSV fájl elérési útja.",
         required=True,
     )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Csak a helyi árfolyam cache-t használja; hiányzó árfolyam esetén hibával leáll.",
+    )
+    parser.add_argument(
+        "--allow-missing-rates",
+        dest="allow_missing_rates",
+        action="store_true",
+        help="Hiányzó MNB árfolyam esetén leállás helyett figyelmeztetés, a kötések 0, a jövedelmek 1 értékkel számolva "
+             "(a korábbi működés).",
+    )
+    parser.add_argument(
+        "--rates-file",
+        dest="rates_file",
+        type=str,
+        default=None,
+        help="Előre letöltött árfolyamok (csv: date,currency,rate; json; vagy az MNB XML válasza) az MNB szolgáltatás helyett.",
+    )
+    parser.add_argument(
+        "--lot-method",
+        dest="lot_method",
+        choices=LOT_METHODS,
+        default="fifo",
+        help="Realizált PnL számítása: tételes FIFO/LIFO párosítás, vagy a korábbi tickerenkénti összesítés (aggregate).",
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=list(REPORT_GENERATORS),
+        default="xlsx",
+        help="Kimeneti formátum: Excel munkafüzet, munkalaponként CSV / Parquet fájl, vagy egyetlen JSON dokumentum.",
+    )
+    parser.add_argument(
+        "--chunksize",
+        dest="chunksize",
+        type=int,
+        default=None,
+        help="Streaming mód: a CSV-t ennyi soros darabokban dolgozza fel (nagy kimutatásokhoz).",
+    )
+    parser.add_argument(
+        "--incremental",
+        dest="state_file",
+        nargs="?",
+        const="",
+        default=None,
+        help="Inkrementális mód: csak a legutóbbi futás óta a kimutatáshoz hozzáfűzött sorokat dolgozza fel; "
+             "az állapotfájl alapértelmezése a kimutatás mellett <fájl>.state.",
+    )
+    parser.add_argument(
+        "--tax-year",
+        dest="tax_year",
+        type=int,
+        default=None,
+        help="Adóév: csak az adott év realizált eredménye és jövedelmei kerülnek a riportba, a nyitott pozíciók az év végi állapotot mutatják.",
+    )
+    parser.add_argument(
+        "--ledger",
+        dest="ledger_file",
+        type=str,
+        default=None,
+        help="Pozíció főkönyv (JSON, --tax-year mellett): az előző év végi nyitott tételekből indul, így elég az adóév "
+             "kimutatását megadni, és elmenti az adóév végi nyitott tételeket (lightyear / revolut, fifo / lifo).",
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        nargs="?",
+        const="text",
+        choices=["text", "json"],
+        default=None,
+        help="Futási statisztika a végén: szakaszonkénti idők, árfolyam cache és MNB hívások (text vagy json).",
+    )
 
     args = parser.parse_args()
     if not os.path.exists(args.filename):
         sys.exit(f"{args.filename} file not found.")
 
-    sheet_format = None
-    if args.mode.lower() == "lightyear":
-        processor = LightyearProcessor(args.filename)
-        report_data = processor.to_report()
-        output_file = "lightyear_report.xlsx"
-        sheet_format = SHEET_FORMAT_CONFIGS
-    elif args.mode.lower() == "revolut":
-        processor = RevolutProcessor(args.filename)
-        report_data = processor.to_report()
-        output_file = "revolut_report.xlsx"
-        sheet_format = SHEET_FORMAT_CONFIGS
-    elif args.mode.lower() == "revolut_saving":
-        processor = RevolutSavingsProcessor(args.filename)
-        report_data = processor.to_report()
-        output_file = "revolut_saving_report.xlsx"
-        sheet_format = SHEET_FORMAT_CONFIGS_REVOLUT_SAVINGS
-    else:
+    if args.mode.lower() not in REPORT_FILES:
         sys.exit("Invalid mode. Choose 'lightyear', 'revolut', 'revolut_exchange' or 'revolut_saving'.")
 
-    report_generator = ExcelReportGenerator(output_file)
-    report_generator.generate(report_data, sheet_format_configs=sheet_format)
+    if args.ledger_file:
+        if args.tax_year is None:
+            sys.exit("A --ledger használatához az adóévet is meg kell adni (--tax-year).")
+        if args.mode.lower() not in ("lightyear", "revolut") or args.lot_method == "aggregate":
+            sys.exit("A --ledger csak lightyear és revolut módban, fifo vagy lifo párosítással használható.")
+    if args.state_file is not None and (args.tax_year is not None or args.ledger_file):
+        sys.exit("Az --incremental nem használható együtt a --tax-year / --ledger kapcsolókkal.")
+    if unavailable_format(args.output_format):
+        sys.exit(unavailable_format(args.output_format))
+
+    try:
+        exchange_service = open_exchange_service(args.rates_file, args.offline, args.allow_missing_rates)
+    except (OSError, ValueError) as e:
+        sys.exit(f"Hiba az árfolyam fájl betöltésekor: {e}")
+    try:
+        state_file = None
+        if args.state_file is not None:
+            state_file = args.state_file or default_state_file(args.filename)
+        report_data, sheet_format = build_report(
+            args.mode.lower(), args.filename, exchange_service, args.chunksize, args.lot_method, state_file,
+            args.tax_year, args.ledger_file
+        )
+    except RateUnavailableError as e:
+        sys.exit(str(e))
+    except (OSError, ValueError) as e:
+        if not args.ledger_file:
+            raise
+        sys.exit(f"Hiba a pozíció főkönyv kezelésekor: {e}")
+
+    generator = report_generator(args.output_format, REPORT_FILES[args.mode.lower()])
+    with stats.stage("write"):
+        generator.generate(report_data, sheet_format_configs=sheet_format)
+    stats.flush_warnings()
+    if args.stats:
+        stats.report(args.stats, exchange_service)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,51 @@
+"""A benchmark futtató gyors ellenőrzése kis bemeneten (a gyermek folyamat kimenetének feldolgozása).
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import subprocess
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_BENCHMARKS = os.path.join(ROOT, "benchmarks", "run_benchmarks.py")
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pandas as pd
+
+from generate_statements import write_statement
+
+
+class RunBenchmarksTest(unittest.TestCase):
+    def test_small_run(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            # A helyi árfolyam gyorsítótár ne a felhasználóé legyen
+            env = dict(os.environ, HOME=work_dir)
+            result = subprocess.run(
+                [sys.executable, RUN_BENCHMARKS, "--rows", "200", "--latency", "0", "--kinds", "lightyear,revolut",
+                 "--work-dir", os.path.join(work_dir, "bench")],
+                cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        for kind in ("lightyear", "revolut"):
+            for cache in ("cold", "warm"):
+                for stage in ("load", "process", "write"):
+                    self.assertRegex(result.stdout, rf"(?m)^{kind}\s+200 {cache}\s+{stage}\s")
+
+    def test_sells_are_covered(self):
+        # A szintetikus kimutatásokban minden eladáshoz tartozik korábbi vétel
+        for kind, sell, columns in (("lightyear", "Sell", ["Ticker", "CCY"]),
+                                    ("revolut", "SELL - MARKET", ["Ticker", "Currency"])):
+            with tempfile.TemporaryDirectory() as work_dir:
+                df = pd.read_csv(write_statement(kind, 5000, os.path.join(work_dir, "statement.csv"), seed=3))
+            trades = df[df["Quantity"].notna()]
+            signed = trades["Quantity"].where(trades["Type"] != sell, -trades["Quantity"])
+            held = signed.groupby([trades[col] for col in columns]).cumsum()
+            self.assertGreater((trades["Type"] == sell).sum(), 0)
+            self.assertGreaterEqual(held.min(), -1e-9, kind)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""A forrás hívásainak megszakítója (rate_provider.CircuitBreaker): nyitás, félig nyitott próbahívás.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_provider import CircuitBreaker, SourceUnavailableError
+
+
+def check_in_thread(breaker: CircuitBreaker) -> bool:
+    """Igaz, ha egy másik szál hívását a megszakító átengedi."""
+    result = []
+
+    def run():
+        try:
+            breaker.check()
+            result.append(True)
+        except SourceUnavailableError:
+            result.append(False)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def opened(self) -> CircuitBreaker:
+        breaker = CircuitBreaker(failures=2, reset_timeout=0.05)
+        for _ in range(2):
+            breaker.check()
+            breaker.record(False, OSError("connection refused"))
+        with self.assertRaises(SourceUnavailableError):
+            breaker.check()
+        time.sleep(0.06)
+        return breaker
+
+    def test_single_trial_after_reset_timeout(self):
+        breaker = self.opened()
+        breaker.check()
+        # A próbahívás alatt a többi hívó továbbra is elutasítva
+        self.assertFalse(check_in_thread(breaker))
+        breaker.record(True)
+        self.assertTrue(check_in_thread(breaker))
+        breaker.check()
+
+    def test_failed_trial_reopens(self):
+        breaker = self.opened()
+        breaker.check()
+        breaker.record(False, OSError("timeout"))
+        with self.assertRaises(SourceUnavailableError):
+            breaker.check()
+        self.assertFalse(check_in_thread(breaker))
+        time.sleep(0.06)
+        self.assertTrue(check_in_thread(breaker))
+
+    def test_released_trial_goes_to_next_caller(self):
+        breaker = self.opened()
+        breaker.check()
+        breaker.release()
+        self.assertTrue(check_in_thread(breaker))
+        # A másik szál próbahívása nem zárult le
+        with self.assertRaises(SourceUnavailableError):
+            breaker.check()
+
+    def test_success_of_other_caller_does_not_close(self):
+        breaker = self.opened()
+        breaker.check()
+        # Egy a nyitás előtt indított hívás későn befejeződő sikere nem dönt a próbahívás helyett
+        thread = threading.Thread(target=breaker.record, args=(True,))
+        thread.start()
+        thread.join()
+        self.assertFalse(check_in_thread(breaker))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""A Revolut számlakivonat devizaváltásainak párosítása (tax_wizard.RevolutExchangeProcessor).
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import detect_mode
+from instrumentation import stats
+from mnb_exchange_service import MNBExchangeService
+from rate_cache import MemoryRateStore
+from rate_provider import MemoryRateProvider
+from tax_wizard import RevolutExchangeProcessor
+
+HEADER = "Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,State,Balance\n"
+
+STATEMENT = [
+    # EUR -> USD, díjjal az eladott lábon
+    "EXCHANGE,Current,2024-01-02 10:00:00,2024-01-02 10:00:05,Exchanged to USD,-100.00,1.00,EUR,COMPLETED,\n",
+    "EXCHANGE,Current,2024-01-02 10:00:00,2024-01-02 10:00:05,Exchanged to USD,108.00,0.00,USD,COMPLETED,\n",
+    # Két váltás azonos kezdőidővel: sorrendben párosulnak
+    "EXCHANGE,Current,2024-01-03 09:00:00,2024-01-03 09:00:01,Exchanged to HUF,-10.00,0.00,EUR,COMPLETED,\n",
+    "EXCHANGE,Current,2024-01-03 09:00:00,2024-01-03 09:00:01,Exchanged to HUF,-20.00,0.00,EUR,COMPLETED,\n",
+    "EXCHANGE,Current,2024-01-03 09:00:00,2024-01-03 09:00:01,Exchanged to HUF,3900.00,0.00,HUF,COMPLETED,\n",
+    "EXCHANGE,Current,2024-01-03 09:00:00,2024-01-03 09:00:01,Exchanged to HUF,7800.00,0.00,HUF,COMPLETED,\n",
+    # Nem váltás, illetve nem teljesült váltás
+    "TOPUP,Current,2024-01-04 08:00:00,2024-01-04 08:00:01,Top-up by *1234,500.00,0.00,EUR,COMPLETED,\n",
+    "EXCHANGE,Current,2024-01-04 11:00:00,2024-01-04 11:00:01,Exchanged to USD,-50.00,0.00,EUR,REVERTED,\n",
+    "EXCHANGE,Current,2024-01-04 11:00:00,2024-01-04 11:00:01,Exchanged to USD,54.00,0.00,USD,REVERTED,\n",
+    # Februári USD -> EUR váltás
+    "EXCHANGE,Current,2024-02-01 12:00:00,2024-02-01 12:00:02,Exchanged to EUR,-54.00,0.00,USD,COMPLETED,\n",
+    "EXCHANGE,Current,2024-02-01 12:00:00,2024-02-01 12:00:02,Exchanged to EUR,50.00,0.00,EUR,COMPLETED,\n",
+]
+
+# Párja nélküli eladott láb
+UNMATCHED = "EXCHANGE,Current,2024-02-02 12:00:00,2024-02-02 12:00:02,Exchanged to GBP,-30.00,0.00,EUR,COMPLETED,\n"
+
+RATES = {
+    "EUR": {"2024-01-02": 400.0, "2024-01-03": 390.0, "2024-02-01": 380.0, "2024-02-02": 381.0},
+    "USD": {"2024-01-02": 360.0, "2024-01-03": 355.0, "2024-02-01": 350.0, "2024-02-02": 351.0},
+}
+
+
+class ExchangePairingTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+
+    def write(self, lines: list) -> str:
+        path = os.path.join(self.work_dir, "account.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(HEADER)
+            f.writelines(lines)
+        return path
+
+    def report(self, lines: list, chunksize: int = None, tax_year: int = None) -> dict:
+        service = MNBExchangeService(provider=MemoryRateProvider(RATES), store=MemoryRateStore())
+        return RevolutExchangeProcessor(self.write(lines), service, chunksize, tax_year=tax_year).to_report()
+
+    def test_pairs_by_month_and_currency_pair(self):
+        monthly = self.report(STATEMENT)["Devizaváltás"]
+        rows = {(r["YearMonth"], r["Pair"]): r for r in monthly.to_dict("records")}
+        self.assertEqual(sorted(rows),
+                         [("2024-01", "EUR -> HUF"), ("2024-01", "EUR -> USD"), ("2024-02", "USD -> EUR")])
+
+        eur_usd = rows[("2024-01", "EUR -> USD")]
+        self.assertEqual(eur_usd["Exchanges"], 1)
+        # A díj az eladott összeghez adódik
+        self.assertEqual(eur_usd["Sold (FC)"], 101.0)
+        self.assertEqual(eur_usd["Sold (HUF)"], 101.0 * 400.0)
+        self.assertEqual(eur_usd["Bought (HUF)"], 108.0 * 360.0)
+        self.assertAlmostEqual(eur_usd["Conversion Difference (HUF)"], 108.0 * 360.0 - 101.0 * 400.0)
+
+        eur_huf = rows[("2024-01", "EUR -> HUF")]
+        self.assertEqual(eur_huf["Exchanges"], 2)
+        self.assertEqual(eur_huf["Sold (HUF)"], 30.0 * 390.0)
+        self.assertEqual(eur_huf["Bought (HUF)"], 11700.0)
+        self.assertNotIn("Párosítatlan devizaváltás láb (kihagyva)", stats.warnings)
+
+    def test_summary_total(self):
+        summary = self.report(STATEMENT)["Összesítő"]
+        self.assertEqual(list(summary["Pair"]), ["EUR -> HUF", "EUR -> USD", "USD -> EUR", "Összesen"])
+        total = summary.iloc[-1]
+        self.assertEqual(total["Exchanges"], 4)
+        self.assertAlmostEqual(total["Conversion Difference (HUF)"],
+                               summary["Conversion Difference (HUF)"].iloc[:-1].sum())
+        self.assertAlmostEqual(total["Conversion Difference (HUF)"], total["Bought (HUF)"] - total["Sold (HUF)"])
+
+    def test_legs_split_across_chunks(self):
+        # Kis darabokban a váltások lábai darabhatárra esnek
+        expected = self.report(STATEMENT)
+        for chunksize in (1, 2, 3):
+            actual = self.report(STATEMENT, chunksize)
+            for sheet_name in expected:
+                self.assertTrue(expected[sheet_name].equals(actual[sheet_name]), (chunksize, sheet_name))
+
+    def test_unmatched_leg_is_warned(self):
+        summary = self.report(STATEMENT + [UNMATCHED])["Összesítő"]
+        self.assertEqual(summary.iloc[-1]["Exchanges"], 4)
+        self.assertEqual(stats.warnings["Párosítatlan devizaváltás láb (kihagyva)"],
+                         [1, ["EUR -30 2024-02-02 12:00:00"]])
+
+    def test_tax_year(self):
+        summary = self.report(STATEMENT, tax_year=2023)["Összesítő"]
+        self.assertEqual(list(summary["Pair"]), ["Összesen"])
+        self.assertEqual(summary.iloc[-1]["Exchanges"], 0)
+
+    def test_batch_detects_account_statement(self):
+        self.assertEqual(detect_mode(self.write(STATEMENT)), "revolut_exchange")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""A hiányzó árfolyamok kezelése (attach_exchange_rates) és a forrás hívásainak számlálása.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from instrumentation import stats
+from mnb_exchange_service import MNBExchangeService, RateUnavailableError
+from rate_cache import MemoryRateStore
+from rate_provider import MemoryRateProvider, MNBSoapProvider
+from tax_wizard import attach_exchange_rates
+
+
+def service(allow_missing: bool = False):
+    """Csak EUR árfolyamokat ismerő, memóriában cache-elő szolgáltatás."""
+    provider = MemoryRateProvider({"EUR": {"2024-01-02": 390.0, "2024-01-03": 391.0}})
+    return MNBExchangeService(provider=provider, store=MemoryRateStore(), allow_missing=allow_missing)
+
+
+ROWS = pd.DataFrame({
+    "Date": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-03", "2024-01-03"]),
+    "CCY": ["EUR", "EUR", "USD", None],
+})
+
+
+class AttachExchangeRatesTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+
+    def test_missing_rate_raises(self):
+        with self.assertRaises(RateUnavailableError) as raised:
+            attach_exchange_rates(ROWS, service(), "Date", "CCY")
+        self.assertIn("USD 2024-01-03", str(raised.exception))
+
+    def test_missing_rate_allowed(self):
+        result = attach_exchange_rates(ROWS, service(allow_missing=True), "Date", "CCY")
+        self.assertEqual(list(result["Exchange Rate"][:2]), [390.0, 391.0])
+        self.assertTrue(result["Exchange Rate"][2:].isna().all())
+        self.assertEqual(stats.warnings["Hiányzó MNB árfolyam"][0], 1)
+
+    def test_rows_without_currency_code_do_not_raise(self):
+        result = attach_exchange_rates(ROWS[ROWS["CCY"] != "USD"], service(), "Date", "CCY")
+        self.assertEqual(list(result["Exchange Rate"][:2]), [390.0, 391.0])
+        self.assertTrue(pd.isna(result["Exchange Rate"].iloc[2]))
+
+
+class FlakyService:
+    """A zeep kliens szolgáltatása helyett: az első failures hívás hálózati hibával tér vissza."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+
+    def GetExchangeRates(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection reset")
+        return ('<MNBExchangeRates><Day date="2024-01-02"><Rate unit="1" curr="EUR">390,00</Rate></Day>'
+                '</MNBExchangeRates>')
+
+
+class SoapCallCountTest(unittest.TestCase):
+    def test_retries_are_counted_as_calls(self):
+        provider = MNBSoapProvider(wsdl_cache_file=None, backoff=0)
+        provider._client = type("Client", (), {"service": FlakyService(2)})()
+        exchange_service = MNBExchangeService(provider=provider, store=MemoryRateStore())
+        exchange_service.prefetch(["EUR"], "2024-01-02", "2024-01-02")
+        counters = exchange_service.stats()
+        self.assertEqual(counters["soap_calls"], 3)
+        self.assertEqual(counters["soap_retries"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""Inkrementális feldolgozás (incremental.IncrementalRun): a hozzáfűzött sorok feldolgozása a mentett
+állapotból ugyanazt a riportot adja, mint a teljes kimutatásé; megváltozott kimutatás vagy beállítás
+esetén az állapot érvénytelen.
+
+    python -m unittest discover -s tests
+"""
+import io
+import os
+import sys
+import pickle
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pandas as pd
+
+from contextlib import redirect_stdout
+from generate_statements import GENERATORS
+from incremental import STATE_VERSION, IncrementalRun
+from instrumentation import stats
+from mnb_exchange_service import MNBExchangeService
+from rate_cache import MemoryRateStore
+from rate_provider import MemoryRateProvider
+from tax_wizard import build_report
+
+# A szintetikus kimutatások DAYS napot fednek le (2021-01-04-től, a megtakarítás 2024-12-31-ig
+# visszafelé); ezekre minden napra van árfolyam
+DAYS = 40
+RATES = {
+    currency: {
+        day.date(): rate
+        for start in ("2020-12-20", "2024-11-01") for day in pd.date_range(start, periods=DAYS + 40)
+    }
+    for currency, rate in (("USD", 300.0), ("EUR", 360.0), ("GBP", 420.0))
+}
+
+# (mód, lot_method)
+CASES = [
+    ("lightyear", "fifo"),
+    ("lightyear", "aggregate"),
+    ("revolut", "lifo"),
+    ("revolut_saving", "fifo"),
+    ("revolut_exchange", "fifo"),
+]
+
+
+def service() -> MNBExchangeService:
+    return MNBExchangeService(provider=MemoryRateProvider(RATES), store=MemoryRateStore())
+
+
+class IncrementalTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+
+    def statement(self, mode: str, rows: int = 400) -> list:
+        """A szintetikus kimutatás sorai (fejléccel)."""
+        text = GENERATORS[mode](rows, seed=5, days=DAYS).to_csv(index=False, float_format="%.8g")
+        return text.splitlines(keepends=True)
+
+    def write(self, name: str, lines: list) -> str:
+        path = os.path.join(self.work_dir, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.writelines(lines)
+        return path
+
+    def report(self, mode: str, csv_file: str, lot_method: str, state_file: str = None):
+        """Visszatérés: (report_data, a futás kimenete)."""
+        output = io.StringIO()
+        with redirect_stdout(output):
+            report_data, _ = build_report(mode, csv_file, service(), None, lot_method, state_file)
+        return report_data, output.getvalue()
+
+    def assertSameReport(self, expected: dict, actual: dict):
+        self.assertEqual(list(expected), list(actual))
+        for sheet_name in expected:
+            pd.testing.assert_frame_equal(
+                expected[sheet_name].reset_index(drop=True), actual[sheet_name].reset_index(drop=True),
+                check_dtype=False, obj=sheet_name
+            )
+
+    def test_appended_rows_match_full_run(self):
+        for mode, lot_method in CASES:
+            with self.subTest(mode=mode, lot_method=lot_method):
+                lines = self.statement(mode)
+                done = 150
+                csv_file = self.write(f"{mode}_{lot_method}.csv", lines[:done])
+                state_file = csv_file + ".state"
+                self.report(mode, csv_file, lot_method, state_file)
+                # Két hozzáfűzés; a devizaváltás lábai a határon is kettéválhatnak
+                for end in (301, len(lines)):
+                    with open(csv_file, "a", encoding="utf-8", newline="") as f:
+                        f.writelines(lines[done:end])
+                    done = end
+                    incremental, output = self.report(mode, csv_file, lot_method, state_file)
+                    self.assertIn("Inkrementális feldolgozás", output)
+                full, _ = self.report(mode, self.write(f"{mode}_{lot_method}_full.csv", lines), lot_method)
+                self.assertFalse(full["Összesítő"].empty)
+                self.assertSameReport(full, incremental)
+
+    def run_key(self, csv_file: str, mode: str = "lightyear", lot_method: str = "fifo"):
+        """Egy IncrementalRun megnyitása; visszatérés: (volt-e felhasználható állapot, kimenet)."""
+        output = io.StringIO()
+        with redirect_stdout(output), IncrementalRun(csv_file, None, mode, lot_method) as run:
+            resumed = run.state is not None
+            if not resumed:
+                self.assertEqual(run.delta_file, csv_file)
+            run.save({"marker": True})
+        return resumed, output.getvalue()
+
+    def test_state_is_reused_for_appended_rows(self):
+        lines = self.statement("lightyear", 50)
+        csv_file = self.write("ly.csv", lines[:20])
+        self.assertEqual(self.run_key(csv_file)[0], False)
+        self.assertEqual(self.run_key(csv_file)[0], True)
+        self.write("ly.csv", lines)
+        resumed, output = self.run_key(csv_file)
+        self.assertTrue(resumed)
+        self.assertIn("Inkrementális feldolgozás", output)
+
+    def test_changed_statement_invalidates_state(self):
+        lines = self.statement("lightyear", 50)
+        csv_file = self.write("ly.csv", lines[:20])
+        self.run_key(csv_file)
+        # Egy korábbi sor módosult (azonos hosszal): az ujjlenyomat eltér
+        changed = lines[5].replace("Buy", "Bux") if "Buy" in lines[5] else lines[5].replace("Sell", "Selx")
+        self.assertNotEqual(changed, lines[5])
+        self.write("ly.csv", lines[:5] + [changed] + lines[6:])
+        resumed, output = self.run_key(csv_file)
+        self.assertFalse(resumed)
+        self.assertIn("nem csak új sorokkal bővült", output)
+        # Rövidebb kimutatás
+        self.write("ly.csv", lines[:10])
+        self.assertFalse(self.run_key(csv_file)[0])
+
+    def test_settings_and_version_invalidate_state(self):
+        csv_file = self.write("ly.csv", self.statement("lightyear", 20))
+        self.run_key(csv_file)
+        resumed, output = self.run_key(csv_file, lot_method="lifo")
+        self.assertFalse(resumed)
+        self.assertIn("más beállításokkal", output)
+        self.assertFalse(self.run_key(csv_file, mode="revolut", lot_method="lifo")[0])
+
+        with open(csv_file + ".state", "rb") as f:
+            saved = pickle.load(f)
+        saved["version"] = STATE_VERSION - 1
+        with open(csv_file + ".state", "wb") as f:
+            pickle.dump(saved, f)
+        resumed, output = self.run_key(csv_file, mode="revolut", lot_method="lifo")
+        self.assertFalse(resumed)
+        self.assertIn("más verziójú", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""A pozíció főkönyv (ledger.PositionLedger): az év végi nyitott tételek átvitele a következő adóévre.
+
+    python -m unittest discover -s tests
+"""
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import pandas as pd
+
+from contextlib import redirect_stdout
+from generate_statements import GENERATORS
+from instrumentation import stats
+from ledger import PositionLedger
+from mnb_exchange_service import MNBExchangeService
+from rate_cache import MemoryRateStore
+from rate_provider import MemoryRateProvider
+from tax_wizard import build_report
+
+# A szintetikus kimutatás 2021-01-04-től kb. 2024 elejéig tart; minden napra (eltérő) árfolyam
+RATES = {
+    currency: {day.date(): base + i % 37 for i, day in enumerate(pd.date_range("2020-12-20", "2024-03-01"))}
+    for currency, base in (("USD", 300.0), ("EUR", 360.0))
+}
+
+# Egy nyitott tétel (lásd lot_matching.LotMatcher.lots)
+LOTS = [{"ticker": "AAA", "currency": "USD", "date": "2022-03-01", "quantity": 2.0,
+         "unit_fc": 10.0, "unit_huf": 3500.0, "rate": 350.0}]
+
+
+def service() -> MNBExchangeService:
+    return MNBExchangeService(provider=MemoryRateProvider(RATES), store=MemoryRateStore())
+
+
+class PositionLedgerTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+        self.path = os.path.join(self.work_dir, "ledger.json")
+
+    def test_opening_is_latest_earlier_year(self):
+        ledger = PositionLedger(self.path)
+        self.assertIsNone(ledger.opening(2023))
+        ledger.record(2021, "fifo", [])
+        ledger.record(2022, "fifo", LOTS)
+        self.assertEqual(ledger.opening(2023), {"as_of": "2022-12-31", "lots": LOTS})
+        # Kihagyott év esetén a legutóbbi korábbi év végi állapot
+        self.assertEqual(ledger.opening(2025)["as_of"], "2022-12-31")
+        self.assertEqual(ledger.opening(2022)["as_of"], "2021-12-31")
+        self.assertIsNone(ledger.opening(2021))
+
+    def test_save_and_reload(self):
+        ledger = PositionLedger(self.path)
+        ledger.record(2022, "lifo", LOTS)
+        ledger.save()
+        reloaded = PositionLedger(self.path)
+        self.assertEqual(reloaded.method, "lifo")
+        self.assertEqual(reloaded.years, {2022: {"as_of": "2022-12-31", "lots": LOTS}})
+
+    def test_method_and_version_are_checked(self):
+        ledger = PositionLedger(self.path)
+        ledger.record(2022, "fifo", LOTS)
+        ledger.save()
+        with self.assertRaises(ValueError):
+            PositionLedger(self.path).check_method("lifo")
+        with self.assertRaises(ValueError):
+            PositionLedger(self.path).record(2023, "lifo", [])
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": 99, "years": {}}, f)
+        with self.assertRaises(ValueError):
+            PositionLedger(self.path)
+
+    def test_rerecording_earlier_year_warns(self):
+        ledger = PositionLedger(self.path)
+        ledger.record(2023, "fifo", [])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            ledger.record(2022, "fifo", LOTS)
+        self.assertIn("2023", output.getvalue())
+
+
+class CarryForwardTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+        self.csv_file = os.path.join(self.work_dir, "lightyear.csv")
+        GENERATORS["lightyear"](600, seed=7).to_csv(self.csv_file, index=False, float_format="%.8g")
+
+    def report(self, csv_file: str, tax_year: int, lot_method: str = "fifo", ledger_file: str = None) -> dict:
+        with redirect_stdout(io.StringIO()):
+            report_data, _ = build_report("lightyear", csv_file, service(), None, lot_method,
+                                          tax_year=tax_year, ledger_file=ledger_file)
+        return report_data
+
+    def test_year_by_year_matches_full_history(self):
+        for lot_method in ("fifo", "lifo"):
+            with self.subTest(lot_method=lot_method):
+                ledger_file = os.path.join(self.work_dir, f"ledger_{lot_method}.json")
+                for tax_year in (2021, 2022, 2023):
+                    carried = self.report(self.csv_file, tax_year, lot_method, ledger_file)
+                    full = self.report(self.csv_file, tax_year, lot_method)
+                    self.assertFalse(full["Realizált PnL"].empty)
+                    for sheet_name in ("Realizált PnL", "Nyitott Pozíciók", "Összesítő"):
+                        pd.testing.assert_frame_equal(
+                            full[sheet_name].reset_index(drop=True), carried[sheet_name].reset_index(drop=True),
+                            check_dtype=False, obj=f"{tax_year} {sheet_name}"
+                        )
+                self.assertEqual(sorted(PositionLedger(ledger_file).years), [2021, 2022, 2023])
+
+    def test_year_statement_is_enough(self):
+        # A főkönyvvel elég az adóév sorait tartalmazó kimutatás
+        ledger_file = os.path.join(self.work_dir, "ledger.json")
+        for tax_year in (2021, 2022):
+            self.report(self.csv_file, tax_year, ledger_file=ledger_file)
+        statement = pd.read_csv(self.csv_file)
+        year_file = os.path.join(self.work_dir, "lightyear_2023.csv")
+        statement[statement["Date"].str[6:10] == "2023"].to_csv(year_file, index=False, float_format="%.8g")
+        carried = self.report(year_file, 2023, ledger_file=ledger_file)
+        full = self.report(self.csv_file, 2023)
+        pd.testing.assert_frame_equal(full["Realizált PnL"], carried["Realizált PnL"], check_dtype=False)
+        self.assertNotIn("Vásárlás nélküli eladás (nulla bekerülési értékkel számolva)", stats.warnings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""A tételes (FIFO/LIFO) párosítás ellenőrzése.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import math
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from instrumentation import stats
+from lot_matching import TRADE_COLUMNS, LotMatcher, match_lots
+
+
+def trades(*rows) -> pd.DataFrame:
+    """Kötések (nap, oldal, mennyiség, devizaösszeg, árfolyam) egyetlen AAA/USD tickerre."""
+    return pd.DataFrame([
+        ("AAA", "USD", pd.Timestamp(date), side, quantity, amount, amount * rate, rate)
+        for date, side, quantity, amount, rate in rows
+    ], columns=TRADE_COLUMNS)
+
+
+class LotMatchingTest(unittest.TestCase):
+    def setUp(self):
+        # A figyelmeztetéseket a tesztek ellenőrzik, ne kerüljenek kiírásra
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+
+    def test_fifo_is_default(self):
+        self.assertEqual(LotMatcher().method, "fifo")
+        realized, _ = match_lots(trades(
+            ("2023-01-02", "buy", 10, 100.0, 300.0),
+            ("2023-02-01", "buy", 10, 200.0, 400.0),
+            ("2023-03-01", "sell", 10, 300.0, 350.0),
+        ))
+        self.assertEqual(list(realized["Buy Date"]), ["2023-01-02"])
+        self.assertAlmostEqual(realized["Buy Sum (HUF)"].iloc[0], 30000.0)
+        self.assertAlmostEqual(realized["Realized PnL (HUF)"].iloc[0], 300.0 * 350.0 - 30000.0)
+
+    def test_lifo_consumes_latest_lot(self):
+        realized, open_df = match_lots(trades(
+            ("2023-01-02", "buy", 10, 100.0, 300.0),
+            ("2023-02-01", "buy", 10, 200.0, 400.0),
+            ("2023-03-01", "sell", 10, 300.0, 350.0),
+        ), "lifo")
+        self.assertEqual(list(realized["Buy Date"]), ["2023-02-01"])
+        self.assertAlmostEqual(realized["Buy Sum (HUF)"].iloc[0], 80000.0)
+        self.assertAlmostEqual(open_df["Buy Sum (HUF)"].iloc[0], 30000.0)
+
+    def test_partial_sell_spans_lots(self):
+        realized, open_df = match_lots(trades(
+            ("2023-01-02", "buy", 4, 40.0, 300.0),
+            ("2023-02-01", "buy", 6, 120.0, 400.0),
+            ("2023-03-01", "sell", 7, 210.0, 350.0),
+        ))
+        self.assertEqual(list(realized["Quantity"]), [4, 3])
+        self.assertEqual(list(realized["Buy Sum (FC)"]), [40.0, 60.0])
+        self.assertEqual(list(realized["Sell Sum (FC)"]), [120.0, 90.0])
+        self.assertEqual(open_df["Quantity"].iloc[0], 3)
+        self.assertAlmostEqual(open_df["Buy Sum (FC)"].iloc[0], 60.0)
+
+    def test_repeated_buy_sell_cycles(self):
+        realized, open_df = match_lots(trades(
+            ("2023-01-02", "buy", 5, 50.0, 300.0),
+            ("2023-02-01", "sell", 5, 60.0, 310.0),
+            ("2023-03-01", "buy", 5, 70.0, 320.0),
+            ("2023-04-01", "sell", 2, 30.0, 330.0),
+            ("2023-05-01", "sell", 3, 48.0, 340.0),
+        ))
+        self.assertEqual(list(realized["Buy Date"]), ["2023-01-02", "2023-03-01", "2023-03-01"])
+        self.assertEqual(list(realized["Realized PnL (FC)"]), [10.0, 2.0, 6.0])
+        self.assertTrue(open_df.empty)
+        self.assertNotIn("Vásárlás nélküli eladás (nulla bekerülési értékkel számolva)", stats.warnings)
+
+    def test_same_day_buy_precedes_sell(self):
+        realized, _ = match_lots(trades(
+            ("2023-01-02", "sell", 5, 60.0, 300.0),
+            ("2023-01-02", "buy", 5, 50.0, 300.0),
+        ))
+        self.assertEqual(list(realized["Buy Date"]), ["2023-01-02"])
+
+    def test_unmatched_sell_is_warned(self):
+        realized, _ = match_lots(trades(
+            ("2023-01-02", "buy", 2, 20.0, 300.0),
+            ("2023-02-01", "sell", 5, 60.0, 310.0),
+        ))
+        self.assertEqual(list(realized["Quantity"]), [2, 3])
+        self.assertEqual(realized["Buy Sum (FC)"].iloc[1], 0.0)
+        self.assertEqual(stats.warnings["Vásárlás nélküli eladás (nulla bekerülési értékkel számolva)"],
+                         [1, ["AAA/USD: 3"]])
+
+    def test_rows_without_quantity_are_warned(self):
+        realized, open_df = match_lots(trades(
+            ("2023-01-02", "buy", float("nan"), 20.0, 300.0),
+            ("2023-01-03", "buy", 2, 20.0, 300.0),
+            ("2023-02-01", "sell", float("nan"), 60.0, 310.0),
+        ))
+        # A mennyiség nélküli eladás bevétele nem vész el
+        self.assertEqual(len(realized), 1)
+        self.assertTrue(math.isnan(realized["Quantity"].iloc[0]))
+        self.assertAlmostEqual(realized["Realized PnL (HUF)"].iloc[0], 60.0 * 310.0)
+        self.assertEqual(open_df["Quantity"].iloc[0], 2)
+        self.assertEqual(stats.warnings["Mennyiség nélküli vétel (a bekerülési érték nem rendelhető tételhez)"][0], 1)
+        self.assertEqual(stats.warnings["Mennyiség nélküli eladás (nulla bekerülési értékkel számolva)"][0], 1)
+
+    def test_lots_carry_forward(self):
+        previous = LotMatcher()
+        match_lots(trades(
+            ("2022-06-01", "buy", 4, 40.0, 380.0),
+            ("2022-07-01", "sell", 1, 12.0, 390.0),
+        ), matcher=previous)
+        matcher = LotMatcher()
+        matcher.add_lots(previous.lots())
+        realized, open_df = match_lots(trades(("2023-03-01", "sell", 3, 45.0, 350.0)), matcher=matcher)
+        self.assertEqual(list(realized["Buy Date"]), ["2022-06-01"])
+        self.assertAlmostEqual(realized["Buy Sum (HUF)"].iloc[0], 3 * 10.0 * 380.0)
+        self.assertTrue(open_df.empty)
+        self.assertEqual(matcher.lots(), [])
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            LotMatcher("average")
+
+
+if __name__ == "__main__":
+    unittest.main()
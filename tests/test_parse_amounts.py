@@ -0,0 +1,73 @@
+"""Az összeg mezők vektorizált feldolgozása (parse_amounts, split_amount_chars).
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stats
+from tax_wizard import AMOUNT_MAX_WIDTH, parse_amounts, split_amount_chars
+
+INVALID = "Nem értelmezhető összeg (0-val számolva)"
+
+
+class ParseAmountsTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+
+    def assertParsed(self, values, currencies, amounts):
+        result = parse_amounts(pd.Series(values, dtype=object))
+        self.assertEqual([None if pd.isna(c) else c for c in result["Currency"]], currencies)
+        self.assertEqual(list(result["Amount"]), amounts)
+
+    def test_thousands_separators(self):
+        self.assertParsed(["USD 1,234.56", "USD -1,000,000.01", "EUR 12"],
+                          ["USD", "USD", "EUR"], [1234.56, -1000000.01, 12.0])
+
+    def test_currency_symbols(self):
+        # A hibás kódolású euró jel (UTF-8 bájtok latin-1-ként olvasva) is felismerhető
+        self.assertParsed(["£1.50", "-$2", "€3,000", "â‚¬4.25", "-£0.05"],
+                          ["GBP", "USD", "EUR", "EUR", "GBP"], [1.5, -2.0, 3000.0, 4.25, -0.05])
+
+    def test_missing_values(self):
+        self.assertParsed([None, np.nan, "USD 1"], [None, None, "USD"], [0.0, 0.0, 1.0])
+        self.assertEqual(stats.warnings, {})
+
+    def test_invalid_values_are_warned(self):
+        self.assertParsed(["abc", "", "1.2.3", "USD 5", "abc"],
+                          [None, None, None, "USD", None], [0.0, 0.0, 0.0, 5.0, 0.0])
+        self.assertEqual(stats.warnings[INVALID], [4, ["abc", "", "1.2.3"]])
+
+    def test_empty_input(self):
+        result = parse_amounts(pd.Series([], dtype=object))
+        self.assertEqual(list(result.columns), ["Currency", "Amount"])
+        self.assertTrue(result.empty)
+
+    def test_keeps_index_and_repeated_values(self):
+        values = pd.Series(["USD 1.5", "GBP 2", "USD 1.5"], index=[7, 3, 5])
+        result = parse_amounts(values)
+        self.assertEqual(list(result.index), [7, 3, 5])
+        self.assertEqual(list(result["Amount"]), [1.5, 2.0, 1.5])
+
+    def test_long_values_use_string_fallback(self):
+        # A fix szélességű mátrix helyett soronkénti karaktercsere
+        long_value = "USD " + "1" * AMOUNT_MAX_WIDTH + ".5"
+        self.assertParsed([long_value, "£2"], ["USD", "GBP"], [float("1" * AMOUNT_MAX_WIDTH + ".5"), 2.0])
+
+
+class SplitAmountCharsTest(unittest.TestCase):
+    def test_split_keeps_character_order(self):
+        numbers, symbols = split_amount_chars(np.array(["USD 1,234.5", "-£3", ""]))
+        self.assertEqual(list(numbers), ["1234.5", "-3", ""])
+        self.assertEqual(list(symbols), ["USD ,", "£", ""])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Az árfolyam archívum (rate_archive) lefedettsége és az MNBExchangeService visszaesése a forrásra.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+from mnb_exchange_service import MNBExchangeService
+from rate_archive import RateArchive, write_archive
+from rate_cache import MemoryRateStore
+from rate_calendar import to_epoch_day
+from rate_provider import MemoryRateProvider
+
+# Az EUR a teljes időszakban, a USD csak január közepéig szerepel az archívumban
+ARCHIVED = {
+    "EUR": {"2024-01-02": 390.0, "2024-01-31": 395.0},
+    "USD": {"2024-01-02": 355.0, "2024-01-15": 356.0},
+}
+
+
+def day(text: str) -> int:
+    return to_epoch_day(date.fromisoformat(text))
+
+
+class RateArchiveTest(unittest.TestCase):
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.path = os.path.join(work_dir.name, "mnb_rates.bin")
+        write_archive(self.path, ARCHIVED)
+
+    def test_covers_per_currency(self):
+        archive = RateArchive(self.path)
+        self.assertTrue(archive.covers("EUR", day("2024-01-10"), day("2024-01-31")))
+        self.assertTrue(archive.covers("USD", day("2024-01-02"), day("2024-01-15")))
+        # Az archívum időszakán belül, de a USD utolsó publikációja után
+        self.assertFalse(archive.covers("USD", day("2024-01-10"), day("2024-01-20")))
+        self.assertFalse(archive.covers("USD", day("2024-01-01"), day("2024-01-10")))
+        self.assertFalse(archive.covers("GBP", day("2024-01-10"), day("2024-01-10")))
+
+    def test_service_falls_back_to_provider(self):
+        provider = MemoryRateProvider({"USD": {"2024-01-19": 360.0}})
+        service = MNBExchangeService(provider=provider, store=MemoryRateStore(), archive=self.path)
+        self.assertEqual(service.get_exchange_rate("2024-01-31", "EUR"), 395.0)
+        self.assertEqual(provider.calls, [])
+        self.assertEqual(service.get_exchange_rate("2024-01-20", "USD"), 360.0)
+        self.assertTrue(provider.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
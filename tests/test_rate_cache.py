@@ -0,0 +1,128 @@
+"""Az árfolyam cache tárolók (rate_cache): SQLite tároló, a régi JSON cache átemelése, negatív cache.
+
+    python -m unittest discover -s tests
+"""
+import io
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contextlib import redirect_stdout
+from instrumentation import stats
+from mnb_exchange_service import MNBExchangeService
+from rate_cache import JSONRateStore, MemoryRateStore, SQLiteRateStore, read_legacy_json
+from rate_provider import MemoryRateProvider
+
+# A régi JSON cache mindhárom bejegyzés alakja: csak árfolyam, [árfolyam, publikációs nap], [null, null]
+LEGACY = {
+    "2024-01-02|EUR": 390.5,
+    "2024-01-06|EUR": [391.0, "2024-01-05"],
+    "2024-01-02|usd": [None, None],
+}
+
+
+class RateStoreTest(unittest.TestCase):
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+        self.path = os.path.join(self.work_dir, "rates.sqlite3")
+        self.legacy = os.path.join(self.work_dir, "exchange_rate_cache.json")
+
+    def open_store(self, legacy_json: str = None) -> SQLiteRateStore:
+        with redirect_stdout(io.StringIO()):
+            store = SQLiteRateStore(self.path, legacy_json=legacy_json)
+        self.addCleanup(store.close)
+        return store
+
+    def write_legacy(self, raw: dict) -> None:
+        with open(self.legacy, "w", encoding="utf-8") as f:
+            json.dump(raw, f)
+
+    def test_sqlite_round_trip(self):
+        store = self.open_store()
+        store.put_many([
+            ("EUR", "2024-01-02", 390.0, "2024-01-02"),
+            ("EUR", "2024-01-03", 391.0, "2024-01-03"),
+            ("EUR", "2024-01-07", 391.0, "2024-01-05"),
+            ("USD", "2024-01-02", 355.0, "2024-01-02"),
+        ])
+        self.assertEqual(store.get("EUR", "2024-01-07"), (391.0, "2024-01-05"))
+        self.assertIsNone(store.get("EUR", "2024-01-04"))
+        self.assertEqual(sorted(store.get_range("EUR", "2024-01-01", "2024-01-03")), ["2024-01-02", "2024-01-03"])
+        # Egy másik kapcsolat (pl. párhuzamos folyamat) is látja az értékeket
+        self.assertEqual(self.open_store().get("USD", "2024-01-02"), (355.0, "2024-01-02"))
+
+    def test_missing_rate_does_not_overwrite_stored_rate(self):
+        for store in (self.open_store(), MemoryRateStore(), JSONRateStore(self.legacy)):
+            store.put_many([("EUR", "2024-01-02", 390.0, "2024-01-02"), ("USD", "2024-01-02", None, None)])
+            store.put_many([("EUR", "2024-01-02", None, None)])
+            self.assertEqual(store.get("EUR", "2024-01-02"), (390.0, "2024-01-02"), type(store).__name__)
+            # A negatív bejegyzést a később megismert árfolyam felülírja
+            self.assertEqual(store.get("USD", "2024-01-02"), (None, None))
+            store.put_many([("USD", "2024-01-02", 355.0, "2024-01-02")])
+            self.assertEqual(store.get("USD", "2024-01-02"), (355.0, "2024-01-02"), type(store).__name__)
+
+    def test_read_legacy_json(self):
+        self.write_legacy(LEGACY)
+        self.assertEqual(read_legacy_json(self.legacy), {
+            ("EUR", "2024-01-02"): (390.5, None),
+            ("EUR", "2024-01-06"): (391.0, "2024-01-05"),
+            ("USD", "2024-01-02"): (None, None),
+        })
+        self.assertEqual(read_legacy_json(os.path.join(self.work_dir, "nincs.json")), {})
+
+    def test_legacy_json_is_migrated_once(self):
+        self.write_legacy(LEGACY)
+        store = self.open_store(self.legacy)
+        self.assertEqual(store.get("EUR", "2024-01-02"), (390.5, None))
+        self.assertEqual(store.get("EUR", "2024-01-06"), (391.0, "2024-01-05"))
+        self.assertEqual(store.get("USD", "2024-01-02"), (None, None))
+        # A JSON későbbi változásait már nem emeli át
+        self.write_legacy({"2024-01-03|EUR": 392.0})
+        self.assertIsNone(self.open_store(self.legacy).get("EUR", "2024-01-03"))
+
+    def test_old_schema_is_upgraded(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE rates (currency TEXT NOT NULL, date TEXT NOT NULL, rate REAL NOT NULL,"
+                     " PRIMARY KEY (currency, date)) WITHOUT ROWID")
+        conn.execute("INSERT INTO rates VALUES ('EUR', '2024-01-02', 390.0)")
+        conn.commit()
+        conn.close()
+        store = self.open_store()
+        self.assertEqual(store.get("EUR", "2024-01-02"), (390.0, None))
+        store.put_many([("USD", "2024-01-02", None, None)])
+        self.assertEqual(store.get("USD", "2024-01-02"), (None, None))
+
+
+class NegativeCacheTest(unittest.TestCase):
+    def setUp(self):
+        stats.warnings.clear()
+        self.addCleanup(stats.warnings.clear)
+
+    def test_checked_days_are_not_fetched_again(self):
+        store = MemoryRateStore()
+        provider = MemoryRateProvider({"EUR": {"2024-01-02": 390.0, "2024-01-05": 392.0}})
+        service = MNBExchangeService(provider=provider, store=store, allow_missing=True)
+        service.prefetch(["EUR", "USD"], "2024-01-02", "2024-01-08")
+        service.flush()
+        self.assertEqual(len(provider.calls), 2)
+        # A hétvége az előző munkanap árfolyamát kapja, a USD napjai hiányként tárolódnak
+        self.assertEqual(store.get("EUR", "2024-01-07"), (392.0, "2024-01-05"))
+        self.assertEqual(store.get("USD", "2024-01-03"), (None, None))
+
+        provider = MemoryRateProvider({"USD": {"2024-01-03": 355.0}})
+        service = MNBExchangeService(provider=provider, store=store, allow_missing=True)
+        service.prefetch(["EUR", "USD"], "2024-01-02", "2024-01-08")
+        self.assertEqual(provider.calls, [])
+        self.assertEqual(service.get_exchange_rate("2024-01-07", "EUR"), 392.0)
+        self.assertIsNone(service.get_exchange_rate("2024-01-03", "USD"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""A devizánkénti árfolyam naptár (rate_calendar.RateCalendar): előre kitöltés és a publikációs nap.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import math
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from datetime import date, timedelta
+from mnb_exchange_service import MNBExchangeService
+from rate_cache import MemoryRateStore
+from rate_calendar import UNKNOWN, RateCalendar, from_epoch_day, to_epoch_day
+from rate_provider import MemoryRateProvider
+from tax_wizard import attach_exchange_rates
+
+
+def day(text: str) -> int:
+    return to_epoch_day(text)
+
+
+# 2024-01-05 péntek, 2024-01-08 hétfő
+FRIDAY, MONDAY = day("2024-01-05"), day("2024-01-08")
+
+
+class RateCalendarTest(unittest.TestCase):
+    def test_epoch_days(self):
+        self.assertEqual(to_epoch_day("1970-01-02"), 1)
+        self.assertEqual(to_epoch_day(date(2024, 1, 5)), FRIDAY)
+        self.assertEqual(to_epoch_day(pd.Timestamp("2024-01-05 23:59")), FRIDAY)
+        self.assertEqual(from_epoch_day(FRIDAY), date(2024, 1, 5))
+
+    def test_weekend_resolves_to_previous_publication(self):
+        calendar = RateCalendar(fallback_days=5)
+        new_items = calendar.fill(FRIDAY, MONDAY, [(MONDAY, 381.0), (FRIDAY, 380.0)])
+        self.assertEqual(new_items, [
+            (FRIDAY, 380.0, FRIDAY), (FRIDAY + 1, 380.0, FRIDAY), (FRIDAY + 2, 380.0, FRIDAY), (MONDAY, 381.0, MONDAY),
+        ])
+        self.assertEqual(calendar.lookup(FRIDAY + 2), (380.0, FRIDAY))
+        rates, published = calendar.lookup_many([FRIDAY + 1, MONDAY, MONDAY + 1])
+        self.assertEqual(list(rates[:2]), [380.0, 381.0])
+        self.assertEqual(list(published[:2]), [FRIDAY, MONDAY])
+        # A kitöltött időszakon kívül
+        self.assertTrue(math.isnan(rates[2]))
+        self.assertEqual(published[2], UNKNOWN)
+        self.assertTrue(calendar.covered(FRIDAY, MONDAY))
+        self.assertFalse(calendar.covered(FRIDAY, MONDAY + 1))
+
+    def test_publication_before_range(self):
+        # A tartomány első napjai a tartomány előtti utolsó publikációra vezethetők vissza
+        calendar = RateCalendar(fallback_days=5)
+        calendar.fill(FRIDAY + 1, MONDAY, [(FRIDAY, 380.0), (MONDAY, 381.0)])
+        self.assertEqual(calendar.lookup(FRIDAY + 1), (380.0, FRIDAY))
+        self.assertEqual(calendar.lookup(FRIDAY), (None, None))
+
+    def test_fallback_limit(self):
+        calendar = RateCalendar(fallback_days=2)
+        new_items = calendar.fill(FRIDAY, MONDAY + 1, [(FRIDAY, 380.0)])
+        self.assertEqual(calendar.lookup(FRIDAY + 2), (380.0, FRIDAY))
+        self.assertEqual(calendar.lookup(MONDAY), (None, None))
+        # A visszalépési korlát utáni múltbeli napok vizsgáltként (negatív cache) kerülnek vissza
+        self.assertIn((MONDAY, None, UNKNOWN), new_items)
+        self.assertTrue(calendar.is_checked(MONDAY))
+
+    def test_refill_returns_only_changes(self):
+        calendar = RateCalendar(fallback_days=5)
+        calendar.fill(FRIDAY, MONDAY, [(FRIDAY, 380.0)])
+        self.assertEqual(calendar.fill(FRIDAY, MONDAY, [(FRIDAY, 380.0)]), [])
+        # Az újonnan publikált hétfői árfolyam csak a hétfőt változtatja
+        self.assertEqual(calendar.fill(FRIDAY, MONDAY, [(FRIDAY, 380.0), (MONDAY, 381.0)]),
+                         [(MONDAY, 381.0, MONDAY)])
+
+    def test_missing_does_not_overwrite_known_rate(self):
+        calendar = RateCalendar(fallback_days=5)
+        calendar.fill(FRIDAY, MONDAY, [(FRIDAY, 380.0)])
+        self.assertEqual(calendar.fill(FRIDAY, MONDAY, []), [])
+        self.assertEqual(calendar.lookup(MONDAY), (380.0, FRIDAY))
+
+    def test_today_is_not_cached_as_missing(self):
+        today = to_epoch_day(date.today())
+        calendar = RateCalendar(fallback_days=5)
+        new_items = calendar.fill(today - 20, today + 1, [])
+        self.assertEqual(len(new_items), 20)
+        self.assertFalse(calendar.is_checked(today))
+        self.assertFalse(calendar.covered(today - 20, today))
+
+    def test_set_with_unknown_publication(self):
+        # A régi JSON cache-ből átemelt árfolyamok publikációs napja ismeretlen
+        calendar = RateCalendar(fallback_days=5)
+        calendar.set(MONDAY, 381.0)
+        calendar.set(FRIDAY, None)
+        self.assertEqual(calendar.lookup(MONDAY), (381.0, None))
+        self.assertTrue(calendar.is_checked(FRIDAY))
+        self.assertFalse(calendar.is_checked(FRIDAY + 1))
+        self.assertEqual(calendar.lookup(FRIDAY), (None, None))
+
+
+class RateDateTest(unittest.TestCase):
+    def test_rows_get_rate_and_publication_date(self):
+        provider = MemoryRateProvider({"EUR": {"2023-12-29": 382.0, "2024-01-02": 380.0}})
+        service = MNBExchangeService(provider=provider, store=MemoryRateStore())
+        rows = pd.DataFrame({
+            "Date": pd.to_datetime(["2023-12-31 10:00", "2024-01-01 00:00", "2024-01-02 23:59"]),
+            "CCY": ["EUR", "EUR", "EUR"],
+        })
+        result = attach_exchange_rates(rows, service, "Date", "CCY")
+        self.assertEqual(list(result["Exchange Rate"]), [382.0, 382.0, 380.0])
+        self.assertEqual(list(result["Rate Date"]), ["2023-12-29", "2023-12-29", "2024-01-02"])
+        self.assertEqual(service.get_exchange_rate(date(2024, 1, 1) - timedelta(days=1), "EUR"), 382.0)
+
+
+if __name__ == "__main__":
+    unittest.main()